@@ -0,0 +1,134 @@
+"""
+Email/password login.
+
+One indexed lookup on LOWER(email) loads only the columns login needs; the
+failed-attempt counter and lockout are changed by a single UPDATE with F()
+expressions, and a successful login writes nothing unless it clears a
+lockout. A cache-backed limiter turns away bursts per email and IP before
+the users table is touched.
+"""
+import hashlib
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Lower
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+LOGIN_FIELDS = ('id', 'email', 'username', 'password', 'is_active', 'failed_login_attempts', 'account_locked_until')
+
+
+class LoginRateLimiter:
+    """
+    Fixed-window attempt counter per (email, IP) in a Django cache, shared
+    between worker processes when the cache is.
+    """
+
+    def __init__(self, limit, window, alias='default'):
+        self.limit = limit
+        self.window = window
+        self.cache = caches[alias]
+
+    def key(self, email, ip, window_start):
+        digest = hashlib.sha256(f'{email.strip().lower()}|{ip}'.encode()).hexdigest()
+        return f'login:attempts:{digest}:{window_start}'
+
+    def hit(self, email, ip):
+        """Count an attempt; returns (allowed, seconds until the window resets)."""
+        now = time.time()
+        window_start = int(now // self.window)
+        key = self.key(email, ip, window_start)
+        self.cache.add(key, 0, self.window)
+        try:
+            attempts = self.cache.incr(key)
+        except ValueError:
+            # Evicted between add and incr
+            self.cache.set(key, 1, self.window)
+            attempts = 1
+        retry_after = int((window_start + 1) * self.window - now) + 1
+        return attempts <= self.limit, retry_after
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_login_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = LoginRateLimiter(
+                    settings.LOGIN_RATE_LIMIT, settings.LOGIN_RATE_WINDOW, settings.LOGIN_RATE_LIMIT_ALIAS
+                )
+    return _limiter
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def find_user(email):
+    """The user with this email, compared case-insensitively through the LOWER(email) index."""
+    return (
+        User.objects.annotate(email_lower=Lower('email'))
+        .filter(email_lower=email.strip().lower())
+        .only(*LOGIN_FIELDS)
+        .first()
+    )
+
+
+def is_locked(user):
+    return bool(user.account_locked_until and timezone.now() < user.account_locked_until)
+
+
+def check_credentials(user, password):
+    return user.is_active and user.check_password(password)
+
+
+def record_failure(user):
+    """
+    Count a failed attempt and lock the account once it reaches
+    LOGIN_LOCKOUT_ATTEMPTS, in one UPDATE. Returns True if it is now locked.
+    """
+    attempts = settings.LOGIN_LOCKOUT_ATTEMPTS
+    User.objects.filter(pk=user.pk).update(
+        failed_login_attempts=F('failed_login_attempts') + 1,
+        # The condition sees the count before this attempt
+        account_locked_until=Case(
+            When(failed_login_attempts__gte=attempts - 1,
+                 then=Value(timezone.now() + timedelta(minutes=settings.LOGIN_LOCKOUT_MINUTES))),
+            default=F('account_locked_until'),
+        ),
+    )
+    return user.failed_login_attempts + 1 >= attempts
+
+
+def record_success(user):
+    if user.failed_login_attempts or user.account_locked_until:
+        User.objects.filter(pk=user.pk).update(failed_login_attempts=0, account_locked_until=None)
+
+
+def user_token_key(user_id):
+    return f'auth:user-token:{user_id}'
+
+
+def token_for(user):
+    """The user's API token key, from the cache when it has been issued before."""
+    cache = caches[settings.LOGIN_RATE_LIMIT_ALIAS]
+    key = cache.get(user_token_key(user.id))
+    if key is None:
+        key = Token.objects.get_or_create(user_id=user.id)[0].key
+        cache.set(user_token_key(user.id), key, settings.AUTH_TOKEN_CACHE_TTL)
+    return key
+
+
+def forget_user_token(user_id):
+    caches[settings.LOGIN_RATE_LIMIT_ALIAS].delete(user_token_key(user_id))
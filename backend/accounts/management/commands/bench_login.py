@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from accounts import login
+
+User = get_user_model()
+
+# A fast hasher, so the timings show the database work rather than PBKDF2
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def legacy_login(email, password):
+    """The login flow as it was before accounts.login, kept for comparison."""
+    user = User.objects.filter(email=email).first()
+    if user is None:
+        return False
+    authenticated_user = authenticate(username=email, password=password)
+    if authenticated_user is not None:
+        user.failed_login_attempts = 0
+        user.account_locked_until = None
+        user.save()
+        Token.objects.get_or_create(user=user)
+        return True
+    user.failed_login_attempts += 1
+    user.save()
+    return False
+
+
+def current_login(email, password):
+    user = login.find_user(email)
+    if user is None or login.is_locked(user):
+        return False
+    if not login.check_credentials(user, password):
+        login.record_failure(user)
+        return False
+    login.record_success(user)
+    login.token_for(user)
+    return True
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark queries and latency per login attempt, before and after accounts.login, "
+        "against synthetic users created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50_000)
+        parser.add_argument('--attempts', type=int, default=500)
+        parser.add_argument('--failure-rate', type=float, default=0.2)
+        parser.add_argument('--seed', type=int, default=42)
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.bench(options)
+            transaction.set_rollback(True)
+
+    def bench(self, options):
+        rng = np.random.default_rng(options['seed'])
+        password = make_password('bench-password')
+        User.objects.bulk_create(
+            [User(username=f'bench{index}', email=f'bench{index}@example.com', password=password)
+             for index in range(options['users'])],
+            batch_size=5000
+        )
+        picks = rng.integers(0, options['users'], options['attempts'])
+        fails = rng.random(options['attempts']) < options['failure_rate']
+        attempts = [
+            (f'bench{index}@example.com', 'wrong' if fail else 'bench-password')
+            for index, fail in zip(picks.tolist(), fails.tolist())
+        ]
+
+        self.stdout.write(f"{options['users']:,} users, {len(attempts)} attempts, "
+                          f"{fails.mean():.0%} with a wrong password")
+        self.stdout.write(f'{"":<10}{"queries/login":>15}{"p50 ms":>10}{"p95 ms":>10}')
+        for name, flow in (('before', legacy_login), ('after', current_login)):
+            # Same starting state for both runs
+            User.objects.filter(username__startswith='bench').update(failed_login_attempts=0, account_locked_until=None)
+            samples = []
+            with CaptureQueriesContext(connection) as queries:
+                for email, attempt_password in attempts:
+                    started = time.perf_counter()
+                    flow(email, attempt_password)
+                    samples.append(time.perf_counter() - started)
+            ms = np.array(samples) * 1000
+            self.stdout.write(
+                f'{name:<10}{len(queries) / len(attempts):>15.2f}'
+                f'{np.percentile(ms, 50):>10.3f}{np.percentile(ms, 95):>10.3f}'
+            )
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .login import forget_user_token
+from travel_smart.response_cache import PROFILE, invalidate
+
+from .models import CustomUser, TravelPreferences
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    invalidate(instance.id, PROFILE)
+
+
+@receiver([post_save, post_delete], sender=TravelPreferences)
+def preferences_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id, PROFILE)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_user_token(instance.user_id)
@@ -1,3 +1,112 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import login
+from .login import LoginRateLimiter
+
+User = get_user_model()
+
+
+class LoginRateLimiterTests(SimpleTestCase):
+    """Attempts are counted per email and IP in fixed windows."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.now = 1_000_040.0
+        self.enterContext(mock.patch.object(login, 'time', mock.Mock(time=lambda: self.now)))
+        self.limiter = LoginRateLimiter(limit=3, window=60)
+
+    def test_attempts_over_the_limit_are_refused_until_the_window_ends(self):
+        results = [self.limiter.hit('ana@example.com', '10.0.0.1') for _ in range(4)]
+        self.assertEqual([allowed for allowed, _ in results], [True, True, True, False])
+        # The window runs from 1_000_020 to 1_000_080
+        self.assertEqual(results[-1][1], 41)
+        self.now += 40
+        self.assertTrue(self.limiter.hit('ana@example.com', '10.0.0.1')[0])
+
+    def test_email_case_and_spaces_do_not_open_a_new_count(self):
+        for email in ('ana@example.com', ' ANA@example.com', 'Ana@Example.com '):
+            self.limiter.hit(email, '10.0.0.1')
+        self.assertFalse(self.limiter.hit('ana@example.com', '10.0.0.1')[0])
+        self.assertTrue(self.limiter.hit('ana@example.com', '10.0.0.2')[0])
+        self.assertTrue(self.limiter.hit('bob@example.com', '10.0.0.1')[0])
+
+
+@override_settings(
+    LOGIN_LOCKOUT_ATTEMPTS=3, LOGIN_LOCKOUT_MINUTES=5,
+    # Password checks are what these tests repeat, and the default hasher is slow on purpose
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class LoginTests(TestCase):
+    """Failed logins lock the account after a few attempts; a good one clears the count."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.user = User.objects.create_user(username='ana', email='Ana@Example.com', password='right-password')
+        self.client = APIClient()
+
+    def log_in(self, password, email='ana@example.com'):
+        return self.client.post('/auth/login/', {'email': email, 'password': password}, format='json')
+
+    def reload(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_login_returns_the_users_token(self):
+        response = self.log_in('right-password', email=' ANA@example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], Token.objects.get(user=self.user).key)
+        self.assertEqual(self.log_in('right-password').data['token'], response.data['token'])
+
+    def test_unknown_email(self):
+        self.assertEqual(self.log_in('right-password', email='nobody@example.com').status_code, 400)
+
+    def test_failures_lock_the_account(self):
+        self.assertEqual(self.log_in('wrong').status_code, 400)
+        self.assertEqual(self.log_in('wrong').status_code, 400)
+        self.assertEqual(self.log_in('wrong').status_code, 403)
+        user = self.reload()
+        self.assertEqual(user.failed_login_attempts, 3)
+        self.assertGreater(user.account_locked_until, timezone.now() + timedelta(minutes=4))
+        # Locked even with the right password
+        self.assertEqual(self.log_in('right-password').status_code, 403)
+
+    def test_login_after_the_lockout_clears_it(self):
+        User.objects.filter(pk=self.user.pk).update(
+            failed_login_attempts=3, account_locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self.log_in('right-password').status_code, 200)
+        user = self.reload()
+        self.assertEqual((user.failed_login_attempts, user.account_locked_until), (0, None))
+
+    def test_clean_login_writes_nothing(self):
+        self.log_in('right-password')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.log_in('right-password').status_code, 200)
+
+    def test_failures_on_stale_copies_are_all_counted(self):
+        # Requests racing each other each loaded the user before any failure was written
+        copies = [login.find_user('ana@example.com') for _ in range(3)]
+        for copy in copies:
+            login.record_failure(copy)
+        user = self.reload()
+        self.assertEqual(user.failed_login_attempts, 3)
+        self.assertTrue(login.is_locked(user))
+
+    @override_settings(LOGIN_RATE_LIMIT=2)
+    def test_bursts_are_turned_away(self):
+        self.enterContext(mock.patch.object(login, '_limiter', None))
+        self.log_in('wrong')
+        self.log_in('wrong')
+        response = self.log_in('right-password')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(self.reload().failed_login_attempts, 2)
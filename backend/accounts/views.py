@@ -2,14 +2,11 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
-from rest_framework.authtoken.models import Token
 from rest_framework import viewsets
 from .models import TravelPreferences
 from .serializers import TravelPreferencesSerializer
-from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import get_user_model
 from .serializers import CustomUserSerializer
-from django.utils import timezone
-from datetime import timedelta
 from django.contrib.auth.forms import PasswordResetForm
 from .serializers import PasswordResetSerializer
 from django.http import JsonResponse
@@ -17,6 +14,8 @@ import json
 from django.views import View
 from django.contrib.auth.models import User
 from django.utils.http import urlsafe_base64_decode
+from travel_smart.response_cache import PROFILE, cache_per_user
+from . import login
 
 # Get custom user model
 User = get_user_model()
@@ -49,38 +48,33 @@ class CustomUserLoginView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
-        email = request.data.get('email')
-        password = request.data.get('password')
-        user = User.objects.filter(email=email).first()
-
-        if user is not None:
-            if user.account_locked_until and timezone.now() < user.account_locked_until:
-                return Response({'detail': 'Your account is temporarily locked due to multiple failed login attempts. Please try again later.'}, status=status.HTTP_403_FORBIDDEN)
-
-            authenticated_user = authenticate(username=email, password=password)
-
-            if authenticated_user is not None:
-                user.failed_login_attempts = 0
-                user.account_locked_until = None
-                user.save()
-                token, created = Token.objects.get_or_create(user=user)
-                return Response({'token': token.key})
-            else:
-                user.failed_login_attempts += 1
-                user.save()
-
-                if user.failed_login_attempts >= 5:
-                    user.account_locked_until = timezone.now() + timedelta(minutes=5)
-                    user.save()
-                    return Response({'detail': 'Your account has been temporarily locked due to multiple failed login attempts. Please try again later.'}, status=status.HTTP_403_FORBIDDEN)
-
-                return Response({'detail': 'Incorrect password. Please try again.'}, status=status.HTTP_400_BAD_REQUEST)
-        else:
+        email = request.data.get('email') or ''
+        password = request.data.get('password') or ''
+
+        allowed, retry_after = login.get_login_rate_limiter().hit(email, login.client_ip(request))
+        if not allowed:
+            return Response({'detail': 'Too many login attempts. Please try again later.'},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(retry_after)})
+
+        user = login.find_user(email)
+        if user is None:
             return Response({'detail': 'User with this email does not exist.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if login.is_locked(user):
+            return Response({'detail': 'Your account is temporarily locked due to multiple failed login attempts. Please try again later.'}, status=status.HTTP_403_FORBIDDEN)
+
+        if not login.check_credentials(user, password):
+            if login.record_failure(user):
+                return Response({'detail': 'Your account has been temporarily locked due to multiple failed login attempts. Please try again later.'}, status=status.HTTP_403_FORBIDDEN)
+            return Response({'detail': 'Incorrect password. Please try again.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        login.record_success(user)
+        return Response({'token': login.token_for(user)})
+
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cache_per_user(PROFILE)
     def get(self, request, *args, **kwargs):
         user = request.user
         user_data = {
@@ -97,19 +91,12 @@ class UserProfileView(APIView):
         user = request.user
         data = request.data['userDetails']
 
-        if "email" in data:
-            user.email = data["email"]
-        if "first_name" in data:
-            user.first_name = data["first_name"]
-        if "last_name" in data:
-            user.last_name = data["last_name"]
-        if "phone_number" in data:  
-            user.phone_number = data["phone_number"]
-        if "address" in data:       
-            user.address = data["address"]
-
-        # Save the updated user object
-        user.save()
+        fields = [name for name in ("email", "first_name", "last_name", "phone_number", "address") if name in data]
+        for name in fields:
+            setattr(user, name, data[name])
+
+        # Save only the updated columns, leaving login bookkeeping alone
+        user.save(update_fields=fields)
 
         return Response({"message": "User profile updated successfully."}, status=status.HTTP_200_OK)
 
@@ -0,0 +1,152 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+
+from .fx import get_fx_rates
+from .models import Expense, Trip
+from .rollups import SPEND, trip_spending
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+
+# Start of the period a date falls in
+INTERVALS = {
+    'day': lambda day: day,
+    'week': lambda day: day - timedelta(days=day.weekday()),
+    'month': lambda day: day.replace(day=1),
+}
+
+
+def as_number(amount):
+    """Round an exact Decimal total to cents for the JSON response."""
+    return float(amount.quantize(CENT))
+
+
+def grouped_spending(expenses, *fields):
+    """
+    One GROUP BY query over `fields` plus currency, yielding dict rows with
+    `total` (as entered), `base_total` (in trip base currency), `unconverted`
+    (as entered, of the expenses with no base amount yet) and `count`.
+    The database does the summing, so memory depends on the number of groups
+    rather than the number of expenses.
+    """
+    rows = (
+        expenses.order_by()
+        .values(*fields, 'currency')
+        .annotate(
+            total=Sum('amount'), base_total=Sum(SPEND),
+            unconverted=Sum('amount', filter=Q(amount_base__isnull=True)), count=Count('id')
+        )
+    )
+    return rows.iterator()
+
+
+def summarize_trip(trip):
+    """
+    Totals and category/day/currency breakdowns of a trip's expenses. Budget
+    figures come from the trip's spending rollup, in the trip's base currency;
+    the day and currency breakdowns from one GROUP BY query. Expenses in a
+    currency with no known rate are left out of the base currency figures and
+    listed, as entered, under `unconverted`.
+    """
+    total, count, by_category = trip_spending(trip)
+    by_day = defaultdict(lambda: ZERO)
+    by_currency = defaultdict(lambda: ZERO)
+    unconverted = defaultdict(lambda: ZERO)
+
+    for row in grouped_spending(Expense.objects.filter(trip=trip), 'date'):
+        by_day[row['date']] += row['base_total'] or ZERO
+        by_currency[row['currency']] += row['total'] or ZERO
+        if row['unconverted']:
+            unconverted[row['currency']] += row['unconverted']
+
+    return {
+        "trip": trip.name,
+        "base_currency": trip.base_currency,
+        "budget": float(trip.budget),
+        "total_spent": as_number(total),
+        "remaining": as_number(trip.budget - total),
+        "category_breakdown": {category: as_number(amount) for category, amount in by_category.items()},
+        "daily_breakdown": {day.isoformat(): as_number(amount) for day, amount in sorted(by_day.items())},
+        "currency_breakdown": {currency: as_number(amount) for currency, amount in by_currency.items()},
+        "expense_count": count,
+        "unconverted": {currency: as_number(amount) for currency, amount in unconverted.items()},
+    }
+
+
+def spending_analytics(user, interval='month', top=5, start=None, end=None, currency=None):
+    """
+    Spending across all of a user's trips in one reporting currency: totals
+    per period and top categories, plus per-trip totals against budget in each
+    trip's base currency.
+
+    Expenses are grouped by day, category and currency in one query and the
+    groups converted at their day's rate in one vectorized pass. Groups with
+    no known rate are reported under `unconverted` instead.
+    """
+    currency = currency or settings.FX_REPORTING_CURRENCY
+    expenses = Expense.objects.filter(trip__user=user)
+    if start:
+        expenses = expenses.filter(date__gte=start)
+    if end:
+        expenses = expenses.filter(date__lte=end)
+
+    rows = list(grouped_spending(expenses, 'date', 'category'))
+    converted = get_fx_rates().convert(
+        [row['total'] for row in rows],
+        [row['currency'] for row in rows],
+        [row['date'] for row in rows],
+        [currency] * len(rows),
+    )
+
+    period_of = INTERVALS[interval]
+    total = ZERO
+    by_period = defaultdict(lambda: ZERO)
+    by_category = defaultdict(lambda: ZERO)
+    unconverted = defaultdict(lambda: ZERO)
+    for row, amount in zip(rows, converted):
+        if amount is None:
+            unconverted[row['currency']] += row['total']
+            continue
+        total += amount
+        by_period[period_of(row['date'])] += amount
+        by_category[row['category']] += amount
+
+    trips = Trip.objects.filter(user=user).select_related('spending_rollup').order_by('start_date')
+    top_categories = sorted(by_category.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    return {
+        "interval": interval,
+        "currency": currency,
+        "total_spent": as_number(total),
+        "spend_over_time": [
+            {"period": period.isoformat(), "total": as_number(amount)}
+            for period, amount in sorted(by_period.items())
+        ],
+        "top_categories": [
+            {
+                "category": category,
+                "total": as_number(amount),
+                "share": round(float(amount / total), 4) if total else 0.0,
+            }
+            for category, amount in top_categories
+        ],
+        "trips": [trip_totals(trip) for trip in trips],
+        "unconverted": {code: as_number(amount) for code, amount in unconverted.items()},
+    }
+
+
+def trip_totals(trip):
+    rollup = getattr(trip, 'spending_rollup', None)
+    spent = rollup.total if rollup is not None else ZERO
+    return {
+        "id": trip.id,
+        "name": trip.name,
+        "base_currency": trip.base_currency,
+        "budget": float(trip.budget),
+        "total_spent": as_number(spent),
+        "remaining": as_number(trip.budget - spent),
+    }
@@ -0,0 +1,128 @@
+import codecs
+import csv
+import json
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import BaseParser
+
+from travel_smart.response_cache import TRIPS, invalidate
+
+from . import fx, rollups
+from .models import Expense, Trip
+from .serializers import ExpenseImportRowSerializer
+
+EXPORT_FIELDS = ['id', 'trip_id', 'title', 'amount', 'currency', 'amount_base', 'category', 'note', 'date', 'created_at']
+
+
+class CSVParser(BaseParser):
+    """Parse a text/csv body into a lazy stream of row dicts keyed by the header line."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding') or 'utf-8'
+        return csv.DictReader(codecs.getreader(encoding)(stream))
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+        # (trip_id, category) -> [amount, count], applied to the rollups once at the end
+        self.deltas = defaultdict(lambda: [Decimal('0.00'), 0])
+
+
+def import_expenses(user, rows, default_trip=None, partial=False, batch_size=500, max_rows=5000):
+    """
+    Validate expense rows one at a time and insert them with bulk_create in
+    batches, all inside one transaction.
+
+    Every invalid row is reported as {'row', 'errors'} (rows numbered from 1).
+    Unless `partial` is set, any invalid row rolls the whole import back.
+    """
+    base_currencies = dict(Trip.objects.filter(user=user).values_list('id', 'base_currency'))
+    validator = ExpenseImportRowSerializer(context={'trips': base_currencies})
+    result = ImportResult()
+    batch = []
+
+    with transaction.atomic():
+        for number, row in enumerate(rows, start=1):
+            if number > max_rows:
+                result.errors.append({
+                    'row': number, 'errors': {'non_field_errors': [f'Imports are limited to {max_rows} rows.']}
+                })
+                break
+            if not isinstance(row, dict):
+                result.errors.append({'row': number, 'errors': {'non_field_errors': ['Expected an object.']}})
+                continue
+            # Empty CSV cells mean "not given", so optional fields fall back to their defaults
+            row = {key: value for key, value in row.items() if key is not None and value not in ('', None)}
+            if default_trip is not None and 'trip' not in row:
+                row['trip'] = default_trip
+            try:
+                data = validator.run_validation(row)
+            except ValidationError as e:
+                result.errors.append({'row': number, 'errors': e.detail})
+                continue
+
+            batch.append(Expense(user=user, trip_id=data.pop('trip'), **data))
+            if len(batch) >= batch_size:
+                insert_batch(batch, base_currencies, result)
+                batch = []
+
+        if result.errors and not partial:
+            transaction.set_rollback(True)
+            result.created = 0
+            return result
+
+        insert_batch(batch, base_currencies, result)
+        if result.deltas:
+            rollups.apply_expense_deltas(result.deltas)
+        # bulk_create sends no post_save signals
+        if result.created:
+            invalidate(user.id, TRIPS)
+    return result
+
+
+def insert_batch(batch, base_currencies, result):
+    # Convert the whole batch to trip base currencies in one pass
+    fx.fill_amount_base(batch, base_currencies)
+    Expense.objects.bulk_create(batch)
+    result.created += len(batch)
+    for expense in batch:
+        delta = result.deltas[(expense.trip_id, expense.category)]
+        delta[0] += expense.spend
+        delta[1] += 1
+
+
+class Echo:
+    """File-like object whose write() hands the value back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=2000):
+    """Expense rows as tuples of EXPORT_FIELDS, read from the database in chunks."""
+    return queryset.order_by('date', 'id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def export_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in export_rows(queryset):
+        yield writer.writerow(row)
+
+
+def export_ndjson(queryset):
+    for row in export_rows(queryset):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', export_csv),
+    'ndjson': ('application/x-ndjson', export_ndjson),
+}
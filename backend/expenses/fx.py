@@ -0,0 +1,183 @@
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import Expense, FxRate
+
+
+def normalize_currency(code):
+    return (code or '').strip().upper()
+
+
+class FxRates:
+    """
+    In-memory rate vectors for historical FX lookups.
+
+    For each currency the known rates are held as two NumPy arrays, days
+    (date ordinals) and rates, sorted by day. A lookup binary-searches the most
+    recent rate on or before each date, so converting thousands of amounts is
+    one vectorized pass per currency instead of a query per expense.
+    """
+
+    def __init__(self, pivot='USD'):
+        self.pivot = pivot
+        self._vectors = {}
+        self._lock = threading.Lock()
+
+    def vector(self, currency):
+        """(days, rates) arrays for a currency, loaded from FxRate on first use."""
+        vector = self._vectors.get(currency)
+        if vector is None:
+            rows = FxRate.objects.filter(currency=currency).order_by('date').values_list('date', 'rate')
+            days = []
+            rates = []
+            for day, rate in rows.iterator():
+                days.append(day.toordinal())
+                rates.append(float(rate))
+            vector = (np.array(days, dtype=np.int64), np.array(rates, dtype=np.float64))
+            with self._lock:
+                self._vectors[currency] = vector
+        return vector
+
+    def rates_on(self, currencies, days):
+        """Rate per pivot unit for each (currency, day ordinal) pair; NaN where none is known."""
+        currencies = np.asarray(currencies, dtype=object)
+        days = np.asarray(days, dtype=np.int64)
+        rates = np.full(len(days), np.nan)
+        for currency in set(currencies.tolist()):
+            mask = currencies == currency
+            if currency == self.pivot:
+                rates[mask] = 1.0
+                continue
+            known_days, known_rates = self.vector(currency)
+            if not len(known_days):
+                continue
+            # Latest rate on or before each date (covers weekends and holidays)
+            index = np.searchsorted(known_days, days[mask], side='right') - 1
+            rates[mask] = np.where(index >= 0, known_rates[np.maximum(index, 0)], np.nan)
+        return rates
+
+    def rate(self, currency, target, date):
+        """Units of `target` per unit of `currency` on `date`, or None if a rate is missing."""
+        return self.convert([Decimal('1')], [currency], [date], [target], places=10)[0]
+
+    def convert(self, amounts, currencies, dates, targets, places=2):
+        """
+        Convert amounts between currencies at the rates of their dates.
+
+        Returns a list of Decimals rounded to `places`, with None where a rate
+        is missing. Amounts already in their target currency are passed through.
+        """
+        if not len(amounts):
+            return []
+        currencies = np.array([normalize_currency(code) for code in currencies], dtype=object)
+        targets = np.array([normalize_currency(code) for code in targets], dtype=object)
+        days = np.array([date.toordinal() for date in dates], dtype=np.int64)
+        values = np.array([float(amount) for amount in amounts], dtype=np.float64)
+
+        same = currencies == targets
+        converted = values / self.rates_on(currencies, days) * self.rates_on(targets, days)
+
+        quantum = Decimal(1).scaleb(-places)
+        results = []
+        for amount, value, unchanged in zip(amounts, converted.tolist(), same.tolist()):
+            if unchanged:
+                results.append(Decimal(amount).quantize(quantum))
+            elif value != value:
+                results.append(None)
+            else:
+                results.append(Decimal(f'{value:.{places}f}'))
+        return results
+
+
+_fx_rates = None
+_fx_signature = None
+_fx_checked_at = 0
+_fx_lock = threading.Lock()
+
+
+def rates_signature():
+    """Changes whenever rates are loaded or updated."""
+    summary = FxRate.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    return summary['count'], summary['updated']
+
+
+def get_fx_rates():
+    """
+    Return the process-wide rate vectors, dropping them when the rate table
+    changed (checked at most every FX_CACHE_CHECK_INTERVAL seconds).
+    """
+    global _fx_rates, _fx_signature, _fx_checked_at
+    if _fx_rates is not None and time.monotonic() - _fx_checked_at < settings.FX_CACHE_CHECK_INTERVAL:
+        return _fx_rates
+
+    with _fx_lock:
+        if _fx_rates is None or time.monotonic() - _fx_checked_at >= settings.FX_CACHE_CHECK_INTERVAL:
+            signature = rates_signature()
+            if _fx_rates is None or signature != _fx_signature:
+                _fx_rates = FxRates(pivot=settings.FX_PIVOT_CURRENCY)
+                _fx_signature = signature
+            _fx_checked_at = time.monotonic()
+    return _fx_rates
+
+
+def reset_fx_rates():
+    """Forget the cached vectors, e.g. right after loading new rates in this process."""
+    global _fx_rates
+    with _fx_lock:
+        _fx_rates = None
+
+
+def fill_amount_base(expenses, base_currencies):
+    """
+    Set `amount_base` on unsaved or changed expenses in one vectorized pass.
+
+    `base_currencies` maps trip ID to the trip's base currency.
+    """
+    expenses = list(expenses)
+    converted = get_fx_rates().convert(
+        [expense.amount for expense in expenses],
+        [expense.currency for expense in expenses],
+        [expense.date for expense in expenses],
+        [base_currencies[expense.trip_id] for expense in expenses],
+    )
+    for expense, amount_base in zip(expenses, converted):
+        expense.amount_base = amount_base
+    return expenses
+
+
+def base_amount(amount, currency, date, base_currency):
+    """A single amount in a trip's base currency, or None if a rate is missing."""
+    return get_fx_rates().convert([amount], [currency], [date], [base_currency])[0]
+
+
+def recompute_base_amounts(expenses, batch_size=1000):
+    """
+    Recompute `amount_base` for a queryset of expenses in batches and return
+    the IDs of the trips whose totals changed.
+    """
+    queryset = expenses.select_related('trip').only(
+        'id', 'trip', 'amount', 'currency', 'date', 'amount_base', 'trip__base_currency'
+    )
+    trip_ids = set()
+    batch = []
+    for expense in queryset.iterator(chunk_size=batch_size):
+        batch.append(expense)
+        if len(batch) == batch_size:
+            trip_ids.update(_update_base_amounts(batch))
+            batch = []
+    if batch:
+        trip_ids.update(_update_base_amounts(batch))
+    return trip_ids
+
+
+def _update_base_amounts(batch):
+    before = [expense.amount_base for expense in batch]
+    fill_amount_base(batch, {expense.trip_id: expense.trip.base_currency for expense in batch})
+    changed = [expense for expense, old in zip(batch, before) if expense.amount_base != old]
+    Expense.objects.bulk_update(changed, ['amount_base'])
+    return {expense.trip_id for expense in changed}
@@ -0,0 +1,69 @@
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from expenses.fx import normalize_currency, recompute_base_amounts, reset_fx_rates
+from expenses.models import Expense, FxRate
+from expenses.rollups import rebuild_trip_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Load FX rates (units of currency per one FX_PIVOT_CURRENCY) from a CSV file with "
+        "date,currency,rate columns or a JSON list of objects with the same keys, then fill "
+        "in expense amounts in trip base currency that were missing a rate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', required=True, help='Path to a .csv or .json rates file')
+        parser.add_argument('--recompute', action='store_true',
+                            help='Recompute the base amount of every expense, not only the missing ones')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rates = self.read_rates(options['file'])
+        with transaction.atomic():
+            FxRate.objects.bulk_create(
+                rates, batch_size=options['batch_size'], update_conflicts=True,
+                unique_fields=['currency', 'date'], update_fields=['rate', 'updated_at']
+            )
+        reset_fx_rates()
+        self.stdout.write(f'Loaded {len(rates)} FX rates.')
+
+        expenses = Expense.objects.all()
+        if not options['recompute']:
+            expenses = expenses.filter(amount_base__isnull=True)
+        trip_ids = sorted(recompute_base_amounts(expenses, options['batch_size']))
+        for start in range(0, len(trip_ids), options['batch_size']):
+            rebuild_trip_rollups(trip_ids[start:start + options['batch_size']])
+        self.stdout.write(self.style.SUCCESS(f'Updated base amounts for {len(trip_ids)} trips.'))
+
+    def read_rates(self, path):
+        try:
+            with open(path, newline='') as file:
+                if path.endswith('.json'):
+                    rows = json.load(file)
+                    # Django fixtures wrap each row as {"model": ..., "fields": {...}}
+                    rows = [row.get('fields', row) for row in rows]
+                else:
+                    rows = list(csv.DictReader(file))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+
+        rates = {}
+        for number, row in enumerate(rows, start=1):
+            try:
+                currency = normalize_currency(row['currency'])
+                rate = Decimal(str(row['rate']))
+                day = date.fromisoformat(str(row['date']))
+            except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+                raise CommandError(f'Row {number}: invalid rate ({e!r})')
+            if len(currency) != 3 or rate <= 0:
+                raise CommandError(f'Row {number}: invalid rate for {currency!r}')
+            # Later rows win for the same currency and day
+            rates[(currency, day)] = FxRate(currency=currency, date=day, rate=rate)
+        return list(rates.values())
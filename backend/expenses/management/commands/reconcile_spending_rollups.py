@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.rollups import find_drift, rebuild_trip_rollups, trip_id_batches
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-trip spending rollups from the expenses table, or with --check "
+        "report trips whose rollups have drifted without changing anything."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trip', nargs='+', type=int, dest='trips', help='Only these trip IDs')
+        parser.add_argument('--check', action='store_true',
+                            help='Report drift and exit with an error if any is found')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        trips = 0
+        drifted = set()
+        for batch in trip_id_batches(options['batch_size'], options['trips']):
+            trips += len(batch)
+            if options['check']:
+                for trip_id, category, expected, stored in find_drift(batch):
+                    drifted.add(trip_id)
+                    scope = f'trip {trip_id}' + (f' [{category}]' if category else '')
+                    self.stdout.write(f'{scope}: expected {self.describe(expected)}, stored {self.describe(stored)}')
+            else:
+                rebuild_trip_rollups(batch)
+
+        if not options['check']:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt spending rollups for {trips} trips.'))
+        elif drifted:
+            raise CommandError(f'{len(drifted)} of {trips} trips have drifted rollups.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'All {trips} trip rollups are consistent.'))
+
+    @staticmethod
+    def describe(value):
+        if value is None:
+            return 'nothing'
+        total, count = value
+        return f'{total} over {count} expenses'
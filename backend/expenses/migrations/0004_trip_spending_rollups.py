@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0003_flight_hotel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripSpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollup', to='expenses.trip')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TripCategorySpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_spending', to='expenses.trip')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trip', 'category'), name='unique_trip_category_spending')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill(apps, schema_editor):
+    Expense = apps.get_model('expenses', 'Expense')
+    TripSpendingRollup = apps.get_model('expenses', 'TripSpendingRollup')
+    TripCategorySpending = apps.get_model('expenses', 'TripCategorySpending')
+
+    per_trip = Expense.objects.order_by().values('trip_id').annotate(total=Sum('amount'), count=Count('id'))
+    TripSpendingRollup.objects.bulk_create([
+        TripSpendingRollup(trip_id=row['trip_id'], total=row['total'], expense_count=row['count'])
+        for row in per_trip
+    ], batch_size=1000)
+
+    per_category = (
+        Expense.objects.order_by().values('trip_id', 'category').annotate(total=Sum('amount'), count=Count('id'))
+    )
+    TripCategorySpending.objects.bulk_create([
+        TripCategorySpending(
+            trip_id=row['trip_id'], category=row['category'], total=row['total'], expense_count=row['count']
+        )
+        for row in per_category
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_trip_spending_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
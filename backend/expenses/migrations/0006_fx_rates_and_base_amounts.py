@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+def fill_same_currency_amounts(apps, schema_editor):
+    # Expenses already in their trip's base currency need no rate; the rest are
+    # converted by `manage.py load_fx_rates` once rates are loaded
+    Expense = apps.get_model('expenses', 'Expense')
+    Expense.objects.filter(currency__iexact=models.F('trip__base_currency')).update(amount_base=models.F('amount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0005_backfill_trip_spending_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='amount_base',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='base_currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('currency', 'date'), name='unique_fx_rate_currency_date')],
+            },
+        ),
+        migrations.RunPython(fill_same_currency_amounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_empty_rollups(apps, schema_editor):
+    Trip = apps.get_model('expenses', 'Trip')
+    TripSpendingRollup = apps.get_model('expenses', 'TripSpendingRollup')
+
+    # 0005 only backfilled trips that had expenses; new trips now get a rollup when created
+    trip_ids = Trip.objects.filter(spending_rollup__isnull=True, expenses__isnull=True).values_list('id', flat=True)
+    TripSpendingRollup.objects.bulk_create(
+        [TripSpendingRollup(trip_id=trip_id) for trip_id in trip_ids.iterator(chunk_size=1000)],
+        batch_size=1000, ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_empty_rollups, migrations.RunPython.noop),
+    ]
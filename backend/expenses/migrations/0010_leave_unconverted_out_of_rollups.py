@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+
+ZERO = Decimal('0.00')
+
+
+def rebuild_mixed_currency_rollups(apps, schema_editor):
+    Expense = apps.get_model('expenses', 'Expense')
+    TripSpendingRollup = apps.get_model('expenses', 'TripSpendingRollup')
+    TripCategorySpending = apps.get_model('expenses', 'TripCategorySpending')
+
+    # Rollups used to count expenses without an FX rate at their foreign amount
+    trip_ids = list(Expense.objects.filter(amount_base__isnull=True).values_list('trip_id', flat=True).distinct())
+    spend = Coalesce('amount_base', Value(ZERO))
+    for start in range(0, len(trip_ids), 500):
+        batch = trip_ids[start:start + 500]
+        rows = (
+            Expense.objects.filter(trip_id__in=batch).order_by()
+            .values('trip_id', 'category').annotate(total=Sum(spend), count=Count('id'))
+        )
+        per_trip = {trip_id: [ZERO, 0] for trip_id in batch}
+        categories = []
+        for row in rows:
+            total = row['total'].quantize(Decimal('0.01'))
+            per_trip[row['trip_id']][0] += total
+            per_trip[row['trip_id']][1] += row['count']
+            categories.append(TripCategorySpending(
+                trip_id=row['trip_id'], category=row['category'], total=total, expense_count=row['count']
+            ))
+        TripSpendingRollup.objects.filter(trip_id__in=batch).delete()
+        TripCategorySpending.objects.filter(trip_id__in=batch).delete()
+        TripSpendingRollup.objects.bulk_create([
+            TripSpendingRollup(trip_id=trip_id, total=total, expense_count=count)
+            for trip_id, (total, count) in per_trip.items()
+        ])
+        TripCategorySpending.objects.bulk_create(categories)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0009_create_empty_trip_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_mixed_currency_rollups, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -11,10 +13,17 @@ class Trip(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     budget = models.DecimalField(max_digits=10, decimal_places=2)
+    base_currency = models.CharField(max_length=3, default="USD")
     notes = models.TextField(blank=True)
 
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Keyset pages of a user's trips
+            models.Index(fields=["user", "created_at", "id"], name="trip_user_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.destination})"
 
@@ -34,14 +43,31 @@ class Expense(models.Model):
     title = models.CharField(max_length=100, default="Untitled")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=10, default="USD")
+    # `amount` in the trip's base currency at the rate of `date`; null when no rate was available
+    amount_base = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
     note = models.TextField(blank=True)
     date = models.DateField()
 
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "trip", "date"], name="expense_user_trip_date_idx"),
+            models.Index(fields=["trip", "date"], name="expense_trip_date_idx"),
+            models.Index(fields=["user", "created_at", "id"], name="expense_user_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.amount} {self.currency} on {self.date}"
+
+    @property
+    def spend(self):
+        """
+        What the expense counts for against the trip budget: its amount in the
+        trip's base currency, or nothing until a rate for its currency is known.
+        """
+        return self.amount_base if self.amount_base is not None else Decimal('0.00')
     
     # def __str__(self):
     #     return f"{self.title} - ${self.amount}"
@@ -58,6 +84,11 @@ class Flight(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["trip", "departure_time"], name="flight_trip_departure_idx"),
+        ]
+
     def __str__(self):
         return f"{self.airline} {self.flight_number} ({self.departure_airport} → {self.arrival_airport})"
 
@@ -73,5 +104,54 @@ class Hotel(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["trip", "check_in"], name="hotel_trip_check_in_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.location})"
+
+class TripSpendingRollup(models.Model):
+    """Running totals of a trip's expenses, kept in step by ExpenseViewSet."""
+    trip = models.OneToOneField(Trip, on_delete=models.CASCADE, related_name="spending_rollup")
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.trip_id}: {self.total} over {self.expense_count} expenses"
+
+
+class TripCategorySpending(models.Model):
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="category_spending")
+    category = models.CharField(max_length=50)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["trip", "category"], name="unique_trip_category_spending"),
+        ]
+
+    def __str__(self):
+        return f"{self.trip_id} {self.category}: {self.total}"
+
+
+
+class FxRate(models.Model):
+    """Units of `currency` per one unit of the pivot currency (settings.FX_PIVOT_CURRENCY) on `date`."""
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["currency", "date"], name="unique_fx_rate_currency_date"),
+        ]
+
     def __str__(self):
-        return f"{self.name} ({self.location})"
\ No newline at end of file
+        return f"{self.currency} {self.rate} on {self.date}"
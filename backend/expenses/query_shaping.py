@@ -0,0 +1,40 @@
+from django.db.models import Prefetch
+
+from .models import Expense, Flight, Hotel
+
+# Nested collections of a trip and the order they are serialized in
+TRIP_COLLECTIONS = {
+    'expenses': lambda: Expense.objects.order_by('date', 'id'),
+    'flights': lambda: Flight.objects.order_by('departure_time', 'id'),
+    'hotels': lambda: Hotel.objects.order_by('check_in', 'id'),
+}
+
+
+def split_param(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def parse_fieldsets(query_params, expandable):
+    """
+    Read the sparse fieldset from `?fields=` and `?expand=`.
+
+    Returns (fields, expand): `fields` is the set of requested top-level fields
+    or None for all of them; `expand` is the set of nested collections to
+    include. Without `?expand=` every collection is expanded (unless `?fields=`
+    leaves it out), and an empty `?expand=` skips them all.
+    """
+    fields = split_param(query_params['fields']) if query_params.get('fields') else None
+    if 'expand' in query_params:
+        expand = split_param(query_params['expand']) & set(expandable)
+    else:
+        expand = set(expandable)
+    if fields is not None:
+        expand &= fields
+    return fields, expand
+
+
+def shape_trips(queryset, expand):
+    """Prefetch the expanded collections in one query each, already in display order."""
+    return queryset.prefetch_related(*[
+        Prefetch(name, queryset=TRIP_COLLECTIONS[name]()) for name in sorted(expand)
+    ])
@@ -0,0 +1,200 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from travel_smart.response_cache import TRIPS, invalidate
+
+from .models import Expense, Trip, TripCategorySpending, TripSpendingRollup
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+
+
+# Amounts count in the trip's base currency. An expense without a known FX rate adds
+# nothing until load_fx_rates converts it; summaries report it as unconverted.
+SPEND = Coalesce('amount_base', Value(ZERO))
+
+
+def add_to_rollup(trip_id, category, amount, count):
+    """
+    Add `amount` and `count` (negative to take away) to a trip's rollup.
+    Returns False, changing nothing, if the trip has no rollup yet.
+
+    The totals are changed with F-expression updates, so concurrent requests
+    cannot overwrite each other's changes.
+    """
+    updated = TripSpendingRollup.objects.filter(trip_id=trip_id).update(
+        total=F('total') + amount,
+        expense_count=F('expense_count') + count,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        return False
+
+    row, created = TripCategorySpending.objects.get_or_create(
+        trip_id=trip_id, category=category, defaults={'total': amount, 'expense_count': count}
+    )
+    if not created:
+        TripCategorySpending.objects.filter(pk=row.pk).update(
+            total=F('total') + amount,
+            expense_count=F('expense_count') + count
+        )
+    return True
+
+
+def trip_created(trip):
+    """Give a new trip its empty rollup, so its first expenses only update it instead of racing to build it."""
+    TripSpendingRollup.objects.get_or_create(trip=trip)
+
+
+def apply_expense_delta(trip_id, category, amount, count):
+    """
+    Apply the one change made to a trip's expenses. Call after the expense
+    was written, inside the same transaction.
+    """
+    if not add_to_rollup(trip_id, category, amount, count):
+        # First change for this trip: build the rollup from the table, which already has it
+        rebuild_trip_rollups([trip_id])
+
+
+def apply_expense_deltas(deltas):
+    """
+    Apply several changes, {(trip_id, category): (amount, count)}, after the
+    expenses were written. Trips without a rollup get one built from the
+    table in a single rebuild; it already counts their changes, so only the
+    trips that had a rollup get the deltas.
+    """
+    trip_ids = {trip_id for trip_id, _ in deltas}
+    existing = set(TripSpendingRollup.objects.filter(trip_id__in=trip_ids).values_list('trip_id', flat=True))
+    if trip_ids - existing:
+        rebuild_trip_rollups(sorted(trip_ids - existing))
+    for (trip_id, category), (amount, count) in deltas.items():
+        if trip_id in existing:
+            add_to_rollup(trip_id, category, amount, count)
+
+
+def expense_created(expense):
+    apply_expense_delta(expense.trip_id, expense.category, expense.spend, 1)
+
+
+def expense_deleted(expense):
+    """Call after the expense was deleted."""
+    apply_expense_delta(expense.trip_id, expense.category, -expense.spend, -1)
+
+
+def expense_changed(before, expense):
+    """`before` is the (trip_id, category, spend) of the expense prior to the update."""
+    trip_id, category, amount = before
+    if (trip_id, category) == (expense.trip_id, expense.category):
+        if amount != expense.spend:
+            apply_expense_delta(trip_id, category, expense.spend - amount, 0)
+        return
+    apply_expense_deltas({
+        (trip_id, category): (-amount, -1),
+        (expense.trip_id, expense.category): (expense.spend, 1),
+    })
+
+
+def trip_spending(trip):
+    """(total, expense_count, {category: total}) for a trip, read from its rollup."""
+    try:
+        rollup = trip.spending_rollup
+    except TripSpendingRollup.DoesNotExist:
+        rebuild_trip_rollups([trip.id])
+        rollup = TripSpendingRollup.objects.get(trip=trip)
+
+    categories = TripCategorySpending.objects.filter(trip=trip, expense_count__gt=0).values_list('category', 'total')
+    return rollup.total, rollup.expense_count, dict(categories)
+
+
+def expected_rollups(trip_ids):
+    """Totals recomputed from the expenses table: ({trip_id: (total, count)}, {(trip_id, category): (total, count)})."""
+    per_trip = {trip_id: (ZERO, 0) for trip_id in trip_ids}
+    per_category = {}
+    rows = (
+        Expense.objects.filter(trip_id__in=trip_ids).order_by()
+        .values('trip_id', 'category')
+        .annotate(total=Sum(SPEND), count=Count('id'))
+    )
+    for row in rows:
+        # Some backends (SQLite) sum decimals as floats, so round back to cents
+        amount = row['total'].quantize(CENT)
+        per_category[(row['trip_id'], row['category'])] = (amount, row['count'])
+        total, count = per_trip[row['trip_id']]
+        per_trip[row['trip_id']] = (total + amount, count + row['count'])
+    return per_trip, per_category
+
+
+def stored_rollups(trip_ids):
+    """The rollups as currently stored, in the same shape as expected_rollups."""
+    per_trip = {
+        trip_id: (total, count)
+        for trip_id, total, count in TripSpendingRollup.objects.filter(trip_id__in=trip_ids)
+        .values_list('trip_id', 'total', 'expense_count')
+    }
+    per_category = {
+        (trip_id, category): (total, count)
+        for trip_id, category, total, count in TripCategorySpending.objects.filter(trip_id__in=trip_ids)
+        .exclude(expense_count=0).values_list('trip_id', 'category', 'total', 'expense_count')
+    }
+    return per_trip, per_category
+
+
+def find_drift(trip_ids):
+    """List (trip_id, category or None, expected, stored) for every rollup that disagrees with the expenses."""
+    expected_trips, expected_categories = expected_rollups(trip_ids)
+    stored_trips, stored_categories = stored_rollups(trip_ids)
+
+    drift = []
+    for trip_id in trip_ids:
+        expected = expected_trips[trip_id]
+        stored = stored_trips.get(trip_id)
+        # A trip without expenses may simply never have had a rollup
+        if stored != expected and not (stored is None and expected == (ZERO, 0)):
+            drift.append((trip_id, None, expected, stored))
+    for key in sorted(set(expected_categories) | set(stored_categories)):
+        expected = expected_categories.get(key)
+        stored = stored_categories.get(key)
+        if stored != expected:
+            drift.append((key[0], key[1], expected, stored))
+    return drift
+
+
+def rebuild_trip_rollups(trip_ids):
+    """
+    Recompute the rollups of the given trips from their expenses in bulk. The
+    trip rows are locked first, so concurrent rebuilds of a trip run one after
+    the other and each reads the expenses the previous one committed.
+    """
+    with transaction.atomic():
+        list(Trip.objects.select_for_update().filter(id__in=trip_ids).order_by('id').values_list('id', flat=True))
+        per_trip, per_category = expected_rollups(trip_ids)
+        TripSpendingRollup.objects.filter(trip_id__in=trip_ids).delete()
+        TripCategorySpending.objects.filter(trip_id__in=trip_ids).delete()
+        TripSpendingRollup.objects.bulk_create([
+            TripSpendingRollup(trip_id=trip_id, total=total, expense_count=count)
+            for trip_id, (total, count) in per_trip.items()
+        ])
+        TripCategorySpending.objects.bulk_create([
+            TripCategorySpending(trip_id=trip_id, category=category, total=total, expense_count=count)
+            for (trip_id, category), (total, count) in per_category.items()
+        ])
+        invalidate(Trip.objects.filter(id__in=trip_ids).values_list('user_id', flat=True).distinct(), TRIPS)
+
+
+def trip_id_batches(batch_size=500, trip_ids=None):
+    """Trip IDs in batches, so reconciling every trip runs in bounded memory."""
+    queryset = Trip.objects.order_by('id').values_list('id', flat=True)
+    if trip_ids:
+        queryset = queryset.filter(id__in=trip_ids)
+    batch = []
+    for trip_id in queryset.iterator(chunk_size=batch_size):
+        batch.append(trip_id)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,11 +1,35 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import Trip, Expense, Flight, Hotel
+from .aggregates import INTERVALS
+from .fx import normalize_currency
+from .query_shaping import TRIP_COLLECTIONS, parse_fieldsets
 
 class ExpenseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Expense
         fields = '__all__'
-        read_only_fields = ['id', 'user', 'created_at']
+        read_only_fields = ['id', 'user', 'created_at', 'amount_base']
+
+    def validate_currency(self, value):
+        return normalize_currency(value)
+
+class ExpenseImportRowSerializer(serializers.ModelSerializer):
+    """One row of a bulk import; `trip` is checked against the importing user's trip IDs in the context."""
+    trip = serializers.IntegerField()
+
+    class Meta:
+        model = Expense
+        fields = ['trip', 'title', 'amount', 'currency', 'category', 'note', 'date']
+
+    def validate_trip(self, value):
+        if value not in self.context['trips']:
+            raise serializers.ValidationError("You don't own this trip.")
+        return value
+
+    def validate_currency(self, value):
+        return normalize_currency(value)
 
 class FlightSerializer(serializers.ModelSerializer):
     class Meta:
@@ -19,13 +43,65 @@ class HotelSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id', 'created_at']
 
-class TripSerializer(serializers.ModelSerializer):
-    user = serializers.ReadOnlyField(source='user.id')
+class SparseFieldsetMixin:
+    """Drop the fields and nested collections left out by `?fields=` / `?expand=`."""
+    expandable = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+
+        fields, expand = parse_fieldsets(request.query_params, self.expandable)
+        for name in list(self.fields):
+            if name in self.expandable:
+                keep = name in expand
+            else:
+                keep = fields is None or name in fields
+            if not keep:
+                self.fields.pop(name)
+
+
+class TripSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    expandable = tuple(TRIP_COLLECTIONS)
+
+    user = serializers.ReadOnlyField(source='user_id')
     expenses = ExpenseSerializer(many=True, read_only=True)
     flights = FlightSerializer(many=True, read_only=True)
     hotels = HotelSerializer(many=True, read_only=True)
+    total_spent = serializers.SerializerMethodField()
+    remaining = serializers.SerializerMethodField()
 
     class Meta:
         model = Trip
         fields = '__all__'
-        read_only_fields = ['id', 'user', 'created_at', 'expenses', 'flights', 'hotels']
\ No newline at end of file
+        read_only_fields = ['id', 'user', 'created_at', 'expenses', 'flights', 'hotels']
+
+    def validate_base_currency(self, value):
+        value = normalize_currency(value)
+        if len(value) != 3 or not value.isalpha():
+            raise serializers.ValidationError("Use a three-letter ISO 4217 currency code.")
+        return value
+
+    def spent(self, trip):
+        # Read from the spending rollup joined in by the view; no rollup means no expenses yet
+        rollup = getattr(trip, 'spending_rollup', None)
+        return rollup.total if rollup is not None else Decimal('0.00')
+
+    def get_total_spent(self, trip):
+        return f'{self.spent(trip):.2f}'
+
+    def get_remaining(self, trip):
+        return f'{trip.budget - self.spent(trip):.2f}'
+
+
+class SpendingAnalyticsQuerySerializer(serializers.Serializer):
+    interval = serializers.ChoiceField(choices=list(INTERVALS), default='month')
+    top = serializers.IntegerField(min_value=1, max_value=20, default=5)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    currency = serializers.CharField(max_length=3, required=False)
+
+    def validate_currency(self, value):
+        return normalize_currency(value)
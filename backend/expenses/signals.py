@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from travel_smart.response_cache import TIMELINE, TRIPS, invalidate
+
+from . import rollups
+from .models import Expense, Flight, Hotel, Trip
+
+
+@receiver([post_save, post_delete], sender=Trip)
+def trip_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id, TRIPS, TIMELINE)
+
+
+@receiver(post_save, sender=Trip)
+def trip_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.trip_created(instance)
+
+
+@receiver([post_save, post_delete], sender=Expense)
+def expense_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id, TRIPS)
+
+
+@receiver([post_save, post_delete], sender=Flight)
+@receiver([post_save, post_delete], sender=Hotel)
+def itinerary_changed(sender, instance, **kwargs):
+    invalidate(Trip.objects.filter(pk=instance.trip_id).values_list('user_id', flat=True), TRIPS, TIMELINE)
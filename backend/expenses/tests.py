@@ -1,3 +1,760 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate, make_aware
+from rest_framework.test import APIClient
+
+from flights.models import Booking
+from hotels.models import HotelBooking
+from travel_smart import response_cache
+from travel_smart.query_plans import QueryPlanTestCase, bulk_seed
+
+from . import fx, rollups
+from .timeline import upcoming_timeline
+from .models import Trip, Expense, Flight, FxRate, Hotel, TripSpendingRollup
+
+User = get_user_model()
+
+
+class TripListQueryCountTests(TestCase):
+    """The trip list must run a fixed number of queries however many trips there are."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='traveler', email='traveler@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_trip(self, index):
+        trip = Trip.objects.create(
+            user=self.user, name=f'Trip {index}', destination='Lisbon',
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 8), budget=Decimal('1500.00')
+        )
+        for day in (3, 1, 2):
+            Expense.objects.create(
+                user=self.user, trip=trip, amount=Decimal('10.00'), category='Food',
+                date=date(2025, 5, day)
+            )
+        departs = datetime(2025, 5, 1, 9, tzinfo=timezone.utc)
+        Flight.objects.create(
+            trip=trip, airline='TP', flight_number='TP202', departure_airport='JFK',
+            arrival_airport='LIS', departure_time=departs, arrival_time=departs + timedelta(hours=7)
+        )
+        Hotel.objects.create(
+            trip=trip, name='Hotel Avenida', location='Lisbon',
+            check_in=date(2025, 5, 1), check_out=date(2025, 5, 8)
+        )
+        return trip
+
+    def count_list_queries(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/trips/', params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_list_queries_do_not_grow_with_trips(self):
+        self.make_trip(1)
+        one_trip, _ = self.count_list_queries()
+        for index in range(2, 11):
+            self.make_trip(index)
+        ten_trips, data = self.count_list_queries()
+
+        self.assertEqual(len(data), 10)
+        self.assertEqual(one_trip, ten_trips)
+        # Trips plus one prefetch per nested collection
+        self.assertEqual(ten_trips, 4)
+
+    def test_detail_prefetches_nested_collections(self):
+        trip = self.make_trip(1)
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/trips/{trip.id}/')
+        self.assertEqual(len(response.data['expenses']), 3)
+
+    def test_nested_expenses_are_ordered_by_date(self):
+        self.make_trip(1)
+        _, data = self.count_list_queries()
+        dates = [expense['date'] for expense in data[0]['expenses']]
+        self.assertEqual(dates, sorted(dates))
+
+    def test_fields_without_collections_skips_prefetches(self):
+        for index in range(3):
+            self.make_trip(index)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/trips/', {'fields': 'id,name,budget'})
+        self.assertEqual(set(response.data[0]), {'id', 'name', 'budget'})
+
+    def test_empty_expand_keeps_scalar_fields(self):
+        self.make_trip(1)
+        queries, data = self.count_list_queries({'expand': ''})
+        self.assertEqual(queries, 1)
+        self.assertIn('destination', data[0])
+        self.assertNotIn('expenses', data[0])
+
+    def test_expand_selects_collections(self):
+        for index in range(3):
+            self.make_trip(index)
+        queries, data = self.count_list_queries({'expand': 'flights'})
+        self.assertEqual(queries, 2)
+        self.assertIn('flights', data[0])
+        self.assertNotIn('hotels', data[0])
+        self.assertNotIn('expenses', data[0])
+
+
+class TripRollupTests(TestCase):
+    """Expense writes through the API keep the trip rollups equal to the expenses table."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='spender', email='spender@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.trip = self.make_trip('Lisbon')
+
+    def make_trip(self, name):
+        return Trip.objects.create(
+            user=self.user, name=name, destination=name,
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 8), budget=Decimal('1500.00')
+        )
+
+    def add_expense(self, amount, category='Food', trip=None):
+        """An expense written outside the API, so no rollup is touched."""
+        return Expense.objects.create(
+            user=self.user, trip=trip or self.trip, amount=Decimal(amount), amount_base=Decimal(amount),
+            currency='USD', category=category, date=date(2025, 5, 2)
+        )
+
+    def drop_rollups(self, *trips):
+        """Make trips look like ones created before rollups were kept."""
+        TripSpendingRollup.objects.filter(trip__in=trips or [self.trip]).delete()
+
+    def post_expense(self, amount, category='Food', trip=None):
+        response = self.client.post('/api/expenses/', {
+            'trip': (trip or self.trip).id, 'amount': amount, 'currency': 'USD',
+            'category': category, 'date': '2025-05-02'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def assertRollup(self, total, count, trip=None):
+        trip = trip or self.trip
+        self.assertEqual(rollups.find_drift([trip.id]), [])
+        rollup = TripSpendingRollup.objects.get(trip=trip)
+        self.assertEqual((rollup.total, rollup.expense_count), (Decimal(total), count))
+
+    def test_new_trip_starts_with_an_empty_rollup(self):
+        self.assertRollup('0.00', 0)
+        self.post_expense('10.00')
+        self.assertRollup('10.00', 1)
+
+    def test_create(self):
+        self.post_expense('10.00')
+        self.post_expense('5.00', 'Misc')
+        self.assertRollup('15.00', 2)
+
+    def test_update_amount_and_category(self):
+        expense_id = self.post_expense('10.00')
+        self.post_expense('4.00', 'Misc')
+        self.client.patch(f'/api/expenses/{expense_id}/', {'amount': '12.50'}, format='json')
+        self.assertRollup('16.50', 2)
+        self.client.patch(f'/api/expenses/{expense_id}/', {'category': 'Misc'}, format='json')
+        self.assertRollup('16.50', 2)
+
+    def test_move_to_another_trip(self):
+        other = self.make_trip('Porto')
+        expense_id = self.post_expense('10.00')
+        self.post_expense('3.00')
+        self.client.patch(f'/api/expenses/{expense_id}/', {'trip': other.id}, format='json')
+        self.assertRollup('3.00', 1)
+        self.assertRollup('10.00', 1, trip=other)
+
+    def test_delete(self):
+        expense_id = self.post_expense('10.00')
+        self.post_expense('7.00')
+        self.client.delete(f'/api/expenses/{expense_id}/')
+        self.assertRollup('7.00', 1)
+
+    def test_delete_without_rollup(self):
+        expense = self.add_expense('10.00')
+        self.add_expense('7.00')
+        self.drop_rollups()
+        self.client.delete(f'/api/expenses/{expense.id}/')
+        self.assertRollup('7.00', 1)
+
+    def test_create_without_rollup(self):
+        self.add_expense('10.00')
+        self.drop_rollups()
+        self.post_expense('5.00', 'Misc')
+        self.assertRollup('15.00', 2)
+
+    def test_category_change_without_rollup(self):
+        expense = self.add_expense('10.00')
+        self.add_expense('2.00', 'Misc')
+        self.drop_rollups()
+        self.client.patch(f'/api/expenses/{expense.id}/', {'category': 'Misc'}, format='json')
+        self.assertRollup('12.00', 2)
+
+    def test_move_between_trips_without_rollups(self):
+        other = self.make_trip('Porto')
+        expense = self.add_expense('10.00')
+        self.add_expense('6.00', trip=other)
+        self.drop_rollups(self.trip, other)
+        self.client.patch(f'/api/expenses/{expense.id}/', {'trip': other.id}, format='json')
+        self.assertRollup('0.00', 0)
+        self.assertRollup('16.00', 2, trip=other)
+
+    def test_cannot_move_expense_to_another_users_trip(self):
+        stranger = User.objects.create_user(username='stranger', email='stranger@example.com', password='pw')
+        theirs = Trip.objects.create(
+            user=stranger, name='Oslo', destination='Oslo',
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 8), budget=Decimal('900.00')
+        )
+        expense_id = self.post_expense('10.00')
+        response = self.client.patch(f'/api/expenses/{expense_id}/', {'trip': theirs.id}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertRollup('10.00', 1)
+        self.assertRollup('0.00', 0, trip=theirs)
+
+    def bulk_import(self, trip, rows):
+        response = self.client.post(f'/api/expenses/bulk/?trip={trip.id}', [
+            {'amount': amount, 'currency': 'USD', 'category': category, 'date': '2025-05-02'}
+            for amount, category in rows
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_bulk_import_into_new_trip(self):
+        response = self.client.post('/api/trips/', {
+            'name': 'Madrid', 'destination': 'Madrid', 'start_date': '2025-06-01',
+            'end_date': '2025-06-05', 'budget': '900.00'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        trip = Trip.objects.get(pk=response.data['id'])
+        self.bulk_import(trip, [('10.00', 'Food'), ('5.00', 'Misc'), ('2.50', 'Transport')])
+        self.assertRollup('17.50', 3, trip=trip)
+
+    def test_bulk_import_into_trips_with_and_without_rollup(self):
+        self.post_expense('1.00')
+        other = self.make_trip('Porto')
+        self.drop_rollups(other)
+        self.bulk_import(self.trip, [('10.00', 'Food'), ('5.00', 'Misc')])
+        self.bulk_import(other, [('4.00', 'Food'), ('6.00', 'Shopping')])
+        self.assertRollup('16.00', 3)
+        self.assertRollup('10.00', 2, trip=other)
+
+
+class FxTests(TestCase):
+    """Amounts are converted at the rate of their date; without a rate they stay out of base totals."""
+
+    def setUp(self):
+        fx.reset_fx_rates()
+        self.addCleanup(fx.reset_fx_rates)
+        FxRate.objects.bulk_create([
+            FxRate(currency='EUR', date=date(2025, 5, 1), rate=Decimal('0.9')),
+            FxRate(currency='EUR', date=date(2025, 5, 5), rate=Decimal('0.8')),
+            FxRate(currency='GBP', date=date(2025, 5, 1), rate=Decimal('0.75')),
+        ])
+        self.user = User.objects.create_user(username='abroad', email='abroad@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.trip = Trip.objects.create(
+            user=self.user, name='Tokyo', destination='Tokyo', base_currency='USD',
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 8), budget=Decimal('1500.00')
+        )
+
+    def test_convert_uses_latest_rate_on_or_before_the_date(self):
+        converted = fx.FxRates(pivot='USD').convert(
+            [Decimal('90'), Decimal('80'), Decimal('90'), Decimal('75'), Decimal('12.3456'), Decimal('5')],
+            ['eur', 'EUR', 'EUR', 'GBP', 'USD', 'JPY'],
+            [date(2025, 5, 3), date(2025, 5, 9), date(2025, 4, 30), date(2025, 5, 2), date(2025, 5, 2), date(2025, 5, 2)],
+            ['USD', 'USD', 'USD', 'EUR', 'USD', 'USD'],
+        )
+        self.assertEqual(converted, [
+            Decimal('100.00'),  # 90 / 0.9
+            Decimal('100.00'),  # the later rate, 80 / 0.8
+            None,               # before the first known rate
+            Decimal('90.00'),   # GBP -> EUR through the pivot
+            Decimal('12.35'),   # same currency, rounded
+            None,               # no rates at all
+        ])
+
+    def post_expense(self, amount, currency):
+        response = self.client.post('/api/expenses/', {
+            'trip': self.trip.id, 'amount': amount, 'currency': currency,
+            'category': 'Food', 'date': '2025-05-02'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Expense.objects.get(pk=response.data['id'])
+
+    def summary(self):
+        response = self.client.get(f'/api/trips/{self.trip.id}/summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_expense_without_rate_is_left_out_of_base_totals(self):
+        self.post_expense('10.00', 'USD')
+        self.assertEqual(self.post_expense('90.00', 'EUR').amount_base, Decimal('100.00'))
+        self.assertIsNone(self.post_expense('1500', 'JPY').amount_base)
+
+        rollup = TripSpendingRollup.objects.get(trip=self.trip)
+        self.assertEqual((rollup.total, rollup.expense_count), (Decimal('110.00'), 3))
+        summary = self.summary()
+        self.assertEqual(summary['total_spent'], 110.0)
+        self.assertEqual(summary['unconverted'], {'JPY': 1500.0})
+        self.assertEqual(rollups.find_drift([self.trip.id]), [])
+
+    def test_load_fx_rates_converts_missing_amounts(self):
+        self.post_expense('10.00', 'USD')
+        expense = self.post_expense('1500', 'JPY')
+
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w') as file:
+            file.write('date,currency,rate\n2025-05-01,jpy,150\n2025-05-01,JPY,120\n')
+        call_command('load_fx_rates', file=path, stdout=StringIO())
+
+        # Later rows win for the same currency and day
+        self.assertEqual(FxRate.objects.get(currency='JPY').rate, Decimal('120'))
+        expense.refresh_from_db()
+        self.assertEqual(expense.amount_base, Decimal('12.50'))
+        self.assertEqual(TripSpendingRollup.objects.get(trip=self.trip).total, Decimal('22.50'))
+        summary = self.summary()
+        self.assertEqual((summary['total_spent'], summary['unconverted']), (22.5, {}))
+
+
+class SpendingSummaryTests(TestCase):
+    """Trip summaries and cross-trip analytics add up the expenses, converted where a rate is known."""
+
+    def setUp(self):
+        fx.reset_fx_rates()
+        self.addCleanup(fx.reset_fx_rates)
+        FxRate.objects.create(currency='EUR', date=date(2025, 1, 1), rate=Decimal('0.8'))
+        self.user = User.objects.create_user(username='analyst', email='analyst@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.lisbon = self.make_trip(self.user, 'Lisbon', 'USD', date(2025, 5, 1))
+        self.paris = self.make_trip(self.user, 'Paris', 'EUR', date(2025, 6, 1))
+        self.post_expense(self.lisbon, '40.00', 'USD', 'Food', '2025-05-01')
+        self.post_expense(self.lisbon, '60.00', 'USD', 'Transport', '2025-05-01')
+        self.post_expense(self.lisbon, '16.00', 'EUR', 'Food', '2025-05-02')
+        self.post_expense(self.lisbon, '1000', 'JPY', 'Shopping', '2025-05-02')
+        self.post_expense(self.paris, '80.00', 'EUR', 'Hotels', '2025-06-03')
+        stranger = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        Expense.objects.create(
+            user=stranger, trip=self.make_trip(stranger, 'Rome', 'USD', date(2025, 5, 1)), amount=Decimal('999.00'),
+            amount_base=Decimal('999.00'), currency='USD', category='Food', date=date(2025, 5, 1)
+        )
+
+    def make_trip(self, user, name, base_currency, start):
+        return Trip.objects.create(
+            user=user, name=name, destination=name, base_currency=base_currency,
+            start_date=start, end_date=start + timedelta(days=7), budget=Decimal('500.00')
+        )
+
+    def post_expense(self, trip, amount, currency, category, day):
+        response = self.client.post('/api/expenses/', {
+            'trip': trip.id, 'amount': amount, 'currency': currency, 'category': category, 'date': day
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def analytics(self, query=''):
+        response = self.client.get(f'/api/trips/analytics/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_trip_summary(self):
+        response = self.client.get(f'/api/trips/{self.lisbon.id}/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'trip': 'Lisbon',
+            'base_currency': 'USD',
+            'budget': 500.0,
+            'total_spent': 120.0,
+            'remaining': 380.0,
+            'category_breakdown': {'Food': 60.0, 'Transport': 60.0, 'Shopping': 0.0},
+            'daily_breakdown': {'2025-05-01': 100.0, '2025-05-02': 20.0},
+            'currency_breakdown': {'USD': 100.0, 'EUR': 16.0, 'JPY': 1000.0},
+            'expense_count': 4,
+            'unconverted': {'JPY': 1000.0},
+        })
+
+    def test_analytics_across_trips(self):
+        data = self.analytics()
+        self.assertEqual((data['interval'], data['currency']), ('month', 'USD'))
+        self.assertEqual(data['total_spent'], 220.0)
+        self.assertEqual(data['spend_over_time'], [
+            {'period': '2025-05-01', 'total': 120.0}, {'period': '2025-06-01', 'total': 100.0}
+        ])
+        self.assertEqual([item['category'] for item in data['top_categories']], ['Hotels', 'Food', 'Transport'])
+        self.assertEqual(data['top_categories'][0]['share'], round(100 / 220, 4))
+        self.assertEqual([(trip['name'], trip['total_spent']) for trip in data['trips']],
+                         [('Lisbon', 120.0), ('Paris', 80.0)])
+        self.assertEqual(data['unconverted'], {'JPY': 1000.0})
+
+    def test_analytics_period_currency_and_top(self):
+        data = self.analytics('?interval=day&currency=eur&start=2025-05-02&end=2025-05-31&top=1')
+        self.assertEqual(data['currency'], 'EUR')
+        self.assertEqual(data['spend_over_time'], [{'period': '2025-05-02', 'total': 16.0}])
+        self.assertEqual(data['top_categories'], [{'category': 'Food', 'total': 16.0, 'share': 1.0}])
+
+    def test_analytics_rejects_unknown_interval(self):
+        self.assertEqual(self.client.get('/api/trips/analytics/?interval=year').status_code, 400)
+
+
+@override_settings(API_MAX_PAGE_SIZE=50)
+class KeysetPaginationTests(TestCase):
+    """Cursor pages cover every row once, in order, however rows tie or change between requests."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', email='pager@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.trip = Trip.objects.create(
+            user=self.user, name='Lisbon', destination='Lisbon',
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 8), budget=Decimal('1500.00')
+        )
+        # Several expenses share a timestamp, so only the id tells them apart
+        moments = [datetime(2025, 5, 1, 9, tzinfo=timezone.utc) + timedelta(minutes=index // 3) for index in range(10)]
+        self.expenses = [self.add_expense(moment) for moment in moments]
+
+    def add_expense(self, created_at):
+        return Expense.objects.create(
+            user=self.user, trip=self.trip, amount=Decimal('1.00'), amount_base=Decimal('1.00'),
+            currency='USD', category='Food', date=date(2025, 5, 1), created_at=created_at
+        )
+
+    def get(self, query):
+        return self.client.get(f'/api/expenses/{query}')
+
+    def all_pages(self, page_size, between_pages=None):
+        """Ids of every page, following the Link header from the first page on."""
+        ids, url = [], f'/api/expenses/?page_size={page_size}'
+        while True:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [expense['id'] for expense in response.data]
+            if 'Link' not in response.headers:
+                self.assertNotIn('X-Next-Cursor', response.headers)
+                return ids
+            url = response.headers['Link'].split('>')[0].lstrip('<')
+            if between_pages:
+                between_pages()
+
+    def test_pages_cover_ties_once_in_order(self):
+        for page_size in (1, 2, 3, 4, 10, 11):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(self.all_pages(page_size), [expense.id for expense in self.expenses])
+
+    def test_rows_added_meanwhile_do_not_shift_later_pages(self):
+        expected = [expense.id for expense in self.expenses]
+        early = datetime(2025, 4, 1, tzinfo=timezone.utc)
+        late = datetime(2025, 6, 1, tzinfo=timezone.utc)
+        added = []
+        ids = self.all_pages(3, lambda: added.extend([self.add_expense(early).id, self.add_expense(late).id]))
+        # Rows sorting before the cursor are not seen; rows after it are, once each
+        self.assertEqual([expense_id for expense_id in ids if expense_id in expected], expected)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual([expense_id for expense_id in ids if expense_id not in expected], added[1::2])
+
+    def test_total_count_and_page_size_limits(self):
+        response = self.get('?page_size=4&count=true')
+        self.assertEqual((len(response.data), response.headers['X-Total-Count']), (4, '10'))
+        for index in range(60):
+            self.add_expense(datetime(2025, 7, 1, tzinfo=timezone.utc))
+        self.assertEqual(len(self.get('?page_size=1000').data), 50)
+
+    def test_bad_parameters_are_refused(self):
+        for query in ('?cursor=not-a-cursor', '?cursor=WyJ4Il0=', '?page_size=0', '?page_size=many'):
+            with self.subTest(query=query):
+                self.assertEqual(self.get(query).status_code, 400)
+
+
+class TimelineTests(TestCase):
+    """The upcoming feed merges the four sources in date order and pages through them without gaps."""
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        self.user = User.objects.create_user(username='planner', email='planner@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = localdate()
+        self.trip = Trip.objects.create(
+            user=self.user, name='Lisbon', destination='Lisbon', start_date=self.today,
+            end_date=self.day(10), budget=Decimal('1500.00')
+        )
+        self.booking(-1)
+        self.booking(3, status='cancelled')
+        self.hotel_booking(5, status='cancelled')
+        self.expected = [
+            ('flight_booking', self.booking(0)),
+            ('hotel_booking', self.hotel_booking(0)),
+            # Dates without a time sort at midnight, ahead of timed flights that day
+            ('hotel', self.hotel(0)),
+            ('flight', self.flight(0, 8)),
+            ('flight', self.flight(1, 7)),
+            ('flight', self.flight(1, 18)),
+            ('flight_booking', self.booking(2)),
+            ('hotel', self.hotel(2)),
+            ('hotel_booking', self.hotel_booking(4)),
+        ]
+        stranger = User.objects.create_user(username='stranger', email='stranger@example.com', password='pw')
+        Booking.objects.create(
+            user=stranger, departure='JFK', arrival='MAD', departure_date=self.day(1), price=Decimal('1.00'),
+            currency='USD', travelers=[], booking_reference='OTHER', status='confirmed'
+        )
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def booking(self, offset, status='confirmed'):
+        return Booking.objects.create(
+            user=self.user, departure='JFK', arrival='LIS', departure_date=self.day(offset), price=Decimal('420.00'),
+            currency='USD', travelers=[], booking_reference=f'REF{Booking.objects.count()}', status=status
+        ).id
+
+    def hotel_booking(self, offset, status='confirmed'):
+        return HotelBooking.objects.create(
+            user=self.user, booking_id=f'HB{HotelBooking.objects.count()}', hotel_id='HLLIS001',
+            hotel_name='Hotel Avenida', check_in_date=self.day(offset), check_out_date=self.day(offset + 2),
+            number_of_guests=2, room_type='Double', total_price=Decimal('300.00'), status=status
+        ).id
+
+    def flight(self, offset, hour):
+        departs = make_aware(datetime.combine(self.day(offset), datetime.min.time()) + timedelta(hours=hour))
+        return Flight.objects.create(
+            trip=self.trip, airline='TP', flight_number='TP202', departure_airport='LIS',
+            arrival_airport='OPO', departure_time=departs, arrival_time=departs + timedelta(hours=1)
+        ).id
+
+    def hotel(self, offset):
+        return Hotel.objects.create(
+            trip=self.trip, name='Pestana', location='Porto', check_in=self.day(offset), check_out=self.day(offset + 1)
+        ).id
+
+    def test_sources_are_merged_in_date_order(self):
+        page = upcoming_timeline(self.user, page_size=50)
+        self.assertEqual([(item['type'], item['id']) for item in page.items], self.expected)
+        self.assertEqual(page.items[0]['date'], self.today.isoformat())
+        self.assertIsNone(page.next_cursor)
+
+    def test_pages_follow_on_without_gaps(self):
+        for page_size in (1, 2, 4):
+            with self.subTest(page_size=page_size):
+                seen, cursor = [], None
+                while True:
+                    page = upcoming_timeline(self.user, cursor, page_size)
+                    seen += [(item['type'], item['id']) for item in page.items]
+                    cursor = page.next_cursor
+                    if cursor is None:
+                        break
+                self.assertEqual(seen, self.expected)
+
+    def test_endpoint_pages_and_rejects_bad_cursors(self):
+        response = self.client.get('/api/trips/upcoming/?page_size=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(item['type'], item['id']) for item in response.data], self.expected[:3])
+        self.assertIn('X-Next-Cursor', response.headers)
+        for cursor in ('bad', 'WyJ4IiwxLDIsM10=', 'WzAsMCwwLDBd'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(f'/api/trips/upcoming/?cursor={cursor}').status_code, 400)
+
+
+class ExportTests(TestCase):
+    """Exports stream only the caller's expenses, in both formats, with their base amounts."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', email='exporter@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.trip = self.make_trip(self.user, 'Lisbon')
+        self.other_trip = self.make_trip(self.user, 'Porto')
+        other = User.objects.create_user(username='stranger', email='stranger@example.com', password='pw')
+        self.add_expense(self.trip, '12.50', date(2025, 5, 2))
+        self.add_expense(self.other_trip, '7.25', date(2025, 5, 1))
+        self.add_expense(self.make_trip(other, 'Faro'), '99.00', date(2025, 5, 1))
+
+    def make_trip(self, user, name):
+        return Trip.objects.create(
+            user=user, name=name, destination=name,
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 8), budget=Decimal('1500.00')
+        )
+
+    def add_expense(self, trip, amount, day):
+        return Expense.objects.create(
+            user=trip.user, trip=trip, amount=Decimal(amount), amount_base=Decimal(amount),
+            currency='USD', category='Food', date=day
+        )
+
+    def export(self, query=''):
+        response = self.client.get(f'/api/expenses/export/{query}')
+        body = b''.join(response.streaming_content).decode() if response.streaming else None
+        return response, body
+
+    def test_csv_export(self):
+        response, body = self.export()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual([row['amount'] for row in rows], ['7.25', '12.50'])
+        self.assertEqual(rows[1]['amount_base'], '12.50')
+        self.assertEqual(rows[1]['trip_id'], str(self.trip.id))
+
+    def test_ndjson_export_of_one_trip(self):
+        response, body = self.export(f'?output=ndjson&trip={self.trip.id}')
+        self.assertEqual(response.status_code, 200)
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['amount'], rows[0]['amount_base']), ('12.50', '12.50'))
+
+    def test_invalid_parameters_are_refused_before_streaming(self):
+        for query in ('?trip=lisbon', '?output=xml'):
+            with self.subTest(query=query):
+                response, _ = self.export(query)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.streaming)
+
+
+class ResponseCacheTests(TestCase):
+    """The trip list is cached per user, answered with 304 on a matching ETag and dropped on writes."""
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        self.user = User.objects.create_user(username='cached', email='cached@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.trip = Trip.objects.create(
+            user=self.user, name='Lisbon', destination='Lisbon',
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 8), budget=Decimal('1500.00')
+        )
+
+    def version(self):
+        return response_cache.get_cache().get(response_cache.version_key(self.user.id, response_cache.TRIPS))
+
+    def test_second_load_is_served_from_cache(self):
+        first = self.client.get('/api/trips/')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/trips/')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get('/api/trips/')['ETag']
+        self.assertTrue(etag)
+        response = self.client.get('/api/trips/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/trips/', HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_cache_is_per_user(self):
+        self.client.get('/api/trips/')
+        other = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/trips/').data, [])
+
+    def test_write_invalidates_and_changes_etag(self):
+        etag = self.client.get('/api/trips/')['ETag']
+        response = self.client.patch(f'/api/trips/{self.trip.id}/', {'name': 'Porto'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/api/trips/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['name'], 'Porto')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalidation_is_repeated_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                response_cache.invalidate(self.user.id, response_cache.TRIPS)
+                bumped = self.version()
+        self.assertIsNotNone(bumped)
+        self.assertEqual(len(callbacks), 1)
+
+        # A request re-caching the old rows before the commit is orphaned by the second bump
+        self.client.get('/api/trips/')
+        callbacks[0]()
+        self.assertGreater(self.version(), bumped)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/trips/')
+        self.assertGreater(len(queries), 0)
+
+
+class ExpenseQueryPlanTests(QueryPlanTestCase):
+    """Trip, expense, flight and hotel endpoints must stay on indexes at volume."""
+    users = 200
+    expenses_per_trip = 50
+
+    @classmethod
+    def seed(cls):
+        users = User.objects.bulk_create([
+            User(username=f'planner{index}', email=f'planner{index}@example.com') for index in range(cls.users)
+        ])
+        cls.user = users[0]
+        trip_count = max(cls.seed_rows // cls.expenses_per_trip, cls.users)
+        bulk_seed(Trip, (
+            Trip(
+                user=users[index % cls.users], name=f'Trip {index}', destination='Lisbon',
+                start_date=date(2025, 1, 1) + timedelta(days=index % 365),
+                end_date=date(2025, 1, 8) + timedelta(days=index % 365), budget=Decimal('1500.00')
+            )
+            for index in range(trip_count)
+        ))
+        trip_ids = list(Trip.objects.order_by('id').values_list('id', 'user_id'))
+        cls.trip_id = next(trip_id for trip_id, user_id in trip_ids if user_id == cls.user.id)
+
+        bulk_seed(Expense, (
+            Expense(
+                user_id=user_id, trip_id=trip_id, amount=Decimal('12.50'), category='Food',
+                date=date(2025, 1, 1) + timedelta(days=index % 365)
+            )
+            for index in range(cls.seed_rows)
+            for trip_id, user_id in [trip_ids[index % len(trip_ids)]]
+        ))
+        departs = datetime(2025, 5, 1, 9, tzinfo=timezone.utc)
+        bulk_seed(Flight, (
+            Flight(
+                trip_id=trip_id, airline='TP', flight_number='TP202', departure_airport='JFK',
+                arrival_airport='LIS', departure_time=departs, arrival_time=departs + timedelta(hours=7)
+            )
+            for trip_id, _ in trip_ids
+        ))
+        bulk_seed(Hotel, (
+            Hotel(trip_id=trip_id, name='Hotel Avenida', location='Lisbon',
+                  check_in=date(2025, 5, 1), check_out=date(2025, 5, 8))
+            for trip_id, _ in trip_ids
+        ))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, params=None):
+        response = self.assertIndexedQueries(lambda: self.client.get(url, params or {}))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_trip_list(self):
+        self.get('/api/trips/')
+
+    def test_trip_summary(self):
+        self.get(f'/api/trips/{self.trip_id}/summary/')
+
+    def test_spending_analytics(self):
+        # The rate table signature check is a periodic COUNT/MAX over a small table
+        response = self.assertIndexedQueries(lambda: self.client.get('/api/trips/analytics/'), allowed={'expenses_fxrate'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_expense_list(self):
+        self.get('/api/expenses/')
+
+    def test_flight_and_hotel_lists(self):
+        for url in ('/api/flights/', '/api/hotels/'):
+            self.get(url)
+            self.get(url, {'trip': self.trip_id})
@@ -0,0 +1,135 @@
+"""
+Upcoming-trip timeline across flight and hotel bookings and the flights and
+hotels entered on trips.
+
+Each source is one indexed query filtered to today onwards and ordered by
+date; heapq.merge interleaves them lazily, so a page reads only as many rows
+from each source as it shows.
+"""
+import datetime
+import heapq
+from itertools import islice
+
+from django.utils import timezone
+
+from flights.models import Booking
+from hotels.models import HotelBooking
+from travel_smart.pagination import Page, encode_cursor, read_cursor
+
+from .models import Flight, Hotel
+
+
+def day_key(value):
+    """(date ordinal, microseconds into the day) of a date or aware datetime, in local time."""
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value)
+        since_midnight = value.replace(tzinfo=None) - datetime.datetime.combine(value.date(), datetime.time.min)
+        return value.date().toordinal(), since_midnight // datetime.timedelta(microseconds=1)
+    return value.toordinal(), 0
+
+
+def iso(value):
+    return value.isoformat() if value else None
+
+
+def flight_booking_item(booking):
+    return {
+        'title': f'{booking.departure} → {booking.arrival}',
+        'start': iso(booking.departure_date),
+        'end': iso(booking.arrival_date),
+        'reference': booking.booking_reference,
+        'price': str(booking.price),
+        'currency': booking.currency,
+    }
+
+
+def hotel_booking_item(booking):
+    return {
+        'title': booking.hotel_name,
+        'start': iso(booking.check_in_date),
+        'end': iso(booking.check_out_date),
+        'reference': booking.booking_id,
+        'price': str(booking.total_price),
+        'currency': booking.currency,
+        'status': booking.status,
+    }
+
+
+def flight_item(flight):
+    return {
+        'title': f'{flight.airline} {flight.flight_number} ({flight.departure_airport} → {flight.arrival_airport})',
+        'start': iso(flight.departure_time),
+        'end': iso(flight.arrival_time),
+        'trip': flight.trip_id,
+    }
+
+
+def hotel_item(hotel):
+    return {
+        'title': hotel.name,
+        'start': iso(hotel.check_in),
+        'end': iso(hotel.check_out),
+        'location': hotel.location,
+        'reference': hotel.confirmation_number or None,
+        'trip': hotel.trip_id,
+    }
+
+
+# type: (date field, rows of a user from a given day, item formatter). The
+# position in this list breaks ties between sources on the same key.
+SOURCES = [
+    ('flight_booking', 'departure_date',
+     lambda user, day: Booking.objects.filter(user=user, status='confirmed', departure_date__gte=day).for_list(),
+     flight_booking_item),
+    ('hotel_booking', 'check_in_date',
+     lambda user, day: HotelBooking.objects.filter(user=user, check_in_date__gte=day)
+     .exclude(status='cancelled').defer('booking_data'),
+     hotel_booking_item),
+    ('flight', 'departure_time',
+     lambda user, day: Flight.objects.filter(
+         trip__user=user,
+         departure_time__gte=timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+     ),
+     flight_item),
+    ('hotel', 'check_in',
+     lambda user, day: Hotel.objects.filter(trip__user=user, check_in__gte=day),
+     hotel_item),
+]
+
+
+def source_rows(rank, user, day, chunk_size):
+    _, field, rows, _ = SOURCES[rank]
+    queryset = rows(user, day).order_by(field, 'id')
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield (*day_key(getattr(row, field)), rank, row.id), row
+
+
+def upcoming_timeline(user, cursor=None, page_size=50):
+    """
+    One page of the user's upcoming items in date order, as a Page of item
+    dicts. The cursor is the merge key of the last item served; each source
+    is read from that item's day and the few rows up to it are skipped.
+    """
+    after = None
+    day = timezone.localdate()
+    if cursor:
+        after = tuple(read_cursor(cursor, 4))
+        if not all(isinstance(value, int) for value in after) or not 0 < after[0] <= datetime.date.max.toordinal():
+            raise ValueError('Invalid cursor')
+        day = max(day, datetime.date.fromordinal(after[0]))
+
+    merged = heapq.merge(
+        *(source_rows(rank, user, day, page_size + 1) for rank in range(len(SOURCES))),
+        key=lambda pair: pair[0]
+    )
+    if after is not None:
+        merged = (pair for pair in merged if pair[0] > after)
+    rows = list(islice(merged, page_size + 1))
+
+    items = []
+    for key, row in rows[:page_size]:
+        kind, _, _, format_item = SOURCES[key[2]]
+        items.append({'type': kind, 'id': row.id, 'date': datetime.date.fromordinal(key[0]).isoformat(),
+                      **format_item(row)})
+    next_cursor = encode_cursor(list(rows[page_size - 1][0])) if len(rows) > page_size else None
+    return Page(items, next_cursor, None)
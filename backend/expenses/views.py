@@ -1,22 +1,57 @@
-from rest_framework import viewsets, generics
+import csv
+
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from rest_framework import status, viewsets, generics
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
 
+from travel_smart.pagination import KeysetPagination, page_headers, parse_page_params
+from travel_smart.response_cache import TIMELINE, TRIPS, cache_per_user
+
 from .models import Trip, Expense, Flight, Hotel
-from .serializers import TripSerializer, ExpenseSerializer, FlightSerializer, HotelSerializer
+from .serializers import (
+    TripSerializer, ExpenseSerializer, FlightSerializer, HotelSerializer, SpendingAnalyticsQuerySerializer
+)
+from . import fx, rollups
+from .bulk import CSVParser, EXPORT_FORMATS, import_expenses
+from .aggregates import summarize_trip, spending_analytics
+from .query_shaping import TRIP_COLLECTIONS, parse_fieldsets, shape_trips
+from .timeline import upcoming_timeline
 
 class TripViewSet(viewsets.ModelViewSet):
     serializer_class = TripSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Trip.objects.filter(user=self.request.user)
+        queryset = Trip.objects.filter(user=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            _, expand = parse_fieldsets(self.request.query_params, TRIP_COLLECTIONS)
+            queryset = shape_trips(queryset.select_related('spending_rollup'), expand)
+        return queryset
+
+    @cache_per_user(TRIPS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        base_currency = serializer.instance.base_currency
+        trip = serializer.save()
+        if trip.base_currency != base_currency:
+            # Every expense now counts in a different currency
+            fx.recompute_base_amounts(trip.expenses.all())
+            rollups.rebuild_trip_rollups([trip.id])
+
     @action(detail=True, methods=['get'], url_path='expenses')
     def list_expenses(self, request, pk=None):
         trip = self.get_object()
@@ -27,39 +62,123 @@ class TripViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], url_path='summary')
     def trip_summary(self, request, pk=None):
         trip = self.get_object()
-        expenses = trip.expenses.all()
-
-        total_spent = sum(e.amount for e in expenses)
-        category_breakdown = {}
-
-        for e in expenses:
-            category_breakdown[e.category] = category_breakdown.get(e.category, 0) + float(e.amount)
-
-        return Response({
-            "trip": trip.name,
-            "budget": float(trip.budget),
-            "total_spent": float(total_spent),
-            "remaining": float(trip.budget) - float(total_spent),
-            "category_breakdown": {k: round(v, 2) for k, v in category_breakdown.items()}
-        })
+        return Response(summarize_trip(trip))
+
+    @action(detail=False, methods=['get'], url_path='analytics')
+    def analytics(self, request):
+        """Spend over time, top categories and per-trip totals across the user's trips."""
+        query = SpendingAnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(spending_analytics(request.user, **query.validated_data))
+
+    @action(detail=False, methods=['get'], url_path='upcoming')
+    @cache_per_user(TIMELINE)
+    def upcoming(self, request):
+        """Upcoming flight and hotel bookings and trip flights and hotels in one date-ordered feed."""
+        try:
+            cursor, page_size, _ = parse_page_params(request.query_params)
+            page = upcoming_timeline(request.user, cursor, page_size)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response = Response(page.items, headers=page_headers(request, page))
+        # Pages are keyed by cursor, so the browser may reuse one briefly
+        patch_cache_control(response, private=True, max_age=settings.TIMELINE_MAX_AGE)
+        return response
 
 class ExpenseViewSet(viewsets.ModelViewSet):
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return Expense.objects.filter(user=self.request.user)
 
+    def amount_base(self, serializer):
+        """The expense amount in its trip's base currency, from the values being saved."""
+        data = serializer.validated_data
+        current = lambda name: data[name] if name in data else getattr(serializer.instance, name)
+        return fx.base_amount(current('amount'), current('currency'), current('date'), current('trip').base_currency)
+
+    @transaction.atomic
     def perform_create(self, serializer):
         trip = serializer.validated_data.get('trip')
         if trip.user != self.request.user:
             raise PermissionDenied("You don't own this trip.")
-        serializer.save(user=self.request.user)
+        serializer.save(user=self.request.user, amount_base=self.amount_base(serializer))
+        rollups.expense_created(serializer.instance)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        trip = serializer.validated_data.get('trip')
+        if trip is not None and trip.user != self.request.user:
+            raise PermissionDenied("You don't own this trip.")
+        expense = serializer.instance
+        before = (expense.trip_id, expense.category, expense.spend)
+        serializer.save(amount_base=self.amount_base(serializer))
+        rollups.expense_changed(before, serializer.instance)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        rollups.expense_deleted(instance)
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, CSVParser])
+    def bulk_import(self, request):
+        """
+        Create many expenses at once from a JSON list (or {"expenses": [...]}) or a
+        CSV body with a header row. `?trip=` fills in rows without a trip and
+        `?partial=true` keeps the valid rows when others fail.
+        """
+        rows = request.data.get('expenses') if isinstance(request.data, dict) else request.data
+        if rows is None or isinstance(rows, (str, bytes)):
+            return Response({'error': 'Expected a list of expenses'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = import_expenses(
+                request.user,
+                rows,
+                default_trip=request.query_params.get('trip'),
+                partial=request.query_params.get('partial', 'false').lower() == 'true',
+                batch_size=settings.EXPENSE_IMPORT_BATCH_SIZE,
+                max_rows=settings.EXPENSE_IMPORT_MAX_ROWS
+            )
+        except csv.Error as e:
+            return Response({'error': f'Invalid CSV: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if result.errors and not result.created:
+            return Response({'created': 0, 'errors': result.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'created': result.created, 'errors': result.errors}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Stream the user's expenses (or one trip's with `?trip=`) as CSV or NDJSON,
+        chosen with `?output=`; rows are read from the database in chunks.
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({'error': f"output must be one of {', '.join(EXPORT_FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset()
+        trip_id = request.query_params.get('trip')
+        if trip_id:
+            # Checked here: once the response starts streaming, an error can no longer become a 400
+            try:
+                queryset = queryset.filter(trip_id=int(trip_id))
+            except ValueError:
+                return Response({'error': 'trip must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type, render = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(render(queryset), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="expenses.{output}"'
+        return response
 
 class FlightViewSet(viewsets.ModelViewSet):
     queryset = Flight.objects.all()
     serializer_class = FlightSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = Flight.objects.filter(trip__user=self.request.user)
@@ -79,6 +198,7 @@ class HotelViewSet(viewsets.ModelViewSet):
     queryset = Hotel.objects.all()
     serializer_class = HotelSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = Hotel.objects.filter(trip__user=self.request.user)
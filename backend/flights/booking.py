@@ -0,0 +1,70 @@
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+
+from .models import Booking
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+
+def price_offer(amadeus, flight):
+    """
+    Confirm the price of a flight offer. Returns (confirmed offers, None) or
+    (None, (status_code, error body)); SDK errors propagate.
+    """
+    pricing_response = amadeus.shopping.flight_offers.pricing.post(flight)
+    if pricing_response.status_code != 200:
+        return None, (400, {"error": "Pricing confirmation failed", "details": pricing_response.body})
+    return pricing_response.data['flightOffers'], None
+
+
+def place_order(amadeus, confirm_flight, traveler, user_id):
+    """Book priced offers and save the Booking. Returns (status_code, body); SDK errors propagate."""
+    booking_response = amadeus.booking.flight_orders.post(confirm_flight, traveler)
+
+    if booking_response.status_code == 201:
+        booking_data = booking_response.data
+        # Extract booking details
+        flight_offer = booking_data['flightOffers'][0]
+        booking_reference = booking_data['associatedRecords'][0]['reference']
+        departure = flight_offer['itineraries'][0]['segments'][0]['departure']['iataCode']
+        arrival = flight_offer['itineraries'][0]['segments'][-1]['arrival']['iataCode']
+        departure_date = flight_offer['itineraries'][0]['segments'][0]['departure']['at'].split("T")[0]
+        arrival_date = flight_offer['itineraries'][0]['segments'][-1]['arrival']['at'].split("T")[0]
+        price = float(flight_offer['price']['grandTotal'])
+        currency = flight_offer['price']['currency']
+        # Save to Booking model
+        try:
+            user = User.objects.get(id=user_id)
+            Booking.objects.create(
+                user=user,
+                departure=departure,
+                arrival=arrival,
+                departure_date=departure_date,
+                arrival_date=arrival_date,
+                price=price,
+                currency=currency,
+                travelers=traveler,
+                booking_reference=booking_reference,
+                status="confirmed"
+            )
+            logger.info('Flight booking %s saved', booking_reference)
+            return 201, booking_response.data
+        except User.DoesNotExist:
+            return 404, {"error": "User not found"}
+        except IntegrityError:
+            logger.exception('Flight booking %s could not be saved', booking_reference)
+        except Exception:
+            logger.exception('Flight booking %s failed while saving', booking_reference)
+    return 400, {"error": "Booking failed", "details": booking_response.body}
+
+
+def book_offer(amadeus, flight, traveler, user_id):
+    """Confirm pricing, then book. Returns (status_code, body) as book_flight responds."""
+    confirm_flight, failure = price_offer(amadeus, flight)
+    if failure:
+        return failure
+    return place_order(amadeus, confirm_flight, traveler, user_id)
@@ -0,0 +1,280 @@
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from upstream.aio import loop_ends_with_request
+
+
+class LocMemLRUBackend:
+    """In-process LRU store, bounded by number of entries."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            entry, expires_at = item
+            if time.time() >= expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, timeout):
+        with self._lock:
+            self._data[key] = (entry, time.time() + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, entry, timeout):
+        self.set(key, entry, timeout)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCacheBackend:
+    """Store backed by a configured Django cache, shared between worker processes."""
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, entry, timeout):
+        self.cache.set(key, entry, timeout)
+
+    async def aget(self, key):
+        return await self.cache.aget(key)
+
+    async def aset(self, key, entry, timeout):
+        await self.cache.aset(key, entry, timeout)
+
+
+class _InflightCall:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SearchResultCache:
+    """
+    Result cache for upstream searches.
+
+    Entries are fresh for `ttl` seconds and may then be served stale for another
+    `stale_ttl` seconds while a single background refresh runs. Concurrent misses
+    for the same key wait on one upstream call instead of each making their own.
+    Async lookups outside ASGI refresh a stale entry before returning it, since
+    the event loop does not outlive the request.
+    """
+
+    def __init__(self, backend, ttl=300, stale_ttl=60, prefix='flights:search'):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.prefix = prefix
+
+        self._inflight = {}
+        self._ainflight = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0, 'refreshes': 0, 'errors': 0}
+
+    def make_key(self, params):
+        """Build a cache key from normalized search parameters."""
+        raw = json.dumps(params, sort_keys=True, separators=(',', ':'))
+        return f'{self.prefix}:{hashlib.sha256(raw.encode()).hexdigest()}'
+
+    def get_or_fetch(self, key, fetch):
+        """Return the cached value for `key`, calling `fetch()` on a miss."""
+        entry = self.backend.get(key)
+        if entry is not None:
+            if time.time() < entry['fresh_until']:
+                self._count('hits')
+            else:
+                self._count('stale_hits')
+                self._refresh_in_background(key, fetch)
+            return entry['value']
+
+        self._count('misses')
+        return self._fetch_coalesced(key, fetch)
+
+    async def aget_or_fetch(self, key, afetch):
+        """Async variant of get_or_fetch; `afetch` is a coroutine function."""
+        entry = await self.backend.aget(key)
+        if entry is not None:
+            if time.time() < entry['fresh_until']:
+                self._count('hits')
+            elif loop_ends_with_request():
+                # A background refresh would be cancelled with this request's loop, so refresh now
+                self._count('stale_hits')
+                self._count('refreshes')
+                try:
+                    return await self._afetch_coalesced(key, afetch)
+                except Exception:
+                    pass
+            else:
+                self._count('stale_hits')
+                self._arefresh_in_background(key, afetch)
+            return entry['value']
+
+        self._count('misses')
+        return await self._afetch_coalesced(key, afetch)
+
+    def get(self, key):
+        """Return the cached value for `key`, fresh or stale, without fetching."""
+        entry = self.backend.get(key)
+        return entry['value'] if entry is not None else None
+
+    async def aget(self, key):
+        entry = await self.backend.aget(key)
+        return entry['value'] if entry is not None else None
+
+    def set(self, key, value):
+        """Store `value` under `key`, replacing any cached entry."""
+        self._store(key, value)
+
+    async def aset(self, key, value):
+        await self._astore(key, value)
+
+    def stats(self):
+        """Return a snapshot of the hit/miss counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        if hasattr(self.backend, '__len__'):
+            stats['entries'] = len(self.backend)
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _store(self, key, value):
+        entry = {'value': value, 'fresh_until': time.time() + self.ttl}
+        self.backend.set(key, entry, self.ttl + self.stale_ttl)
+
+    async def _astore(self, key, value):
+        entry = {'value': value, 'fresh_until': time.time() + self.ttl}
+        await self.backend.aset(key, entry, self.ttl + self.stale_ttl)
+
+    def _fetch_coalesced(self, key, fetch):
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+            else:
+                self._stats['coalesced'] += 1
+
+        if leader:
+            self._run(key, call, fetch)
+        else:
+            call.event.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._inflight:
+                return
+            call = self._inflight[key] = _InflightCall()
+            self._stats['refreshes'] += 1
+
+        # On failure the stale entry keeps being served until it expires
+        threading.Thread(target=self._run, args=(key, call, fetch), daemon=True).start()
+
+    def _run(self, key, call, fetch):
+        try:
+            call.result = fetch()
+            self._store(key, call.result)
+        except Exception as e:
+            call.error = e
+            self._count('errors')
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    async def _afetch_coalesced(self, key, afetch):
+        # Shield so a cancelled waiter does not cancel the call others share
+        return await asyncio.shield(self._inflight_task(key, afetch))
+
+    def _arefresh_in_background(self, key, afetch):
+        if (asyncio.get_running_loop(), key) in self._ainflight:
+            return
+        self._count('refreshes')
+        self._inflight_task(key, afetch)
+
+    def _inflight_task(self, key, afetch):
+        # asyncio tasks belong to one event loop, so coalesce per (loop, key)
+        loop = asyncio.get_running_loop()
+        task = self._ainflight.get((loop, key))
+        if task is not None:
+            self._count('coalesced')
+            return task
+
+        task = self._ainflight[(loop, key)] = loop.create_task(self._arun(key, afetch))
+        task.add_done_callback(functools.partial(self._task_done, (loop, key)))
+        return task
+
+    def _task_done(self, inflight_key, task):
+        self._ainflight.pop(inflight_key, None)
+        if not task.cancelled():
+            # Waiters re-raise the error themselves; a failed refresh keeps the stale entry
+            task.exception()
+
+    async def _arun(self, key, afetch):
+        try:
+            value = await afetch()
+        except Exception:
+            self._count('errors')
+            raise
+        await self._astore(key, value)
+        return value
+
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+
+def build_backend(name):
+    if name == 'django':
+        return DjangoCacheBackend(settings.FLIGHT_SEARCH_CACHE_ALIAS)
+    if name == 'locmem':
+        return LocMemLRUBackend(settings.FLIGHT_SEARCH_CACHE_MAX_ENTRIES)
+    raise ValueError(f'Unknown flight search cache backend: {name}')
+
+
+def get_search_cache():
+    """Return the flight search cache configured in settings."""
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = SearchResultCache(
+                    backend=build_backend(settings.FLIGHT_SEARCH_CACHE_BACKEND),
+                    ttl=settings.FLIGHT_SEARCH_CACHE_TTL,
+                    stale_ttl=settings.FLIGHT_SEARCH_CACHE_STALE_TTL,
+                )
+    return _search_cache
@@ -0,0 +1,146 @@
+import asyncio
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from upstream.ratelimit import get_rate_limiter
+
+from .cache import get_search_cache
+from .services import AmadeusService
+
+
+def build_subqueries(legs, flex_days=0, return_date=None, today=None):
+    """
+    Expand a multi-city / flexible-date request into one-way or round-trip sub-queries.
+
+    Each leg is searched on every date within ±flex_days of its departure date,
+    leaving out dates before `today`. A return date only applies to single-leg
+    searches and is shifted together with the departure date so the trip
+    length stays the same.
+    """
+    today = today or timezone.localdate()
+    subqueries = []
+    for index, leg in enumerate(legs):
+        for offset in range(-flex_days, flex_days + 1):
+            shift = timedelta(days=offset)
+            if leg['departure_date'] + shift < today:
+                continue
+            subqueries.append({
+                'leg': index,
+                'origin': leg['origin'],
+                'destination': leg['destination'],
+                'departure_date': leg['departure_date'] + shift,
+                'return_date': return_date + shift if return_date and len(legs) == 1 else None,
+            })
+    return subqueries
+
+
+def offer_signature(offer):
+    """Identify an itinerary by its flights, so the same trip found twice is merged."""
+    signature = []
+    for direction in ('outbound', 'return'):
+        itinerary = offer.get(direction)
+        for segment in (itinerary or {}).get('segments', []):
+            signature.append((segment['carrierCode'], segment['flightNumber'], segment['departure']['time']))
+    return tuple(signature)
+
+
+def offer_price(offer):
+    metrics = offer.get('metrics')
+    if metrics and metrics['price'] is not None:
+        return metrics['price']
+    try:
+        return float(offer['price']['total'])
+    except (KeyError, TypeError, ValueError):
+        return float('inf')
+
+
+class OfferMerger:
+    """Keeps the cheapest offer per itinerary for each leg as results arrive."""
+
+    def __init__(self, leg_count):
+        self.legs = [{} for _ in range(leg_count)]
+
+    def add(self, leg, offers):
+        """Merge offers into a leg and return the ones that are new or cheaper."""
+        seen = self.legs[leg]
+        added = []
+        for offer in offers:
+            signature = offer_signature(offer)
+            current = seen.get(signature)
+            if current is None or offer_price(offer) < offer_price(current):
+                seen[signature] = offer
+                added.append(offer)
+        return added
+
+    def results(self):
+        return [sorted(seen.values(), key=offer_price) for seen in self.legs]
+
+
+class FlightFanOut:
+    """
+    Runs the sub-queries of a multi-city / flexible-date search concurrently.
+
+    At most `concurrency` sub-queries are in flight at once and each upstream
+    call takes a token from the process-wide rate limiter, so total latency is
+    close to the slowest sub-query rather than the sum of all of them.
+    """
+
+    def __init__(self, passengers=1, cabin_class='ECONOMY', concurrency=None, service=None):
+        self.passengers = passengers
+        self.cabin_class = cabin_class
+        self.concurrency = concurrency or settings.FLIGHT_FANOUT_CONCURRENCY
+        self.service = service or AmadeusService()
+        self.rate_limiter = get_rate_limiter()
+
+    async def run_subquery(self, semaphore, query):
+        payload = self.service.build_search_payload(
+            query['origin'], query['destination'], query['departure_date'],
+            query['return_date'], self.passengers, self.cabin_class
+        )
+
+        async def fetch():
+            # Only calls that actually go upstream spend the rate-limit budget
+            async with semaphore:
+                await self.rate_limiter.aacquire()
+                return await self.service.afetch_flight_offers(payload)
+
+        cache = get_search_cache()
+        return await cache.aget_or_fetch(cache.make_key(payload), fetch)
+
+    async def stream(self, subqueries, merger):
+        """
+        Yield one partial result per completed sub-query, in completion order.
+
+        Each partial carries only the offers that are new (or cheaper) for its
+        leg; the merged view is available from `merger` once iteration ends.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = {
+            asyncio.ensure_future(self.run_subquery(semaphore, query)): query
+            for query in subqueries
+        }
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    query = tasks[task]
+                    if task.exception() is not None:
+                        yield {'query': query, 'flights': [], 'error': str(task.exception())}
+                    else:
+                        yield {'query': query, 'flights': merger.add(query['leg'], task.result())}
+        finally:
+            # The client went away or iteration stopped early
+            for task in tasks:
+                task.cancel()
+
+    async def search(self, subqueries, leg_count):
+        """Run all sub-queries and return the merged offers per leg plus any errors."""
+        merger = OfferMerger(leg_count)
+        errors = []
+        async for partial in self.stream(subqueries, merger):
+            if 'error' in partial:
+                errors.append({'query': partial['query'], 'error': partial['error']})
+        return merger.results(), errors
@@ -0,0 +1,40 @@
+from amadeus import NetworkError, ResponseError, ServerError
+
+from jobs.queue import JobError, RetryableJobError, register
+from upstream.sdk import get_sdk_client
+
+from .booking import place_order, price_offer
+
+# Order responses that mean the order was not placed, so it is safe to try again.
+# A plain 500 or a dropped connection may come after the order went through.
+RETRYABLE_ORDER_STATUSES = {429, 502, 503, 504}
+
+
+def upstream_status(error):
+    return getattr(error.response, 'status_code', None)
+
+
+@register('flights.book', sensitive=('traveler',))
+def book(job):
+    """Price and book a flight offer queued by book_flight; the result is the booking response."""
+    payload = job.payload
+    amadeus = get_sdk_client()
+
+    try:
+        confirm_flight, failure = price_offer(amadeus, payload['flight'])
+    except (ServerError, NetworkError) as error:
+        raise RetryableJobError(str(error))
+    except ResponseError as error:
+        raise JobError(str(error), {'status': upstream_status(error)})
+    if failure:
+        raise JobError(failure[1]['error'], failure[1])
+
+    try:
+        status_code, body = place_order(amadeus, confirm_flight, payload['traveler'], payload['userID'])
+    except ResponseError as error:
+        if upstream_status(error) in RETRYABLE_ORDER_STATUSES:
+            raise RetryableJobError(str(error))
+        raise JobError(str(error), {'status': upstream_status(error)})
+    if status_code != 201:
+        raise JobError(body['error'], body)
+    return body
@@ -0,0 +1,178 @@
+import base64
+import hashlib
+import json
+import re
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+ISO_DURATION = re.compile(r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:\d+(?:\.\d+)?S)?)?$')
+
+SORT_FIELDS = {
+    'price': 'price',
+    'duration': 'duration_minutes',
+    'departure': 'departure',
+}
+
+
+def parse_duration_minutes(value):
+    """Minutes in an ISO-8601 duration such as PT7H35M or P1DT2H; None if it cannot be parsed."""
+    match = ISO_DURATION.match(value or '')
+    if not match:
+        return None
+    days, hours, minutes = (int(part or 0) for part in match.groups())
+    return days * 1440 + hours * 60 + minutes
+
+
+def parse_departure(value):
+    """The local departure time of an ISO-8601 timestamp; None if it cannot be parsed."""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def offer_key(price, itineraries, traveler_pricings=()):
+    """
+    Identity of an offer that survives a refresh of the search: a hash of its
+    flights, fares and price. Amadeus offer IDs and offer references are
+    renumbered on every search, so they cannot order offers across refreshes.
+    """
+    flights = [
+        [(segment.get('carrierCode'), segment.get('number'), (segment.get('departure') or {}).get('at'))
+         for segment in itinerary.get('segments') or ()]
+        for itinerary in itineraries
+    ]
+    fares = [
+        [(fare.get('segmentId'), fare.get('cabin'), fare.get('fareBasis'), fare.get('class'))
+         for fare in pricing.get('fareDetailsBySegment') or ()]
+        for pricing in traveler_pricings
+    ]
+    raw = json.dumps([flights, fares, price.get('total'), price.get('currency')], separators=(',', ':'))
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def offer_metrics(price, itineraries, traveler_pricings=()):
+    """
+    Numeric fields the offer listing filters and sorts on, computed once when a
+    search result is formatted rather than on every listing request.
+    """
+    try:
+        total = Decimal(price.get('total'))
+    except (InvalidOperation, TypeError):
+        total = None
+
+    duration = 0
+    stops = 0
+    carriers = set()
+    for itinerary in itineraries:
+        segments = itinerary.get('segments') or ()
+        duration += parse_duration_minutes(itinerary.get('duration')) or 0
+        stops = max(stops, len(segments) - 1)
+        carriers.update(segment.get('carrierCode') for segment in segments)
+
+    first_segments = itineraries[0].get('segments') if itineraries else None
+    departure = parse_departure((first_segments[0].get('departure') or {}).get('at') if first_segments else None)
+    return {
+        'price': total,
+        'duration_minutes': duration,
+        'stops': stops,
+        'carriers': sorted(carrier for carrier in carriers if carrier),
+        # Normalised so that offers sort by time; unparseable departures sort last
+        'departure': departure.isoformat() if departure else None,
+        'departure_minutes': minutes_of_day(departure) if departure else None,
+        'offer_key': offer_key(price, itineraries, traveler_pricings),
+    }
+
+
+def minutes_of_day(value):
+    return value.hour * 60 + value.minute
+
+
+def filter_offers(flights, max_price=None, max_stops=None, carriers=None, exclude_carriers=None,
+                  departure_after=None, departure_before=None, max_duration=None):
+    """Offers matching all given filters; carriers are matched against every segment."""
+    include = set(carriers or ())
+    exclude = set(exclude_carriers or ())
+    after = minutes_of_day(departure_after) if departure_after else None
+    before = minutes_of_day(departure_before) if departure_before else None
+
+    matches = []
+    for flight in flights:
+        metrics = flight['metrics']
+        if max_price is not None and (metrics['price'] is None or metrics['price'] > max_price):
+            continue
+        if max_stops is not None and metrics['stops'] > max_stops:
+            continue
+        if max_duration is not None and metrics['duration_minutes'] > max_duration:
+            continue
+        if include and not include.issuperset(metrics['carriers']):
+            continue
+        if exclude and exclude.intersection(metrics['carriers']):
+            continue
+        if after is not None or before is not None:
+            minute = metrics['departure_minutes']
+            if minute is None or (after is not None and minute < after) or (before is not None and minute > before):
+                continue
+        matches.append(flight)
+    return matches
+
+
+def sort_key(flight, field, copy=0, descending=False):
+    """
+    (last, value, offer_key, copy): `last` puts offers without a value after
+    the others in either direction, the stable offer key orders ties, and
+    `copy` numbers identical offers (same key) so the order stays total for
+    keyset cursors.
+    """
+    metrics = flight['metrics']
+    value = metrics[field]
+    return ((value is None) != descending, value if value is not None else 0, metrics.get('offer_key', ''), copy)
+
+
+def encode_cursor(key):
+    last, value, offer_key, copy = key
+    raw = json.dumps([last, str(value), offer_key, copy])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, field, descending=False):
+    """Turn a cursor back into a sort key; raises ValueError if it was tampered with."""
+    try:
+        last, value, offer_key, copy = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last = bool(last)
+        if last != descending:
+            value = 0
+        elif field == 'price':
+            value = Decimal(value)
+        elif field == 'duration_minutes':
+            value = int(value)
+        return (last, value, str(offer_key), int(copy))
+    except (ValueError, TypeError, InvalidOperation):
+        raise ValueError('Invalid cursor')
+
+
+def paginate_offers(flights, sort='price', cursor=None, limit=20):
+    """
+    Sort offers and return (page, next_cursor).
+
+    The cursor holds the sort key of the last offer served, so pages stay
+    consistent when the cached search is refreshed between requests.
+    """
+    descending = sort.startswith('-')
+    field = SORT_FIELDS[sort.lstrip('-')]
+    copies = Counter()
+    keyed = []
+    for flight in flights:
+        key = flight['metrics'].get('offer_key', '')
+        keyed.append((sort_key(flight, field, copies[key], descending), flight))
+        copies[key] += 1
+    keyed.sort(key=lambda pair: pair[0], reverse=descending)
+
+    if cursor:
+        after = decode_cursor(cursor, field, descending)
+        keyed = [pair for pair in keyed if (pair[0] < after if descending else pair[0] > after)]
+
+    page = keyed[:limit]
+    next_cursor = encode_cursor(page[-1][0]) if len(keyed) > limit else None
+    return [flight for _, flight in page], next_cursor
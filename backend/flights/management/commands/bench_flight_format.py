@@ -0,0 +1,149 @@
+import json
+import pickle
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from flights.services import AmadeusService
+
+
+def synthetic_segment(rng, number, departs):
+    duration = timedelta(minutes=rng.randint(60, 600))
+    return {
+        'departure': {'iataCode': rng.choice(['JFK', 'LHR', 'CDG', 'FRA']), 'terminal': '1',
+                      'at': departs.isoformat()},
+        'arrival': {'iataCode': rng.choice(['LAX', 'SFO', 'ORD', 'MAD']), 'terminal': '2',
+                    'at': (departs + duration).isoformat()},
+        'carrierCode': rng.choice(['AA', 'BA', 'AF', 'LH']),
+        'number': str(rng.randint(100, 9999)),
+        'aircraft': {'code': '32N'},
+        'operating': {'carrierCode': 'AA'},
+        'duration': f'PT{duration.seconds // 3600}H{duration.seconds % 3600 // 60}M',
+        'id': str(number),
+        'numberOfStops': 0,
+        'blacklistedInEU': False,
+    }
+
+
+def synthetic_response(offers=50, seed=7):
+    """A Flight Offers Search response shaped like Amadeus' (round trips, 1-2 stops)."""
+    rng = random.Random(seed)
+    data = []
+    for offer_id in range(1, offers + 1):
+        itineraries = []
+        segment_ids = []
+        for leg in range(2):
+            departs = datetime(2025, 6, 1 + leg * 7, rng.randint(0, 23))
+            segments = []
+            for _ in range(rng.randint(1, 3)):
+                segment_ids.append(len(segment_ids) + 1)
+                segments.append(synthetic_segment(rng, segment_ids[-1], departs))
+                departs += timedelta(hours=rng.randint(3, 9))
+            itineraries.append({'duration': f'PT{rng.randint(5, 30)}H', 'segments': segments})
+        total = f'{rng.uniform(200, 2000):.2f}'
+        data.append({
+            'type': 'flight-offer',
+            'id': str(offer_id),
+            'source': 'GDS',
+            'instantTicketingRequired': False,
+            'nonHomogeneous': False,
+            'oneWay': False,
+            'lastTicketingDate': '2025-05-20',
+            'numberOfBookableSeats': rng.randint(1, 9),
+            'itineraries': itineraries,
+            'price': {'currency': 'USD', 'total': total, 'base': total, 'grandTotal': total,
+                      'fees': [{'amount': '0.00', 'type': 'SUPPLIER'}, {'amount': '0.00', 'type': 'TICKETING'}]},
+            'pricingOptions': {'fareType': ['PUBLISHED'], 'includedCheckedBagsOnly': True},
+            'validatingAirlineCodes': ['AA'],
+            'travelerPricings': [{
+                'travelerId': '1',
+                'fareOption': 'STANDARD',
+                'travelerType': 'ADULT',
+                'price': {'currency': 'USD', 'total': total, 'base': total},
+                'fareDetailsBySegment': [{
+                    'segmentId': str(segment_id),
+                    'cabin': 'ECONOMY',
+                    'fareBasis': 'OLN4A4B1',
+                    'brandedFare': 'BASIC',
+                    'class': 'O',
+                    'includedCheckedBags': {'quantity': 1},
+                } for segment_id in segment_ids],
+            }],
+        })
+    return {'meta': {'count': offers}, 'data': data}
+
+
+def legacy_format_flight_results(data):
+    """The formatter as it was before offers were stored server-side, kept for comparison."""
+    def format_itinerary(itinerary):
+        segments = itinerary.get('segments', [])
+        if not segments:
+            return None
+        return {
+            'duration': itinerary.get('duration'),
+            'segments': [{
+                'departure': {
+                    'airport': segment.get('departure', {}).get('iataCode'),
+                    'terminal': segment.get('departure', {}).get('terminal'),
+                    'time': segment.get('departure', {}).get('at')
+                },
+                'arrival': {
+                    'airport': segment.get('arrival', {}).get('iataCode'),
+                    'terminal': segment.get('arrival', {}).get('terminal'),
+                    'time': segment.get('arrival', {}).get('at')
+                },
+                'carrierCode': segment.get('carrierCode'),
+                'flightNumber': segment.get('number'),
+                'aircraft': segment.get('aircraft', {}).get('code'),
+                'duration': segment.get('duration')
+            } for segment in segments]
+        }
+
+    formatted_flights = []
+    for offer in data.get('data', []):
+        price = offer.get('price', {})
+        itineraries = offer.get('itineraries', [])
+        formatted_flights.append({
+            'price': {'total': price.get('total'), 'currency': price.get('currency', 'USD')},
+            'outbound': format_itinerary(itineraries[0]) if itineraries else None,
+            'return': format_itinerary(itineraries[1]) if len(itineraries) > 1 else None,
+            'offer': offer
+        })
+    return formatted_flights
+
+
+class Command(BaseCommand):
+    help = "Benchmark bytes and CPU per flight search for the full and compact response formats."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offers', type=int, default=50)
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        data = synthetic_response(options['offers'])
+        service = AmadeusService()
+        iterations = options['iterations']
+
+        def per_search(func):
+            started = time.process_time()
+            for _ in range(iterations):
+                result = func()
+            return (time.process_time() - started) / iterations * 1e6, result
+
+        legacy_us, legacy = per_search(lambda: legacy_format_flight_results(data))
+        compact_us, compact = per_search(lambda: service.format_flight_results(data, 'b' * 16))
+        legacy_json_us, legacy_body = per_search(lambda: json.dumps({'flights': legacy}))
+        compact_json_us, compact_body = per_search(lambda: json.dumps({'flights': compact}))
+
+        raw_json = json.dumps(data)
+        self.stdout.write(f"{options['offers']} offers, upstream body {len(raw_json):,} bytes")
+        self.stdout.write(f'{"":<10}{"format µs":>12}{"encode µs":>12}{"body bytes":>12}{"cached bytes":>14}')
+        for name, format_us, json_us, body, value in (
+            ('before', legacy_us, legacy_json_us, legacy_body, legacy),
+            ('compact', compact_us, compact_json_us, compact_body, compact),
+        ):
+            self.stdout.write(
+                f'{name:<10}{format_us:>12.1f}{json_us:>12.1f}{len(body):>12,}{len(pickle.dumps(value)):>14,}'
+            )
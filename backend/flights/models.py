@@ -14,6 +14,12 @@ class FlightSearch(models.Model):
     def __str__(self):
         return f"{self.origin} to {self.destination} on {self.departure_date}"
 
+class BookingQuerySet(models.QuerySet):
+    def for_list(self):
+        """Bookings as list views show them, without the traveler details."""
+        return self.defer('travelers')
+
+
 class Booking(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     departure = models.CharField(max_length=50)
@@ -27,5 +33,12 @@ class Booking(models.Model):
     status = models.CharField(max_length=20, default="confirmed")  # Confirmed, Cancelled, etc.
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status', 'departure_date'], name='booking_user_status_dep_idx'),
+        ]
+
     def __str__(self):
         return f"Booking {self.booking_reference} - {self.user.username}"
\ No newline at end of file
@@ -0,0 +1,105 @@
+import logging
+import secrets
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+
+class OfferStore:
+    """
+    Short-lived server-side store for raw Amadeus flight offers.
+
+    The raw offers of one search are stored as a single cache entry under a
+    random bundle ID, and each offer is addressed as "<bundle>-<index>". Search
+    responses can then carry just that reference, which booking resolves back
+    to the raw offer Amadeus needs for pricing.
+    """
+
+    def __init__(self, alias='offers', ttl=1800, prefix='flights:offers'):
+        self.cache = caches[alias]
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def put(self, offers):
+        """Store the raw offers of one search and return their bundle ID."""
+        bundle = secrets.token_hex(8)
+        self.cache.set(self._key(bundle), offers, self.ttl)
+        return bundle
+
+    async def aput(self, offers):
+        bundle = secrets.token_hex(8)
+        await self.cache.aset(self._key(bundle), offers, self.ttl)
+        return bundle
+
+    def get_many(self, offer_refs):
+        """Map each resolvable offer reference to its raw offer."""
+        bundles = self.cache.get_many([self._key(bundle) for bundle in self._bundles(offer_refs)])
+        return self._pick(offer_refs, bundles)
+
+    async def aget_many(self, offer_refs):
+        bundles = await self.cache.aget_many([self._key(bundle) for bundle in self._bundles(offer_refs)])
+        return self._pick(offer_refs, bundles)
+
+    def get(self, offer_ref):
+        """Return the raw offer for a reference, or None once it has expired."""
+        return self.get_many([offer_ref]).get(offer_ref)
+
+    @staticmethod
+    def make_ref(bundle, index):
+        return f'{bundle}-{index}'
+
+    @staticmethod
+    def split_ref(offer_ref):
+        bundle, _, index = str(offer_ref).rpartition('-')
+        if not bundle or not index.isdigit():
+            return None, None
+        return bundle, int(index)
+
+    def _key(self, bundle):
+        return f'{self.prefix}:{bundle}'
+
+    def _bundles(self, offer_refs):
+        return {bundle for bundle, _ in map(self.split_ref, offer_refs) if bundle}
+
+    def _pick(self, offer_refs, bundles):
+        offers = {}
+        for offer_ref in offer_refs:
+            bundle, index = self.split_ref(offer_ref)
+            raw = bundles.get(self._key(bundle)) if bundle else None
+            if raw is not None and index < len(raw):
+                offers[offer_ref] = raw[index]
+        return offers
+
+
+_offer_store = None
+_offer_store_lock = threading.Lock()
+
+
+def get_offer_store():
+    """Return the raw flight offer store configured in settings."""
+    global _offer_store
+    if _offer_store is None:
+        with _offer_store_lock:
+            if _offer_store is None:
+                # Raw offers must outlive the cached searches that reference them
+                ttl = max(
+                    settings.FLIGHT_OFFER_STORE_TTL,
+                    settings.FLIGHT_SEARCH_CACHE_TTL + settings.FLIGHT_SEARCH_CACHE_STALE_TTL
+                )
+                _offer_store = OfferStore(alias=settings.FLIGHT_OFFER_STORE_ALIAS, ttl=ttl)
+                if isinstance(_offer_store.cache, LocMemCache):
+                    logger.warning(
+                        'Flight offer store %r is a per-process memory cache: offers found by one '
+                        'worker cannot be booked through another', settings.FLIGHT_OFFER_STORE_ALIAS
+                    )
+                elif isinstance(_offer_store.cache, FileBasedCache) and not settings.DEBUG:
+                    logger.warning(
+                        'Flight offer store %r is a file cache, which is for development only: set '
+                        'FLIGHT_OFFER_CACHE_URL to a Redis shared by all hosts', settings.FLIGHT_OFFER_STORE_ALIAS
+                    )
+    return _offer_store
@@ -1,7 +1,66 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import FlightSearch
+from .models import Booking, FlightSearch
 
 class FlightSearchSerializer(serializers.ModelSerializer):
     class Meta:
         model = FlightSearch
         fields = '__all__'
+
+
+class BookingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Booking
+        exclude = ('user',)
+
+
+class FlightLegSerializer(serializers.Serializer):
+    origin = serializers.CharField(max_length=100)
+    destination = serializers.CharField(max_length=100)
+    departure_date = serializers.DateField()
+
+class FlightMultiSearchSerializer(serializers.Serializer):
+    """Multi-city and/or flexible-date search, fanned out into concurrent sub-queries."""
+    legs = FlightLegSerializer(many=True, allow_empty=False)
+    return_date = serializers.DateField(required=False, allow_null=True)
+    flex_days = serializers.IntegerField(min_value=0, default=0)
+    passengers = serializers.IntegerField(min_value=1, default=1)
+    cabin_class = serializers.CharField(max_length=20, default='economy')
+    stream = serializers.BooleanField(default=True)
+
+    def validate(self, data):
+        if data.get('return_date') and len(data['legs']) > 1:
+            raise serializers.ValidationError("return_date is only supported for single-leg searches.")
+        if data['flex_days'] > settings.FLIGHT_FANOUT_MAX_FLEX_DAYS:
+            raise serializers.ValidationError(
+                f"flex_days cannot exceed {settings.FLIGHT_FANOUT_MAX_FLEX_DAYS}."
+            )
+        subqueries = len(data['legs']) * (2 * data['flex_days'] + 1)
+        if subqueries > settings.FLIGHT_FANOUT_MAX_SUBQUERIES:
+            raise serializers.ValidationError(
+                f"This search needs {subqueries} sub-queries; the limit is {settings.FLIGHT_FANOUT_MAX_SUBQUERIES}."
+            )
+        return data
+
+
+class FlightOfferQuerySerializer(serializers.Serializer):
+    """Filters, sort order and page of a cached search's offers."""
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, min_value=0)
+    max_stops = serializers.IntegerField(required=False, min_value=0)
+    max_duration = serializers.IntegerField(required=False, min_value=1, help_text='Total minutes')
+    carriers = serializers.CharField(required=False, help_text='Comma-separated carrier codes to keep')
+    exclude_carriers = serializers.CharField(required=False, help_text='Comma-separated carrier codes to drop')
+    departure_after = serializers.TimeField(required=False)
+    departure_before = serializers.TimeField(required=False)
+    sort = serializers.ChoiceField(
+        choices=['price', '-price', 'duration', '-duration', 'departure', '-departure'], default='price'
+    )
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+    compact = serializers.BooleanField(default=False)
+
+    def validate_carriers(self, value):
+        return [code.strip().upper() for code in value.split(',') if code.strip()]
+
+    def validate_exclude_carriers(self, value):
+        return [code.strip().upper() for code in value.split(',') if code.strip()]
@@ -1,40 +1,102 @@
-from datetime import datetime
-import requests
-from django.conf import settings
+from datetime import date, datetime
+
+from upstream.aio import get_async_client
+from upstream.client import get_client
+
+from .cache import get_search_cache
+from .listing import offer_metrics
+from .offers import OfferStore, get_offer_store
+
+# Shared default for missing nested objects; never mutated
+EMPTY = {}
 
 class AmadeusService:
     def __init__(self):
-        self.api_key = settings.AMADEUS_API_KEY
-        self.api_secret = settings.AMADEUS_API_SECRET
-        self.base_url = 'https://test.api.amadeus.com/v2'
-        self.token = None
-        
-    def get_access_token(self):
-        """Get OAuth2 token from Amadeus API."""
-        url = 'https://test.api.amadeus.com/v1/security/oauth2/token'
-        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        data = {
-            'grant_type': 'client_credentials',
-            'client_id': self.api_key,
-            'client_secret': self.api_secret
-        }
-        
-        response = requests.post(url, headers=headers, data=data)
-        if response.status_code == 200:
-            self.token = response.json()['access_token']
-            return self.token
-        raise Exception('Failed to get access token')
+        self.client = get_client()
 
     def search_flights(self, origin, destination, departure_date, return_date=None, 
-                      passengers=1, cabin_class='ECONOMY'):
-        """Search flights using Amadeus Flight Offers Search API."""
-        if not self.token:
-            self.get_access_token()
-            
-        headers = {
-            'Authorization': f'Bearer {self.token}',
-            'Content-Type': 'application/json'
-        }
+                      passengers=1, cabin_class='ECONOMY', use_cache=True, compact=False):
+        """
+        Search flights using Amadeus Flight Offers Search API.
+
+        Raw offers are kept in the offer store and each result carries an
+        `offer_ref`; unless `compact` is set the raw `offer` is attached too.
+        """
+        payload = self.build_search_payload(
+            origin, destination, departure_date, return_date, passengers, cabin_class
+        )
+        if not use_cache:
+            flights = self.fetch_flight_offers(payload)
+            return flights if compact else self.attach_raw_offers(flights)
+
+        # Identical searches share one cached (and coalesced) upstream call
+        cache = get_search_cache()
+        key = cache.make_key(payload)
+        flights = cache.get_or_fetch(key, lambda: self.fetch_flight_offers(payload))
+        if compact:
+            return flights
+
+        with_offers = self.attach_raw_offers(flights)
+        if with_offers is None:
+            # The raw offers were evicted before the cached search expired
+            flights = self.fetch_flight_offers(payload)
+            cache.set(key, flights)
+            with_offers = self.attach_raw_offers(flights)
+        return with_offers
+
+    async def asearch_flights(self, origin, destination, departure_date, return_date=None,
+                              passengers=1, cabin_class='ECONOMY', use_cache=True, compact=False):
+        """Async variant of search_flights for ASGI views."""
+        payload = self.build_search_payload(
+            origin, destination, departure_date, return_date, passengers, cabin_class
+        )
+        if not use_cache:
+            flights = await self.afetch_flight_offers(payload)
+            return flights if compact else await self.aattach_raw_offers(flights)
+
+        cache = get_search_cache()
+        key = cache.make_key(payload)
+        flights = await cache.aget_or_fetch(key, lambda: self.afetch_flight_offers(payload))
+        if compact:
+            return flights
+
+        with_offers = await self.aattach_raw_offers(flights)
+        if with_offers is None:
+            flights = await self.afetch_flight_offers(payload)
+            await cache.aset(key, flights)
+            with_offers = await self.aattach_raw_offers(flights)
+        return with_offers
+
+    def search_cache_key(self, origin, destination, departure_date, return_date=None,
+                         passengers=1, cabin_class='ECONOMY'):
+        """Key under which search_flights caches the results of these parameters."""
+        payload = self.build_search_payload(
+            origin, destination, departure_date, return_date, passengers, cabin_class
+        )
+        return get_search_cache().make_key(payload)
+
+    def attach_raw_offers(self, flights):
+        """Copy formatted offers with their raw `offer` added, or None if any has expired."""
+        raw = get_offer_store().get_many([flight['offer_ref'] for flight in flights])
+        if len(raw) < len(flights):
+            return None
+        return [{**flight, 'offer': raw[flight['offer_ref']]} for flight in flights]
+
+    async def aattach_raw_offers(self, flights):
+        raw = await get_offer_store().aget_many([flight['offer_ref'] for flight in flights])
+        if len(raw) < len(flights):
+            return None
+        return [{**flight, 'offer': raw[flight['offer_ref']]} for flight in flights]
+
+    def build_search_payload(self, origin, destination, departure_date, return_date=None,
+                             passengers=1, cabin_class='ECONOMY'):
+        """Build the normalized Flight Offers Search request body."""
+        origin = origin.strip().upper()
+        destination = destination.strip().upper()
+        if isinstance(departure_date, date):
+            departure_date = departure_date.isoformat()
+        if isinstance(return_date, date):
+            return_date = return_date.isoformat()
 
         # Construct travelers list based on number of passengers
         travelers = [
@@ -87,65 +149,92 @@ class AmadeusService:
                 }
             }
         }
+        return payload
 
-        url = f'{self.base_url}/shopping/flight-offers'
-        response = requests.post(url, headers=headers, json=payload)
+    def fetch_flight_offers(self, payload):
+        """Send a Flight Offers Search request, store the raw offers and format the results."""
+        response = self.client.post('/v2/shopping/flight-offers', endpoint='flight_offers', json=payload)
 
         if response.status_code == 200:
-            return self.format_flight_results(response.json())
-        elif response.status_code == 401:
-            # Token expired, get new token and retry
-            self.get_access_token()
-            headers['Authorization'] = f'Bearer {self.token}'
-            response = requests.post(url, headers=headers, json=payload)
-            if response.status_code == 200:
-                return self.format_flight_results(response.json())
+            data = response.json()
+            bundle = get_offer_store().put(data.get('data', []))
+            return self.format_flight_results(data, bundle)
         
         raise Exception(f'Failed to fetch flights: {response.text}')
 
-    def format_flight_results(self, data):
-        """Format the Amadeus API response into a more user-friendly structure."""
+    async def afetch_flight_offers(self, payload):
+        """Async variant of fetch_flight_offers."""
+        client = get_async_client()
+        response = await client.post('/v2/shopping/flight-offers', endpoint='flight_offers', json=payload)
+
+        if response.status_code == 200:
+            data = response.json()
+            bundle = await get_offer_store().aput(data.get('data', []))
+            return self.format_flight_results(data, bundle)
+
+        raise Exception(f'Failed to fetch flights: {response.text}')
+
+    def format_flight_results(self, data, bundle=None):
+        """
+        Format the Amadeus API response into a more user-friendly structure.
+
+        With a `bundle` from the offer store each result references its raw
+        offer by `offer_ref`; without one the raw offer is embedded as `offer`.
+        `metrics` holds the numeric fields used to filter and sort offers.
+        """
         formatted_flights = []
-        
-        for offer in data.get('data', []):
-            price = offer.get('price', {})
-            itineraries = offer.get('itineraries', [])
-            
+        format_itinerary = self.format_itinerary
+
+        for index, offer in enumerate(data.get('data') or ()):
+            price = offer.get('price') or EMPTY
+            itineraries = offer.get('itineraries') or ()
+
             flight_offer = {
                 'price': {
                     'total': price.get('total'),
                     'currency': price.get('currency', 'USD')
                 },
-                'outbound': self.format_itinerary(itineraries[0]) if itineraries else None,
-                'return': self.format_itinerary(itineraries[1]) if len(itineraries) > 1 else None,
-                'offer': offer
+                'outbound': format_itinerary(itineraries[0]) if itineraries else None,
+                'return': format_itinerary(itineraries[1]) if len(itineraries) > 1 else None,
+                'metrics': offer_metrics(price, itineraries, offer.get('travelerPricings') or ()),
             }
+            if bundle is None:
+                flight_offer['offer'] = offer
+            else:
+                flight_offer['offer_ref'] = OfferStore.make_ref(bundle, index)
             formatted_flights.append(flight_offer)
             
         return formatted_flights
     
     def format_itinerary(self, itinerary):
-        """Format a single itinerary from the flight offer."""
-        segments = itinerary.get('segments', [])
+        """Format a single itinerary from the flight offer in one pass over its segments."""
+        segments = itinerary.get('segments')
         if not segments:
             return None
-            
-        return {
-            'duration': itinerary.get('duration'),
-            'segments': [{
+
+        formatted_segments = []
+        append = formatted_segments.append
+        for segment in segments:
+            departure = segment.get('departure') or EMPTY
+            arrival = segment.get('arrival') or EMPTY
+            append({
                 'departure': {
-                    'airport': segment.get('departure', {}).get('iataCode'),
-                    'terminal': segment.get('departure', {}).get('terminal'),
-                    'time': segment.get('departure', {}).get('at')
+                    'airport': departure.get('iataCode'),
+                    'terminal': departure.get('terminal'),
+                    'time': departure.get('at')
                 },
                 'arrival': {
-                    'airport': segment.get('arrival', {}).get('iataCode'),
-                    'terminal': segment.get('arrival', {}).get('terminal'),
-                    'time': segment.get('arrival', {}).get('at')
+                    'airport': arrival.get('iataCode'),
+                    'terminal': arrival.get('terminal'),
+                    'time': arrival.get('at')
                 },
                 'carrierCode': segment.get('carrierCode'),
                 'flightNumber': segment.get('number'),
-                'aircraft': segment.get('aircraft', {}).get('code'),
+                'aircraft': (segment.get('aircraft') or EMPTY).get('code'),
                 'duration': segment.get('duration')
-            } for segment in segments]
-        }
\ No newline at end of file
+            })
+
+        return {
+            'duration': itinerary.get('duration'),
+            'segments': formatted_segments
+        }
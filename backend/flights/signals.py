@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from travel_smart.response_cache import TIMELINE, invalidate
+
+from .models import Booking
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id, TIMELINE)
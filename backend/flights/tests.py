@@ -1,3 +1,399 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import CacheHandler
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from jobs.models import Job
+from upstream.aio import request_client
+from travel_smart.query_plans import QueryPlanTestCase, bulk_seed
+
+from . import cache as search_cache
+from . import fanout
+from .cache import LocMemLRUBackend, SearchResultCache
+from .fanout import FlightFanOut, OfferMerger, build_subqueries
+from .models import Booking
+from .listing import paginate_offers
+from .offers import OfferStore
+from .services import AmadeusService
+
+User = get_user_model()
+
+
+class BookingQueryPlanTests(QueryPlanTestCase):
+    """Upcoming trips must be read through the (user, status, departure_date) index."""
+    users = 200
+
+    @classmethod
+    def seed(cls):
+        users = User.objects.bulk_create([
+            User(username=f'flyer{index}', email=f'flyer{index}@example.com') for index in range(cls.users)
+        ])
+        cls.user = users[0]
+        # Half a year either side of today, so "upcoming" filters out about half the rows
+        first = timezone.localdate() - timedelta(days=182)
+        bulk_seed(Booking, (
+            Booking(
+                user=users[index % cls.users], departure='JFK', arrival='LIS',
+                departure_date=first + timedelta(days=index % 365),
+                price=Decimal('420.00'), currency='USD', travelers=[],
+                booking_reference=f'REF{index:08d}', status='cancelled' if index % 7 == 0 else 'confirmed'
+            )
+            for index in range(cls.seed_rows)
+        ))
+
+    def test_upcoming_trips(self):
+        body = json.dumps({'user': {'id': self.user.id}})
+        response = self.assertIndexedQueries(
+            lambda: self.client.post('/flights/upcoming_trips/', body, content_type='application/json')
+        )
+        self.assertEqual(response.status_code, 200)
+        departures = [trip['departure_date'] for trip in response.json()['upcomingTrips']]
+        self.assertTrue(departures)
+        self.assertGreaterEqual(min(departures), timezone.localdate().isoformat())
+
+
+class OfferStoreTests(SimpleTestCase):
+    """Offers stored by one worker must be resolvable by another."""
+
+    def setUp(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        caches = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'offers': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location.name,
+            },
+        })
+        caches.enable()
+        self.addCleanup(caches.disable)
+
+    def test_offers_are_readable_through_another_cache_connection(self):
+        stored = OfferStore()
+        # Memory caches are per process, however many connections share them here
+        self.assertNotIsInstance(stored.cache, LocMemCache)
+        elsewhere = OfferStore()
+        elsewhere.cache = CacheHandler()['offers']
+
+        bundle = stored.put([{'id': '1'}, {'id': '2'}])
+        ref = OfferStore.make_ref(bundle, 1)
+        self.assertEqual(elsewhere.get(ref), {'id': '2'})
+        self.assertIsNone(elsewhere.get(OfferStore.make_ref(bundle, 2)))
+
+
+class OfferPaginationTests(SimpleTestCase):
+    """A cursor keeps paging correctly after the search is refreshed and its offers renumbered."""
+
+    def raw_offers(self, numbers):
+        return {'data': [{
+            'id': str(index + 1),
+            'price': {'total': '199.00', 'currency': 'USD'},
+            'itineraries': [{'duration': 'PT7H', 'segments': [{
+                'carrierCode': 'TP', 'number': number,
+                'departure': {'iataCode': 'JFK', 'at': '2025-05-01T09:00:00'},
+                'arrival': {'iataCode': 'LIS', 'at': '2025-05-01T16:00:00'},
+            }]}],
+        } for index, number in enumerate(numbers)]}
+
+    def flight_numbers(self, page):
+        return [flight['outbound']['segments'][0]['flightNumber'] for flight in page]
+
+    def all_pages(self, flights, **kwargs):
+        seen, cursor = [], None
+        while True:
+            page, cursor = paginate_offers(flights, cursor=cursor, limit=1, **kwargs)
+            seen += self.flight_numbers(page)
+            if cursor is None:
+                return seen
+
+    def test_ties_keep_their_order_across_refreshes(self):
+        service = AmadeusService()
+        numbers = ['201', '202', '203', '204', '205']
+        first = service.format_flight_results(self.raw_offers(numbers), bundle='aaaa')
+        # The refreshed search lists the same offers in another order, under a new bundle
+        refreshed = service.format_flight_results(self.raw_offers(numbers[::-1]), bundle='bbbb')
+
+        seen, cursor = [], None
+        for flights in (first, refreshed, first):
+            page, cursor = paginate_offers(flights, cursor=cursor, limit=2)
+            seen += self.flight_numbers(page)
+        self.assertIsNone(cursor)
+        self.assertEqual(sorted(seen), numbers)
+
+    def test_identical_offers_are_not_dropped_at_a_page_boundary(self):
+        flights = AmadeusService().format_flight_results(self.raw_offers(['201', '201', '201', '202']), bundle='aaaa')
+        self.assertEqual(sorted(self.all_pages(flights)), ['201', '201', '201', '202'])
+
+    def test_unparseable_departures_sort_last(self):
+        raw = self.raw_offers(['201', '202', '203'])
+        raw['data'][0]['itineraries'][0]['segments'][0]['departure']['at'] = 'not a time'
+        raw['data'][1]['itineraries'][0]['segments'][0]['departure']['at'] = '2025-05-01T07:30:00'
+        del raw['data'][2]['itineraries'][0]['segments'][0]['departure']['at']
+        flights = AmadeusService().format_flight_results(raw, bundle='aaaa')
+        self.assertEqual(flights[1]['metrics']['departure_minutes'], 450)
+        self.assertIsNone(flights[0]['metrics']['departure_minutes'])
+
+        for sort in ('departure', '-departure'):
+            with self.subTest(sort=sort):
+                seen = self.all_pages(flights, sort=sort)
+                self.assertEqual(seen[0], '202')
+                self.assertEqual(sorted(seen[1:]), ['201', '203'])
+
+
+class AsyncBookingOwnerTests(TestCase):
+    """Queued flight bookings belong to the authenticated user, never to the userID in the body."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='booker', email='booker@example.com', password='pw')
+        self.other = User.objects.create_user(username='victim', email='victim@example.com', password='pw')
+        self.token = Token.objects.create(user=self.user)
+
+    def book(self, user_id, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'} if token else {}
+        return self.client.post('/flights/book/?async=true', json.dumps({
+            'flight': {'id': '1'}, 'traveler': [{'id': '1'}], 'userID': user_id
+        }), content_type='application/json', **headers)
+
+    def test_anonymous_request_is_refused(self):
+        self.assertEqual(self.book(self.user.id).status_code, 401)
+        self.assertFalse(Job.objects.exists())
+
+    def test_other_users_id_is_refused(self):
+        self.assertEqual(self.book(self.other.id, self.token).status_code, 403)
+        self.assertFalse(Job.objects.exists())
+
+    def test_job_belongs_to_the_authenticated_user(self):
+        response = self.book(str(self.user.id), self.token)
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.json()['job_id'])
+        self.assertEqual(job.user, self.user)
+        self.assertEqual(job.payload['userID'], self.user.id)
+
+
+class SearchResultCacheTests(SimpleTestCase):
+    """Concurrent misses share one upstream call; stale entries are served while one refresh runs."""
+
+    def setUp(self):
+        self.now = 1_000_000.0
+        self.enterContext(mock.patch.object(search_cache, 'time', mock.Mock(time=lambda: self.now)))
+        self.cache = SearchResultCache(LocMemLRUBackend(max_entries=2), ttl=300, stale_ttl=60)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return ['offer']
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get_or_fetch('search', fetch)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        # Wait until the other four callers are queued behind the first
+        for _ in range(500):
+            if self.cache.stats()['coalesced'] == 4:
+                break
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, [['offer']] * 5)
+        self.assertEqual(self.cache.stats()['coalesced'], 4)
+
+    def test_failed_fetch_raises_and_is_not_cached(self):
+        def failing():
+            raise ConnectionError('upstream down')
+
+        with self.assertRaises(ConnectionError):
+            self.cache.get_or_fetch('search', failing)
+        self.assertIsNone(self.cache.get('search'))
+        self.assertEqual(self.cache.get_or_fetch('search', lambda: 'fresh'), 'fresh')
+
+    def test_stale_entry_is_served_while_it_is_refreshed(self):
+        self.cache.set('search', 'old')
+        self.now += 301
+        refreshed = threading.Event()
+
+        def fetch():
+            refreshed.set()
+            return 'new'
+
+        self.assertEqual(self.cache.get_or_fetch('search', fetch), 'old')
+        self.assertTrue(refreshed.wait(5))
+        for _ in range(500):
+            if self.cache.get('search') == 'new':
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.cache.get_or_fetch('search', fetch), 'new')
+        self.assertEqual(self.cache.stats()['refreshes'], 1)
+
+    def test_entries_expire_after_the_stale_window(self):
+        self.cache.set('search', 'old')
+        self.now += 361
+        self.assertEqual(self.cache.get_or_fetch('search', lambda: 'new'), 'new')
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_async_misses_share_one_fetch(self):
+        calls = []
+
+        async def afetch():
+            calls.append(1)
+            await asyncio.sleep(0)
+            return 'fresh'
+
+        async def lookups():
+            return await asyncio.gather(*(self.cache.aget_or_fetch('search', afetch) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(lookups()), ['fresh'] * 5)
+        self.assertEqual(calls, [1])
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertEqual((self.cache.get('a'), self.cache.get('b'), self.cache.get('c')), (1, None, 3))
+
+
+class StaleRefreshTests(SimpleTestCase):
+    """A stale search is refreshed in the background only where the event loop outlives the request."""
+
+    def setUp(self):
+        self.cache = SearchResultCache(LocMemLRUBackend(), ttl=0, stale_ttl=60)
+        self.cache.set('search', 'stale')
+
+    async def refreshed(self):
+        return 'fresh'
+
+    async def failing(self):
+        raise ConnectionError('upstream down')
+
+    def test_request_scoped_loop_refreshes_before_returning(self):
+        @async_to_sync
+        async def lookup(afetch):
+            async with request_client():
+                return await self.cache.aget_or_fetch('search', afetch)
+
+        self.assertEqual(lookup(self.failing), 'stale')
+        self.assertEqual(lookup(self.refreshed), 'fresh')
+        self.assertEqual(self.cache.get('search'), 'fresh')
+        self.assertEqual(self.cache._ainflight, {})
+        self.assertEqual(self.cache.stats()['refreshes'], 2)
+
+    def test_long_lived_loop_refreshes_in_the_background(self):
+        async def lookup():
+            value = await self.cache.aget_or_fetch('search', self.refreshed)
+            await asyncio.gather(*self.cache._ainflight.values())
+            return value
+
+        self.assertEqual(asyncio.run(lookup()), 'stale')
+        self.assertEqual(self.cache.get('search'), 'fresh')
+
+
+def compact_offer(number, total):
+    return {
+        'outbound': {'segments': [{
+            'carrierCode': 'TP', 'flightNumber': number, 'departure': {'time': '2030-05-01T09:00:00'},
+        }]},
+        'price': {'total': total, 'currency': 'USD'},
+    }
+
+
+class FakeSearchService:
+    """Answers each sub-query from `offers` by departure date, recording how many run at once."""
+
+    def __init__(self, offers):
+        self.offers = offers
+        self.running = 0
+        self.peak = 0
+
+    def build_search_payload(self, origin, destination, departure_date, return_date, passengers, cabin_class):
+        return {'route': f'{origin}-{destination}', 'date': departure_date.isoformat()}
+
+    async def afetch_flight_offers(self, payload):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            offers = self.offers[payload['date']]
+            if isinstance(offers, Exception):
+                raise offers
+            return offers
+        finally:
+            self.running -= 1
+
+
+class FanOutTests(SimpleTestCase):
+    """Flexible and multi-city searches expand into sub-queries whose offers merge per leg."""
+
+    def test_subqueries_cover_the_flex_window(self):
+        legs = [{'origin': 'JFK', 'destination': 'LIS', 'departure_date': date(2030, 5, 10)}]
+        queries = build_subqueries(legs, flex_days=1, return_date=date(2030, 5, 17), today=date(2030, 1, 1))
+        self.assertEqual([(query['departure_date'].day, query['return_date'].day) for query in queries],
+                         [(9, 16), (10, 17), (11, 18)])
+
+    def test_multi_city_legs_have_no_return(self):
+        legs = [
+            {'origin': 'JFK', 'destination': 'LIS', 'departure_date': date(2030, 5, 10)},
+            {'origin': 'LIS', 'destination': 'MAD', 'departure_date': date(2030, 5, 14)},
+        ]
+        queries = build_subqueries(legs, return_date=date(2030, 5, 20), today=date(2030, 1, 1))
+        self.assertEqual([(query['leg'], query['return_date']) for query in queries], [(0, None), (1, None)])
+
+    def test_dates_before_today_are_dropped(self):
+        legs = [{'origin': 'JFK', 'destination': 'LIS', 'departure_date': date(2030, 5, 10)}]
+        queries = build_subqueries(legs, flex_days=2, today=date(2030, 5, 9))
+        self.assertEqual([query['departure_date'].day for query in queries], [9, 10, 11, 12])
+        self.assertEqual(build_subqueries(legs, today=date(2030, 6, 1)), [])
+
+    def test_search_entirely_in_the_past_is_refused(self):
+        response = self.client.post('/flights/async/search/multi/', json.dumps({
+            'legs': [{'origin': 'JFK', 'destination': 'LIS', 'departure_date': '2020-05-10'}], 'flex_days': 1,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_merger_keeps_the_cheapest_copy_of_each_itinerary(self):
+        merger = OfferMerger(1)
+        self.assertEqual(len(merger.add(0, [compact_offer('201', '300.00'), compact_offer('202', '250.00')])), 2)
+        added = merger.add(0, [compact_offer('201', '280.00'), compact_offer('202', '260.00')])
+        self.assertEqual([offer['price']['total'] for offer in added], ['280.00'])
+        self.assertEqual([offer['price']['total'] for offer in merger.results()[0]], ['250.00', '280.00'])
+
+    def test_search_runs_subqueries_concurrently_and_reports_failures(self):
+        service = FakeSearchService({
+            '2030-05-09': [compact_offer('201', '300.00')],
+            '2030-05-10': [compact_offer('201', '280.00'), compact_offer('202', '310.00')],
+            '2030-05-11': ConnectionError('upstream down'),
+            '2030-05-12': [compact_offer('203', '199.00')],
+        })
+        legs = [{'origin': 'JFK', 'destination': 'LIS', 'departure_date': date(2030, 5, 10)}]
+        queries = build_subqueries(legs, flex_days=2, today=date(2030, 5, 9))
+        self.enterContext(mock.patch.object(
+            fanout, 'get_search_cache', return_value=SearchResultCache(LocMemLRUBackend())
+        ))
+        search = FlightFanOut(concurrency=2, service=service)
+        search.rate_limiter = mock.Mock(aacquire=mock.AsyncMock())
+
+        results, errors = asyncio.run(search.search(queries, len(legs)))
+
+        self.assertEqual([offer['price']['total'] for offer in results[0]], ['199.00', '280.00', '310.00'])
+        self.assertEqual([error['query']['departure_date'] for error in errors], [date(2030, 5, 11)])
+        self.assertEqual(service.peak, 2)
+        self.assertEqual(search.rate_limiter.aacquire.await_count, 4)
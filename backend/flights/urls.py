@@ -1,9 +1,14 @@
 from django.urls import path
-from .views import FlightSearchView, book_flight, get_upcoming_trips, tokenize_payment
+from .views import FlightSearchView, FlightSearchOffersView, FlightSearchCacheStatsView, book_flight, booking_detail, flight_search_async, flight_multi_search_async, get_upcoming_trips, tokenize_payment
 
 urlpatterns = [
     path('search/', FlightSearchView.as_view(), name='flight_search'),
+    path('search/<slug:search_key>/offers/', FlightSearchOffersView.as_view(), name='flight_search_offers'),
+    path('search/cache-stats/', FlightSearchCacheStatsView.as_view(), name='flight_search_cache_stats'),
+    path('async/search/', flight_search_async, name='flight_search_async'),
+    path('async/search/multi/', flight_multi_search_async, name='flight_multi_search_async'),
     path('book/', book_flight, name='book_flight'),
+    path('bookings/<str:booking_reference>/', booking_detail, name='booking_detail'),
     path('payments/tokenize/', tokenize_payment, name='tokenize_payment'),
     path('upcoming_trips/', get_upcoming_trips, name='get_upcoming_trips'),
 ]
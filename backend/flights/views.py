@@ -1,24 +1,42 @@
 import json
+import logging
 import random
 import string
 from django.db import IntegrityError
-from django.http import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
-from amadeus import Client, ResponseError
-from django.conf import settings
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from amadeus import ResponseError
 from django.contrib.auth.decorators import login_required 
 
 from .models import FlightSearch, Booking
-from .serializers import FlightSearchSerializer
+from .booking import book_offer
+from .serializers import BookingSerializer, FlightSearchSerializer, FlightMultiSearchSerializer, FlightOfferQuerySerializer
 from .services import AmadeusService
+from .cache import get_search_cache
+from .offers import get_offer_store
+from .fanout import FlightFanOut, OfferMerger, build_subqueries
+from .listing import filter_offers, paginate_offers
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from travel_smart.pagination import page_headers, paginate
+from jobs.queue import enqueue
+from jobs.views import accepted, wants_async
+from upstream.sdk import get_sdk_client
+from upstream.aio import with_async_client
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 class FlightSearchView(APIView):
     ermission_classes = [AllowAny]  
 
@@ -30,13 +48,16 @@ class FlightSearchView(APIView):
             
             try:
                 amadeus = AmadeusService()
+                search = {
+                    'origin': data['origin'],
+                    'destination': data['destination'],
+                    'departure_date': data['departure_date'].strftime('%Y-%m-%d'),
+                    'return_date': data['return_date'].strftime('%Y-%m-%d') if data.get('return_date') else None,
+                    'passengers': data['passengers'],
+                    'cabin_class': data['cabin_class'],
+                }
                 flights = amadeus.search_flights(
-                    origin=data['origin'],
-                    destination=data['destination'],
-                    departure_date=data['departure_date'].strftime('%Y-%m-%d'),
-                    return_date=data['return_date'].strftime('%Y-%m-%d') if data.get('return_date') else None,
-                    passengers=data['passengers'],
-                    cabin_class=data['cabin_class']
+                    **search, compact=request.query_params.get('compact', 'false').lower() == 'true'
                 )
                 
                 # Save the search
@@ -44,7 +65,8 @@ class FlightSearchView(APIView):
                 
                 return Response({
                     'flights': flights,
-                    'search_id': serializer.instance.id
+                    'search_id': serializer.instance.id,
+                    'search_key': public_search_key(amadeus.search_cache_key(**search))
                 }, status=status.HTTP_200_OK)
                 
             except Exception as e:
@@ -53,66 +75,196 @@ class FlightSearchView(APIView):
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
                 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@csrf_exempt
+@require_POST
+@with_async_client
+async def flight_search_async(request):
+    """Async (ASGI) variant of FlightSearchView that does not hold a thread during the upstream call."""
+    try:
+        body = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format"}, status=400)
+
+    serializer = FlightSearchSerializer(data=body)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    data = serializer.validated_data
+
+    amadeus = AmadeusService()
+    search = {
+        'origin': data['origin'],
+        'destination': data['destination'],
+        'departure_date': data['departure_date'],
+        'return_date': data.get('return_date'),
+        'passengers': data['passengers'],
+        'cabin_class': data['cabin_class'],
+    }
+    try:
+        flights = await amadeus.asearch_flights(
+            **search, compact=request.GET.get('compact', 'false').lower() == 'true'
+        )
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    saved = await FlightSearch.objects.acreate(**data)
+    return JsonResponse({
+        'flights': flights,
+        'search_id': saved.id,
+        'search_key': public_search_key(amadeus.search_cache_key(**search))
+    }, status=200)
+
+
+@csrf_exempt
+@require_POST
+@with_async_client
+async def flight_multi_search_async(request):
+    """
+    Multi-city and flexible-date search. Sub-queries run concurrently and, when
+    `stream` is set, each one is sent to the client as an NDJSON line as soon as
+    it completes, followed by a final summary line. Offers are returned compact,
+    with an `offer_ref` for booking instead of the raw offer.
+    """
+    try:
+        body = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format"}, status=400)
+
+    serializer = FlightMultiSearchSerializer(data=body)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    data = serializer.validated_data
+
+    legs = data['legs']
+    subqueries = build_subqueries(legs, data['flex_days'], data.get('return_date'))
+    if not subqueries:
+        return JsonResponse({"error": "All departure dates are in the past"}, status=400)
+    fanout = FlightFanOut(passengers=data['passengers'], cabin_class=data['cabin_class'])
+
+    if not data['stream']:
+        results, errors = await fanout.search(subqueries, len(legs))
+        return JsonResponse({
+            'legs': [{**leg, 'flights': flights} for leg, flights in zip(legs, results)],
+            'errors': errors
+        }, status=200)
+
+    async def lines():
+        merger = OfferMerger(len(legs))
+        failed = 0
+        async for partial in fanout.stream(subqueries, merger):
+            failed += 'error' in partial
+            yield json.dumps({'type': 'partial', **partial}, cls=DjangoJSONEncoder) + '\n'
+        yield json.dumps({
+            'type': 'complete',
+            'subqueries': len(subqueries),
+            'failed': failed,
+            'offers_per_leg': [len(flights) for flights in merger.results()]
+        }) + '\n'
+
+    return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
+
+def public_search_key(cache_key):
+    """Public part of a search cache key, used to page through its offers."""
+    return cache_key.rsplit(':', 1)[-1]
+
+
+class FlightSearchOffersView(APIView):
+    """
+    Filter, sort and page through the offers of an earlier search, served from
+    the search cache without another upstream call.
+    """
+
+    def get(self, request, search_key):
+        query = FlightOfferQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        options = query.validated_data
+
+        cache = get_search_cache()
+        flights = cache.get(f'{cache.prefix}:{search_key}')
+        if flights is None:
+            return Response({'error': 'Search results have expired, please search again'},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        matches = filter_offers(
+            flights,
+            max_price=options.get('max_price'),
+            max_stops=options.get('max_stops'),
+            carriers=options.get('carriers'),
+            exclude_carriers=options.get('exclude_carriers'),
+            departure_after=options.get('departure_after'),
+            departure_before=options.get('departure_before'),
+            max_duration=options.get('max_duration'),
+        )
+        try:
+            page, next_cursor = paginate_offers(matches, options['sort'], options.get('cursor'), options['limit'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not options['compact']:
+            page = AmadeusService().attach_raw_offers(page)
+            if page is None:
+                return Response({'error': 'Search results have expired, please search again'},
+                                status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'flights': page,
+            'count': len(matches),
+            'next_cursor': next_cursor
+        }, status=status.HTTP_200_OK)
+
+
+class FlightSearchCacheStatsView(APIView):
+    """Hit/miss counters of the flight search cache, used to size it."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_search_cache().stats())
     
+def authenticated_user(request):
+    """The session user or, as this is not a DRF view, the owner of an `Authorization: Token` header."""
+    if request.user.is_authenticated:
+        return request.user
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return authenticated[0] if authenticated else None
+
 @csrf_exempt 
 def book_flight(request):
 
-    amadeus = Client(
-        client_id=settings.AMADEUS_API_KEY,
-        client_secret=settings.AMADEUS_API_SECRET
-    )
     if request.method == "POST":
         try:
             data = json.loads(request.body)
             flight = data.get("flight")  
             traveler = data.get("traveler")
             userID = data.get("userID")
-            # Step 1: Confirm flight pricing
-            pricing_response = amadeus.shopping.flight_offers.pricing.post(flight)
-
-            if pricing_response.status_code != 200:
-                return JsonResponse({"error": "Pricing confirmation failed", "details": pricing_response.body}, status=400)
-
-            confirm_flight = pricing_response.data['flightOffers']
-
-            # Step 2: Proceed with booking
-            booking_response = amadeus.booking.flight_orders.post(confirm_flight, traveler)
-
-            if booking_response.status_code == 201:
-                booking_data = booking_response.data
-                # Extract booking details
-                flight_offer = booking_data['flightOffers'][0]
-                booking_reference = booking_data['associatedRecords'][0]['reference']
-                departure = flight_offer['itineraries'][0]['segments'][0]['departure']['iataCode']
-                arrival = flight_offer['itineraries'][0]['segments'][-1]['arrival']['iataCode']
-                departure_date = flight_offer['itineraries'][0]['segments'][0]['departure']['at'].split("T")[0]
-                arrival_date = flight_offer['itineraries'][0]['segments'][-1]['arrival']['at'].split("T")[0]
-                price = float(flight_offer['price']['grandTotal'])
-                currency = flight_offer['price']['currency']
-                # Save to Booking model
-                try:
-                    user = User.objects.get(id=userID)
-                    Booking.objects.create(
-                        user=user,
-                        departure=departure,
-                        arrival=arrival,
-                        departure_date=departure_date,
-                        arrival_date=arrival_date,
-                        price=price,
-                        currency=currency,
-                        travelers=traveler,
-                        booking_reference=booking_reference,
-                        status="confirmed"
-                    )
-                    print("Booking saved successfully") 
-                    return JsonResponse(booking_response.data, status=201) 
-                except User.DoesNotExist:
-                    return JsonResponse({"error": "User not found"}, status=404)
-                except IntegrityError as e:
-                    print("database integrity errror")
-                except Exception as e:
-                    print("An error occurred")
-            return JsonResponse({"error": "Booking failed", "details": booking_response.body}, status=400)
+            if flight is None and data.get("offer_ref"):
+                # Compact search results reference the raw offer kept server-side
+                flight = get_offer_store().get(data["offer_ref"])
+                if flight is None:
+                    return JsonResponse({"error": "Flight offer has expired, please search again"}, status=404)
+
+            if wants_async(request):
+                # Pricing and ordering run in a worker; the client polls the job, which
+                # belongs to the authenticated user rather than to the userID in the body
+                user = authenticated_user(request)
+                if user is None:
+                    return JsonResponse({"error": "Authentication required"}, status=401)
+                if userID not in (None, "", user.id, str(user.id)):
+                    return JsonResponse({"error": "userID does not match the authenticated user"}, status=403)
+                job = enqueue(
+                    "flights.book", {"flight": flight, "traveler": traveler, "userID": user.id},
+                    user=user, idempotency_key=request.headers.get("Idempotency-Key")
+                )
+                body, headers = accepted(request, job)
+                return JsonResponse(body, status=202, headers=headers)
+
+            status_code, body = book_offer(get_sdk_client(), flight, traveler, userID)
+            return JsonResponse(body, status=status_code)
         except (ResponseError, KeyError, AttributeError) as error:
             return JsonResponse({"error": str(error)}, status=400)
         except json.JSONDecodeError:
@@ -120,6 +272,15 @@ def book_flight(request):
     else:
         return JsonResponse({"error": "Invalid request method"}, status=405)
     
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def booking_detail(request, booking_reference):
+    """One flight booking of the authenticated user, including the traveler details left out of lists."""
+    booking = Booking.objects.filter(user=request.user, booking_reference=booking_reference).first()
+    if booking is None:
+        return Response({'error': 'Booking not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(BookingSerializer(booking).data)
+
 @csrf_exempt
 def tokenize_payment(request):
     """
@@ -156,10 +317,14 @@ def get_upcoming_trips(request):
         #     return JsonResponse({"error": "User is not authenticated"}, status=401)
 
         # Filter bookings for the authenticated user
-        upcoming_trips = Booking.objects.filter(
-            user_id=user["id"],
-            status="confirmed"
-        ).order_by("departure_date")
+        try:
+            page = paginate(request, Booking.objects.filter(
+                user_id=user["id"],
+                status="confirmed",
+                departure_date__gte=timezone.localdate()
+            ).for_list(), ("departure_date", "id"))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
 
         # Format trip data
         trip_data = [
@@ -172,11 +337,11 @@ def get_upcoming_trips(request):
                 "currency": trip.currency,
                 "booking_reference": trip.booking_reference
             }
-            for trip in upcoming_trips
+            for trip in page.items
         ]
 
-        return JsonResponse({"upcomingTrips": trip_data}, status=200)
+        return JsonResponse({"upcomingTrips": trip_data}, status=200, headers=page_headers(request, page))
 
     except Exception as e:
-        print(e)
+        logger.exception('Upcoming trips failed')
         return JsonResponse({"error": str(e)}, status=500)
\ No newline at end of file
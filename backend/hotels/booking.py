@@ -0,0 +1,74 @@
+import uuid
+
+from django.db import IntegrityError, transaction
+
+from .models import HotelBooking, HotelGuest
+from .services import AmadeusHotelService
+
+
+def book_offer(offer_id, guests, payments, rooms, user_id=None):
+    """
+    Book a hotel offer with Amadeus and save the booking and its guests.
+    Returns (booking, formatted confirmation); upstream errors propagate.
+    """
+    hotel_service = AmadeusHotelService()
+    booking_data = hotel_service.book_hotel(offer_id, guests, payments, rooms)
+    formatted = hotel_service.format_booking_confirmation(booking_data)
+
+    return save_booking(offer_id, guests, booking_data, formatted, user_id), formatted
+
+
+def guest_rows(booking, guests):
+    return [
+        HotelGuest(
+            booking=booking,
+            title=guest.get('name', {}).get('title', ''),
+            first_name=guest.get('name', {}).get('firstName', ''),
+            last_name=guest.get('name', {}).get('lastName', ''),
+            email=guest.get('contact', {}).get('email', ''),
+            phone=guest.get('contact', {}).get('phone', ''),
+            is_lead_guest=(index == 0)
+        )
+        for index, guest in enumerate(guests)
+    ]
+
+
+def save_booking(offer_id, guests, booking_data, formatted, user_id=None):
+    """
+    Save a confirmed booking and its guests in one transaction. A retry of a
+    booking already saved under the same provider confirmation ID returns
+    the saved booking instead of a duplicate.
+    """
+    confirmation_id = formatted.get('providerConfirmationId') or ''
+    if confirmation_id:
+        existing = HotelBooking.objects.filter(provider_confirmation_id=confirmation_id).first()
+        if existing is not None:
+            return existing
+
+    try:
+        with transaction.atomic():
+            booking = HotelBooking.objects.create(
+                booking_id=str(uuid.uuid4()),
+                provider_confirmation_id=confirmation_id,
+                hotel_id=offer_id,
+                hotel_name=formatted.get('hotel', ''),
+                check_in_date=formatted.get('check_in'),
+                check_out_date=formatted.get('check_out'),
+                number_of_guests=len(guests),
+                room_type=formatted.get('room_type', 'Standard'),
+                total_price=formatted.get('price', {}).get('total', 0),
+                currency=formatted.get('price', {}).get('currency', 'USD'),
+                status=formatted.get('status', 'confirmed'),
+                booking_data=booking_data,
+                user_id=user_id
+            )
+            HotelGuest.objects.bulk_create(guest_rows(booking, guests))
+    except IntegrityError:
+        # The same confirmation was saved concurrently
+        existing = None
+        if confirmation_id:
+            existing = HotelBooking.objects.filter(provider_confirmation_id=confirmation_id).first()
+        if existing is None:
+            raise
+        return existing
+    return booking
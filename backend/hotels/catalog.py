@@ -0,0 +1,166 @@
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .geo import covering_cells, encode_geohash, haversine_km
+from .models import CatalogHotel
+from .spatial import get_spatial_index
+
+# Amadeus' default search radius for the Hotel List API
+DEFAULT_RADIUS_KM = 5
+
+
+def split_codes(value):
+    """Turn a comma-separated query parameter into a list of codes."""
+    if not value:
+        return []
+    return [code.strip().upper() for code in value.split(',') if code.strip()]
+
+
+def catalog_fields(hotel):
+    """Map one Hotel List API record to CatalogHotel field values."""
+    geo_code = hotel.get('geoCode') or {}
+    latitude = geo_code.get('latitude')
+    longitude = geo_code.get('longitude')
+    if not hotel.get('hotelId') or latitude is None or longitude is None:
+        return None
+
+    last_update = parse_datetime(hotel['lastUpdate']) if hotel.get('lastUpdate') else None
+    if last_update and timezone.is_naive(last_update):
+        # Amadeus reports lastUpdate in UTC without an offset
+        last_update = timezone.make_aware(last_update, dt_timezone.utc)
+    return {
+        'hotel_id': hotel['hotelId'],
+        'name': hotel.get('name') or '',
+        'chain_code': hotel.get('chainCode') or '',
+        'iata_code': hotel.get('iataCode') or '',
+        'country_code': (hotel.get('address') or {}).get('countryCode') or '',
+        'latitude': latitude,
+        'longitude': longitude,
+        'geohash': encode_geohash(latitude, longitude),
+        'amenities': hotel.get('amenities') or [],
+        'rating': hotel.get('rating'),
+        'last_update': last_update,
+    }
+
+
+def format_catalog_hotel(hotel, distance=None):
+    """Same shape as AmadeusHotelService.format_hotel_list, from the local catalog."""
+    item = {
+        'hotel_id': hotel.hotel_id,
+        'name': hotel.name,
+        'chain_code': hotel.chain_code,
+        'iata_code': hotel.iata_code,
+        'location': {
+            'latitude': hotel.latitude,
+            'longitude': hotel.longitude,
+            'country_code': hotel.country_code
+        },
+        'last_update': hotel.last_update.isoformat() if hotel.last_update else None
+    }
+    if distance is not None:
+        item['distance'] = {'value': round(distance, 2), 'unit': 'KM'}
+    return item
+
+
+def filter_catalog(queryset, chain_codes=None, amenities=None, ratings=None):
+    """Apply the Hotel List API filters (comma-separated codes) to catalog hotels."""
+    chains = split_codes(chain_codes)
+    if chains:
+        queryset = queryset.filter(chain_code__in=chains)
+
+    rating_values = split_codes(ratings)
+    if rating_values:
+        queryset = queryset.filter(rating__in=rating_values)
+
+    hotels = list(queryset)
+    required = set(split_codes(amenities))
+    if required:
+        # Amenities are stored as a JSON list, so match them in Python
+        hotels = [hotel for hotel in hotels if required.issubset(hotel.amenities)]
+    return hotels
+
+
+def has_city(city_code):
+    return CatalogHotel.objects.filter(iata_code=city_code.upper()).exists()
+
+
+def hotels_in_city(city_code, chain_codes=None, amenities=None, ratings=None):
+    """Catalog hotels listed under a city code, formatted like the Hotel List API."""
+    queryset = CatalogHotel.objects.filter(iata_code=city_code.upper()).order_by('name')
+    hotels = filter_catalog(queryset, chain_codes, amenities, ratings)
+    return [format_catalog_hotel(hotel) for hotel in hotels]
+
+
+def hotels_near(latitude, longitude, radius=None, chain_codes=None, amenities=None, ratings=None,
+                nearest=None):
+    """Catalog hotels within `radius` km of a point, closest first, at most `nearest` of them."""
+    latitude = float(latitude)
+    longitude = float(longitude)
+    # Until the spatial index is first built, the geohash query below answers
+    index = get_spatial_index() if settings.HOTEL_SPATIAL_INDEX_ENABLED else None
+    if index is not None:
+        return indexed_hotels_near(index, latitude, longitude, radius, chain_codes, amenities, ratings, nearest)
+    radius = float(radius or DEFAULT_RADIUS_KM)
+
+    # Narrow down with the geohash index, then check the exact distance
+    cells = Q()
+    for cell in covering_cells(latitude, longitude, radius):
+        cells |= Q(geohash__startswith=cell)
+    hotels = filter_catalog(CatalogHotel.objects.filter(cells), chain_codes, amenities, ratings)
+
+    nearby = []
+    for hotel in hotels:
+        distance = haversine_km(latitude, longitude, hotel.latitude, hotel.longitude)
+        if distance <= radius:
+            nearby.append((distance, hotel))
+    nearby.sort(key=lambda pair: pair[0])
+    return [format_catalog_hotel(hotel, distance) for distance, hotel in nearby[:nearest]]
+
+
+def indexed_hotels_near(index, latitude, longitude, radius=None, chain_codes=None, amenities=None,
+                        ratings=None, nearest=None):
+    """
+    hotels_near answered from the in-memory spatial index.
+
+    With `nearest` and no radius, the k closest hotels are returned however far
+    away they are (up to HOTEL_SPATIAL_MAX_RADIUS_KM).
+    """
+    filters = {
+        'chain_codes': split_codes(chain_codes),
+        'amenities': split_codes(amenities),
+        'ratings': split_codes(ratings),
+    }
+    if nearest and not radius:
+        matches = index.nearest(latitude, longitude, nearest, **filters)
+    else:
+        matches = index.within(latitude, longitude, float(radius or DEFAULT_RADIUS_KM), limit=nearest, **filters)
+
+    hotels = CatalogHotel.objects.in_bulk([hotel_id for hotel_id, _ in matches], field_name='hotel_id')
+    # Hotels pruned since the index was built are skipped
+    return [
+        format_catalog_hotel(hotels[hotel_id], distance)
+        for hotel_id, distance in matches if hotel_id in hotels
+    ]
+
+
+def find_hotels(city_code=None, latitude=None, longitude=None, radius=None,
+                chain_codes=None, amenities=None, ratings=None, nearest=None):
+    """
+    Answer a hotel list query from the local catalog, or return None when it
+    cannot: the catalog is disabled or empty, the city has not been loaded yet,
+    or a city search asks for a radius (the catalog has no city centres).
+    `nearest` limits a geocode search to the k closest hotels.
+    """
+    if not settings.HOTEL_CATALOG_ENABLED:
+        return None
+    if city_code:
+        if radius or not has_city(city_code):
+            return None
+        return hotels_in_city(city_code, chain_codes, amenities, ratings)
+    if not CatalogHotel.objects.exists():
+        return None
+    return hotels_near(latitude, longitude, radius, chain_codes, amenities, ratings, nearest)
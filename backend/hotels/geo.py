@@ -0,0 +1,110 @@
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Precision at which catalog geohashes are stored (cells of roughly 5 x 5 m)
+STORED_PRECISION = 9
+
+
+def encode_geohash(latitude, longitude, precision=STORED_PRECISION):
+    """Encode a coordinate as a geohash string of `precision` characters."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(latitude, longitude) size in degrees of a geohash cell."""
+    bits = 5 * precision
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+# Most geohash prefixes ORed into one radius lookup; coarser cells are used to stay under it
+MAX_COVER_CELLS = 32
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    (south, north, half_width) in degrees of the smallest box holding every
+    point within `radius_km`; half_width is 180 when the circle reaches a pole.
+    """
+    distance = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(distance)
+    south, north = latitude - dlat, latitude + dlat
+    cos_lat = math.cos(math.radians(latitude))
+    if south <= -90 or north >= 90 or math.sin(distance) >= cos_lat:
+        return max(south, -90.0), min(north, 90.0), 180.0
+    return south, north, math.degrees(math.asin(math.sin(distance) / cos_lat))
+
+
+def box_cells(south, north, west, east, precision):
+    """(rows, columns) index ranges of the geohash cells of `precision` covering a box."""
+    lat_size, lon_size = cell_size(precision)
+    columns = round(360.0 / lon_size)
+    rows = range(int((south + 90.0) // lat_size), int((min(north, 90.0 - 1e-9) + 90.0) // lat_size) + 1)
+    first, last = int((west + 180.0) // lon_size), int((east + 180.0) // lon_size)
+    if last - first + 1 >= columns:
+        return rows, range(columns)
+    # May run past the antimeridian; callers wrap the columns around
+    return rows, range(first, last + 1)
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Geohash prefixes of the cells that together hold every point within
+    `radius_km` of a point, at the finest precision that needs no more than
+    MAX_COVER_CELLS of them.
+    """
+    south, north, half_width = bounding_box(latitude, longitude, radius_km)
+    for precision in range(STORED_PRECISION, 0, -1):
+        rows, columns = box_cells(south, north, longitude - half_width, longitude + half_width, precision)
+        if len(rows) * len(columns) <= MAX_COVER_CELLS or precision == 1:
+            break
+
+    lat_size, lon_size = cell_size(precision)
+    return sorted({
+        encode_geohash(-90.0 + (row + 0.5) * lat_size, (column + 0.5) * lon_size % 360.0 - 180.0, precision)
+        for row in rows for column in columns
+    })
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
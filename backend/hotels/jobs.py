@@ -0,0 +1,28 @@
+import requests
+
+from jobs.queue import JobError, RetryableJobError, register
+
+from .booking import book_offer
+from .services import UpstreamError
+
+# Booking responses that mean the booking was not made, so it is safe to try again.
+# A plain 500 or a timeout may come after the hotel confirmed the room.
+RETRYABLE_BOOKING_STATUSES = {429, 502, 503, 504}
+
+
+@register('hotels.book', sensitive=('payments', 'guests'))
+def book(job):
+    """Book a hotel offer queued by book_hotel; the result matches the synchronous response."""
+    payload = job.payload
+    try:
+        booking, formatted = book_offer(
+            payload['offerId'], payload['guests'], payload['payments'], payload['rooms'], job.user_id
+        )
+    except UpstreamError as error:
+        if error.status_code in RETRYABLE_BOOKING_STATUSES:
+            raise RetryableJobError(str(error))
+        raise JobError(str(error), {'status': error.status_code})
+    except requests.ConnectTimeout as error:
+        # The request never reached Amadeus
+        raise RetryableJobError(str(error))
+    return {'booking': formatted}
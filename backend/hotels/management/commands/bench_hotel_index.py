@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from hotels.spatial import HotelSpatialIndex
+
+CHAINS = ['HI', 'MC', 'RT', 'HY', 'AC', 'BW', 'IC', 'WV', 'SI', 'FS']
+AMENITIES = ['WIFI', 'PARKING', 'SWIMMING_POOL', 'FITNESS_CENTER', 'SPA', 'RESTAURANT', 'AIR_CONDITIONING', 'PETS_ALLOWED']
+
+
+def synthetic_hotels(count, cities, rng):
+    """Hotels clustered around random city centres, like the real catalog."""
+    centres = np.column_stack([rng.uniform(-60, 70, cities), rng.uniform(-180, 180, cities)])
+    city = rng.integers(0, cities, count)
+    latitudes = np.clip(centres[city, 0] + rng.normal(0, 0.08, count), -90, 90)
+    longitudes = (centres[city, 1] + rng.normal(0, 0.1, count) + 180) % 360 - 180
+    chains = [CHAINS[i] for i in rng.integers(0, len(CHAINS), count)]
+    ratings = [str(r) for r in rng.integers(1, 6, count)]
+    amenity_flags = rng.random((count, len(AMENITIES))) < 0.4
+    amenities = [[AMENITIES[j] for j in np.flatnonzero(row)] for row in amenity_flags]
+    hotel_ids = [f'BM{i:06d}' for i in range(count)]
+    return hotel_ids, latitudes, longitudes, chains, ratings, amenities, centres
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return f'p50 {np.percentile(ms, 50):.3f} ms  p95 {np.percentile(ms, 95):.3f} ms  mean {ms.mean():.3f} ms'
+
+
+class Command(BaseCommand):
+    help = "Benchmark the in-memory hotel spatial index on synthetic clustered data."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100_000, 1_000_000])
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--cities', type=int, default=2000)
+        parser.add_argument('--radius', type=float, default=5.0)
+        parser.add_argument('--k', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            self.bench(size, options)
+
+    def bench(self, size, options):
+        rng = np.random.default_rng(options['seed'])
+        hotel_ids, latitudes, longitudes, chains, ratings, amenities, centres = synthetic_hotels(
+            size, options['cities'], rng
+        )
+
+        started = time.perf_counter()
+        index = HotelSpatialIndex(
+            hotel_ids, latitudes, longitudes, chains, ratings, amenities,
+            cell_deg=settings.HOTEL_SPATIAL_CELL_DEG
+        )
+        build = time.perf_counter() - started
+
+        # Query points near city centres, where searches actually land
+        picks = rng.integers(0, len(centres), options['queries'])
+        points = centres[picks] + rng.normal(0, 0.05, (options['queries'], 2))
+        radius = options['radius']
+
+        def timed(query):
+            samples = []
+            found = 0
+            for latitude, longitude in points:
+                started = time.perf_counter()
+                found += len(query(latitude, longitude))
+                samples.append(time.perf_counter() - started)
+            return samples, found / len(points)
+
+        lat_rad = np.radians(latitudes)
+        lon_rad = np.radians(longitudes)
+        cos_lat = np.cos(lat_rad)
+
+        def full_scan(latitude, longitude):
+            phi, lam = np.radians(latitude), np.radians(longitude)
+            a = np.sin((lat_rad - phi) / 2) ** 2 + np.cos(phi) * cos_lat * np.sin((lon_rad - lam) / 2) ** 2
+            return np.flatnonzero(2 * 6371.0088 * np.arcsin(np.sqrt(np.minimum(a, 1.0))) <= radius)
+
+        runs = [
+            ('full scan radius', full_scan),
+            ('index radius', lambda lat, lon: index.within(lat, lon, radius)),
+            (f'index nearest k={options["k"]}', lambda lat, lon: index.nearest(lat, lon, options['k'])),
+            ('index radius filtered', lambda lat, lon: index.within(
+                lat, lon, radius, chain_codes=['HI', 'MC'], ratings=['4', '5'], amenities=['WIFI']
+            )),
+        ]
+
+        self.stdout.write(f'{size:,} hotels: index built in {build:.2f} s')
+        for name, query in runs:
+            samples, found = timed(query)
+            self.stdout.write(f'  {name:<24} {percentiles(samples)}  ({found:.1f} hotels/query)')
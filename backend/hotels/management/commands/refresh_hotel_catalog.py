@@ -0,0 +1,94 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from hotels.catalog import catalog_fields
+from hotels.models import CatalogHotel
+from hotels.services import AmadeusHotelService
+
+UPDATE_FIELDS = [
+    'name', 'chain_code', 'iata_code', 'country_code', 'latitude', 'longitude',
+    'geohash', 'amenities', 'rating', 'last_update',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load or refresh the local hotel catalog from the Amadeus Hotel List API. "
+        "Only hotels whose lastUpdate changed are rewritten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--city', nargs='+', dest='cities',
+                            help='IATA city codes to refresh (defaults to HOTEL_CATALOG_CITIES)')
+        parser.add_argument('--file', help='Load a saved Hotel List API response instead of calling Amadeus')
+        parser.add_argument('--full', action='store_true', help='Rewrite every hotel, ignoring lastUpdate')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete catalog hotels of a refreshed city that Amadeus no longer lists')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['file']:
+            with open(options['file']) as f:
+                records = json.load(f).get('data', [])
+            self.sync(records, options)
+            return
+
+        cities = options['cities'] or settings.HOTEL_CATALOG_CITIES
+        if not cities:
+            raise CommandError('No cities given; pass --city or set HOTEL_CATALOG_CITIES.')
+
+        service = AmadeusHotelService()
+        for city_code in cities:
+            city_code = city_code.upper()
+            try:
+                records = service.get_hotels_by_city(city_code=city_code).get('data', [])
+            except Exception as e:
+                self.stderr.write(f'{city_code}: {e}')
+                continue
+            self.sync(records, options, city_code=city_code)
+
+    def sync(self, records, options, city_code=None):
+        incoming = {}
+        for record in records:
+            fields = catalog_fields(record)
+            if fields:
+                incoming[fields['hotel_id']] = fields
+
+        existing = {
+            hotel.hotel_id: hotel
+            for hotel in CatalogHotel.objects.filter(hotel_id__in=list(incoming)).only('id', 'hotel_id', 'last_update')
+        }
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        for hotel_id, fields in incoming.items():
+            hotel = existing.get(hotel_id)
+            if hotel is None:
+                to_create.append(CatalogHotel(**fields))
+            elif options['full'] or not hotel.last_update or (
+                fields['last_update'] and fields['last_update'] > hotel.last_update
+            ):
+                for name in UPDATE_FIELDS:
+                    setattr(hotel, name, fields[name])
+                hotel.refreshed_at = now
+                to_update.append(hotel)
+
+        with transaction.atomic():
+            CatalogHotel.objects.bulk_create(to_create, batch_size=options['batch_size'])
+            CatalogHotel.objects.bulk_update(to_update, UPDATE_FIELDS + ['refreshed_at'], batch_size=options['batch_size'])
+            pruned = 0
+            if options['prune'] and city_code:
+                pruned, _ = CatalogHotel.objects.filter(iata_code=city_code).exclude(
+                    hotel_id__in=list(incoming)
+                ).delete()
+
+        label = city_code or options['file']
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: {len(to_create)} added, {len(to_update)} updated, '
+            f'{len(incoming) - len(to_create) - len(to_update)} unchanged, {pruned} removed'
+        ))
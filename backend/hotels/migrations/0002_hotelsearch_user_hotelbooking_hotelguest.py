@@ -0,0 +1,89 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='hotelsearch',
+            name='rating',
+        ),
+        migrations.AddField(
+            model_name='hotelsearch',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hotelsearch',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hotelsearch',
+            name='ratings',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='hotelsearch',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hotel_searches', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='hotelsearch',
+            name='adults',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AlterField(
+            model_name='hotelsearch',
+            name='city_code',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='hotelsearch',
+            name='price_range',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.CreateModel(
+            name='HotelBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_id', models.CharField(max_length=100, unique=True)),
+                ('provider_confirmation_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('hotel_id', models.CharField(max_length=100)),
+                ('hotel_name', models.CharField(max_length=255)),
+                ('check_in_date', models.DateField()),
+                ('check_out_date', models.DateField()),
+                ('number_of_guests', models.PositiveIntegerField()),
+                ('room_type', models.CharField(max_length=100)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('booking_data', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hotel_bookings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HotelGuest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=10)),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('is_lead_guest', models.BooleanField(default=False)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='guests', to='hotels.hotelbooking')),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0002_hotelsearch_user_hotelbooking_hotelguest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogHotel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hotel_id', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('chain_code', models.CharField(blank=True, max_length=10)),
+                ('iata_code', models.CharField(db_index=True, max_length=10)),
+                ('country_code', models.CharField(blank=True, max_length=3)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('geohash', models.CharField(db_index=True, max_length=12)),
+                ('amenities', models.JSONField(blank=True, default=list)),
+                ('rating', models.CharField(blank=True, max_length=5, null=True)),
+                ('last_update', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
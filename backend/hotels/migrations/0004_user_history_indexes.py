@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0003_cataloghotel'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hotelbooking',
+            index=models.Index(fields=['user', '-created_at'], name='hotelbooking_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotelsearch',
+            index=models.Index(fields=['user', '-created_at'], name='hotelsearch_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0004_user_history_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hotelbooking',
+            index=models.Index(fields=['user', 'check_in_date'], name='hotelbooking_user_checkin_idx'),
+        ),
+    ]
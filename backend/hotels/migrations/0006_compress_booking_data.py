@@ -0,0 +1,54 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+import travel_smart.fields
+
+
+def compress_booking_data(apps, schema_editor):
+    HotelBooking = apps.get_model('hotels', 'HotelBooking')
+    bookings = HotelBooking.objects.exclude(booking_data=None).only('id', 'booking_data')
+    for booking in bookings.iterator(chunk_size=500):
+        booking.compressed_booking_data = booking.booking_data
+        booking.save(update_fields=['compressed_booking_data'])
+
+
+def decompress_booking_data(apps, schema_editor):
+    HotelBooking = apps.get_model('hotels', 'HotelBooking')
+    bookings = HotelBooking.objects.exclude(compressed_booking_data=None).only('id', 'compressed_booking_data')
+    for booking in bookings.iterator(chunk_size=500):
+        booking.booking_data = booking.compressed_booking_data
+        booking.save(update_fields=['booking_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0005_booking_check_in_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hotelbooking',
+            name='compressed_booking_data',
+            field=travel_smart.fields.CompressedJSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(compress_booking_data, decompress_booking_data),
+        migrations.RemoveField(
+            model_name='hotelbooking',
+            name='booking_data',
+        ),
+        migrations.RenameField(
+            model_name='hotelbooking',
+            old_name='compressed_booking_data',
+            new_name='booking_data',
+        ),
+        migrations.AddConstraint(
+            model_name='hotelbooking',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('provider_confirmation_id__gt', '')),
+                fields=('provider_confirmation_id',),
+                name='hotelbooking_provider_confirmation_uniq',
+            ),
+        ),
+    ]
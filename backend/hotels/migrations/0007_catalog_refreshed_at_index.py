@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0006_compress_booking_data'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cataloghotel',
+            index=models.Index(fields=['refreshed_at'], name='cataloghotel_refreshed_idx'),
+        ),
+    ]
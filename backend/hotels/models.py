@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from travel_smart.fields import CompressedJSONField
+
 class HotelSearch(models.Model):
     """Model to store hotel search parameters and history."""
     user = models.ForeignKey(
@@ -20,11 +22,22 @@ class HotelSearch(models.Model):
     ratings = models.CharField(max_length=10, null=True, blank=True)
     price_range = models.CharField(max_length=20, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='hotelsearch_user_created_idx'),
+        ]
     
     def __str__(self):
         location = self.city_code or f"{self.latitude},{self.longitude}"
         return f"Search for {location} ({self.check_in_date} to {self.check_out_date})"
 
+class HotelBookingQuerySet(models.QuerySet):
+    def for_list(self):
+        """Bookings as list views show them: without the provider response, guests prefetched."""
+        return self.defer('booking_data').prefetch_related('guests')
+
+
 class HotelBooking(models.Model):
     """Model to store hotel booking information."""
     STATUS_CHOICES = (
@@ -49,9 +62,25 @@ class HotelBooking(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='USD')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    booking_data = models.JSONField(null=True, blank=True)  # Store the full booking response
+    booking_data = CompressedJSONField(null=True, blank=True)  # Store the full booking response
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = HotelBookingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='hotelbooking_user_created_idx'),
+            models.Index(fields=['user', 'check_in_date'], name='hotelbooking_user_checkin_idx'),
+        ]
+        constraints = [
+            # A retried booking must not be saved twice
+            models.UniqueConstraint(
+                fields=['provider_confirmation_id'],
+                condition=models.Q(provider_confirmation_id__gt=''),
+                name='hotelbooking_provider_confirmation_uniq',
+            ),
+        ]
     
     def __str__(self):
         return f"Booking {self.booking_id} - {self.hotel_name}"
@@ -71,4 +100,28 @@ class HotelGuest(models.Model):
     is_lead_guest = models.BooleanField(default=False)
     
     def __str__(self):
-        return f"{self.first_name} {self.last_name}"
\ No newline at end of file
+        return f"{self.first_name} {self.last_name}"
+
+class CatalogHotel(models.Model):
+    """Local copy of Amadeus hotel reference data from the Hotel List API."""
+    hotel_id = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=255)
+    chain_code = models.CharField(max_length=10, blank=True)
+    iata_code = models.CharField(max_length=10, db_index=True)  # City the hotel is listed under
+    country_code = models.CharField(max_length=3, blank=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    geohash = models.CharField(max_length=12, db_index=True)  # Used for radius lookups
+    amenities = models.JSONField(default=list, blank=True)
+    rating = models.CharField(max_length=5, null=True, blank=True)
+    last_update = models.DateTimeField(null=True, blank=True)  # lastUpdate reported by Amadeus
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Max(refreshed_at) tells spatial index workers whether the catalog changed
+            models.Index(fields=['refreshed_at'], name='cataloghotel_refreshed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.hotel_id})"
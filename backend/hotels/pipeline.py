@@ -0,0 +1,80 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from upstream.ratelimit import get_rate_limiter
+
+from . import catalog
+from .services import AmadeusHotelService
+
+
+def chunk_hotel_ids(hotel_ids, size):
+    """Split hotel IDs into batches small enough for one Hotel Search request."""
+    for start in range(0, len(hotel_ids), size):
+        yield hotel_ids[start:start + size]
+
+
+class HotelSearchPipeline:
+    """
+    City/geocode -> offers search in two stages.
+
+    Stage 1 lists the hotels around the location; stage 2 asks for offers in
+    batches of `batch_size` hotel IDs, with at most `concurrency` batches in
+    flight. Batches are yielded as they complete so the first page can be sent
+    before the slowest batch returns.
+    """
+
+    def __init__(self, batch_size=None, concurrency=None, max_hotels=None, service=None):
+        self.batch_size = batch_size or settings.HOTEL_OFFERS_BATCH_SIZE
+        self.concurrency = concurrency or settings.HOTEL_PIPELINE_CONCURRENCY
+        self.max_hotels = max_hotels or settings.HOTEL_PIPELINE_MAX_HOTELS
+        self.service = service or AmadeusHotelService()
+        self.rate_limiter = get_rate_limiter()
+
+    async def list_hotel_ids(self, city_code=None, latitude=None, longitude=None, **filters):
+        """Stage 1: IDs of the hotels around a city or a point, from the local catalog when possible."""
+        hotels = await sync_to_async(catalog.find_hotels)(city_code, latitude, longitude, **filters)
+        if hotels is None:
+            await self.rate_limiter.aacquire()
+            if city_code:
+                hotels_data = await self.service.aget_hotels_by_city(city_code=city_code, **filters)
+            else:
+                hotels_data = await self.service.aget_hotels_by_geocode(
+                    latitude=latitude, longitude=longitude, **filters
+                )
+            hotels = self.service.format_hotel_list(hotels_data)
+        return [hotel['hotel_id'] for hotel in hotels if hotel['hotel_id']][:self.max_hotels]
+
+    async def fetch_batch(self, semaphore, hotel_ids, search):
+        async with semaphore:
+            await self.rate_limiter.aacquire()
+            offers_data = await self.service.asearch_hotel_offers(hotel_ids=hotel_ids, **search)
+        return self.service.format_hotel_offers(offers_data)
+
+    async def stream(self, hotel_ids, **search):
+        """
+        Stage 2: yield {'hotel_ids', 'offers'} (or 'error') per batch, in completion order.
+
+        `search` holds the Hotel Search parameters (dates, adults, rooms, price_range).
+        A failed batch is reported without stopping the others; Amadeus answers
+        with an error when none of the hotels in a batch have availability.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = {
+            asyncio.ensure_future(self.fetch_batch(semaphore, batch, search)): batch
+            for batch in chunk_hotel_ids(hotel_ids, self.batch_size)
+        }
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        yield {'hotel_ids': tasks[task], 'offers': [], 'error': str(task.exception())}
+                    else:
+                        yield {'hotel_ids': tasks[task], 'offers': task.result()}
+        finally:
+            # The client went away or iteration stopped early
+            for task in tasks:
+                task.cancel()
@@ -21,6 +21,7 @@ class HotelGuestSerializer(serializers.ModelSerializer):
 
 class HotelBookingSerializer(serializers.ModelSerializer):
     guests = HotelGuestSerializer(many=True, read_only=True)
+    booking_data = serializers.JSONField(read_only=True)
     
     class Meta:
         model = HotelBooking
@@ -33,4 +34,13 @@ class HotelBookingSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             validated_data['user'] = request.user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class HotelBookingListSerializer(serializers.ModelSerializer):
+    """Booking summaries for lists; the full provider response is only served by the detail view."""
+    guests = HotelGuestSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = HotelBooking
+        exclude = ('booking_data',)
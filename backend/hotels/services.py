@@ -1,187 +1,186 @@
+import logging
 from datetime import datetime
-import requests
-from django.conf import settings
+
+from upstream.aio import get_async_client
+from upstream.client import get_client
+from upstream.log import redact
+
+HOTELS_BY_CITY_PATH = '/v1/reference-data/locations/hotels/by-city'
+HOTELS_BY_GEOCODE_PATH = '/v1/reference-data/locations/hotels/by-geocode'
+HOTEL_OFFERS_PATH = '/v3/shopping/hotel-offers'
+HOTEL_BOOKINGS_PATH = '/v1/booking/hotel-bookings'
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    """A non-200 Amadeus response; `status_code` is the upstream status."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
 
 class AmadeusHotelService:
     def __init__(self):
-        self.api_key = settings.AMADEUS_API_KEY
-        self.api_secret = settings.AMADEUS_API_SECRET
-        self.token = None
-        
-    def get_access_token(self):
-        """Get OAuth2 token from Amadeus API."""
-        url = 'https://test.api.amadeus.com/v1/security/oauth2/token'
-        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        data = {
-            'grant_type': 'client_credentials',
-            'client_id': self.api_key,
-            'client_secret': self.api_secret
-        }
-        
-        response = requests.post(url, headers=headers, data=data)
-        if response.status_code == 200:
-            self.token = response.json()['access_token']
-            return self.token
-        raise Exception(f'Failed to get access token: {response.text}')
-
-    def get_auth_headers(self):
-        """Get authorization headers with token."""
-        if not self.token:
-            self.get_access_token()
-            
-        return {
-            'Authorization': f'Bearer {self.token}',
-            'Content-Type': 'application/json'
-        }
+        self.client = get_client()
 
-    def handle_response(self, response, retry_func=None):
-        """Handle API response with token refresh if needed."""
+    def handle_response(self, response):
+        """Return the JSON body of a successful API response."""
         if response.status_code == 200:
             return response.json()
-        elif response.status_code == 401 and retry_func:
-            # Token expired, get new token and retry
-            self.get_access_token()
-            return retry_func()
-        else:
-            raise Exception(f'API request failed: {response.status_code} - {response.text}')
+        raise UpstreamError(f'API request failed: {response.status_code} - {response.text}', response.status_code)
 
-    # Step 1: Hotel List API
-    def get_hotels_by_city(self, city_code, radius=None, chain_codes=None, amenities=None, ratings=None):
-        """Get list of hotels in a city using the Hotel List API."""
-        def make_request():
-            headers = self.get_auth_headers()
-            url = 'https://test.api.amadeus.com/v1/reference-data/locations/hotels/by-city'
+    # Request builders shared by the sync and async methods
+    def hotel_list_params(self, radius=None, chain_codes=None, amenities=None, ratings=None, **location):
+        """Query parameters for the Hotel List API (by-city or by-geocode)."""
+        params = dict(location)
+        
+        if radius:
+            params['radius'] = radius
+            params['radiusUnit'] = 'KM'
             
-            params = {'cityCode': city_code}
+        if chain_codes:
+            params['chainCodes'] = chain_codes
             
-            if radius:
-                params['radius'] = radius
-                params['radiusUnit'] = 'KM'
-                
-            if chain_codes:
-                params['chainCodes'] = chain_codes
-                
-            if amenities:
-                params['amenities'] = amenities
-                
-            if ratings:
-                params['ratings'] = ratings
+        if amenities:
+            params['amenities'] = amenities
             
-            return requests.get(url, headers=headers, params=params)
+        if ratings:
+            params['ratings'] = ratings
         
-        response = make_request()
-        return self.handle_response(response, make_request)
-    
-    def get_hotels_by_geocode(self, latitude, longitude, radius=None, chain_codes=None, amenities=None, ratings=None):
-        """Get list of hotels by geographic coordinates using the Hotel List API."""
-        def make_request():
-            headers = self.get_auth_headers()
-            url = 'https://test.api.amadeus.com/v1/reference-data/locations/hotels/by-geocode'
+        return params
+
+    def hotel_offer_params(self, hotel_ids=None, city_code=None, check_in_date=None,
+                           check_out_date=None, adults=1, rooms=1, price_range=None):
+        """Query parameters for the Hotel Search API."""
+        params = {}
+        
+        # Hotel Search API can search by hotelIds OR cityCode
+        if hotel_ids:
+            if isinstance(hotel_ids, list):
+                params['hotelIds'] = ','.join(hotel_ids)
+            else:
+                params['hotelIds'] = hotel_ids
+        elif city_code:
+            params['cityCode'] = city_code
+        
+        if check_in_date:
+            params['checkInDate'] = check_in_date
             
-            params = {
-                'latitude': latitude,
-                'longitude': longitude
-            }
+        if check_out_date:
+            params['checkOutDate'] = check_out_date
             
-            if radius:
-                params['radius'] = radius
-                params['radiusUnit'] = 'KM'
-                
-            if chain_codes:
-                params['chainCodes'] = chain_codes
-                
-            if amenities:
-                params['amenities'] = amenities
-                
-            if ratings:
-                params['ratings'] = ratings
+        params['adults'] = adults
+        params['roomQuantity'] = rooms
+        
+        if price_range:
+            params['priceRange'] = price_range
+        
+        return params
+
+    def booking_payload(self, offer_id, guests, payments=None, rooms=None):
+        """Request body for the Hotel Booking API."""
+        payload = {
+            "data": {
+                "offerId": offer_id,
+                "guests": guests
+            }
+        }
+        
+        if payments:
+            payload['data']['payments'] = payments
             
-            return requests.get(url, headers=headers, params=params)
+        if rooms:
+            payload['data']['rooms'] = rooms
         
-        response = make_request()
-        return self.handle_response(response, make_request)
+        return payload
+
+    # Step 1: Hotel List API
+    def get_hotels_by_city(self, city_code, radius=None, chain_codes=None, amenities=None, ratings=None):
+        """Get list of hotels in a city using the Hotel List API."""
+        params = self.hotel_list_params(radius, chain_codes, amenities, ratings, cityCode=city_code)
+        response = self.client.get(HOTELS_BY_CITY_PATH, endpoint='hotel_list', params=params)
+        return self.handle_response(response)
+    
+    def get_hotels_by_geocode(self, latitude, longitude, radius=None, chain_codes=None, amenities=None, ratings=None):
+        """Get list of hotels by geographic coordinates using the Hotel List API."""
+        params = self.hotel_list_params(
+            radius, chain_codes, amenities, ratings, latitude=latitude, longitude=longitude
+        )
+        response = self.client.get(HOTELS_BY_GEOCODE_PATH, endpoint='hotel_list', params=params)
+        return self.handle_response(response)
     
     # Step 2: Hotel Search API
     def search_hotel_offers(self, hotel_ids=None, city_code=None, check_in_date=None, 
                            check_out_date=None, adults=1, rooms=1, price_range=None):
         """Search hotel offers using Amadeus Hotel Search API."""
-        def make_request():
-            headers = self.get_auth_headers()
-            url = 'https://test.api.amadeus.com/v3/shopping/hotel-offers'
-            
-            params = {}
-            
-            # Hotel Search API can search by hotelIds OR cityCode
-            if hotel_ids:
-                if isinstance(hotel_ids, list):
-                    params['hotelIds'] = ','.join(hotel_ids)
-                else:
-                    params['hotelIds'] = hotel_ids
-            elif city_code:
-                params['cityCode'] = city_code
-            
-            if check_in_date:
-                params['checkInDate'] = check_in_date
-                
-            if check_out_date:
-                params['checkOutDate'] = check_out_date
-                
-            params['adults'] = adults
-            params['roomQuantity'] = rooms
-            
-            if price_range:
-                params['priceRange'] = price_range
-            
-            return requests.get(url, headers=headers, params=params)
-        
-        response = make_request()
-        return self.handle_response(response, make_request)
+        params = self.hotel_offer_params(
+            hotel_ids, city_code, check_in_date, check_out_date, adults, rooms, price_range
+        )
+        response = self.client.get(HOTEL_OFFERS_PATH, endpoint='hotel_offers', params=params)
+        return self.handle_response(response)
     
     def get_hotel_offer_details(self, offer_id):
         """Get detailed information about a specific hotel offer."""
-        def make_request():
-            headers = self.get_auth_headers()
-            url = f'https://test.api.amadeus.com/v3/shopping/hotel-offers/{offer_id}'
-            return requests.get(url, headers=headers)
-        
-        response = make_request()
-        return self.handle_response(response, make_request)
+        response = self.client.get(f'{HOTEL_OFFERS_PATH}/{offer_id}', endpoint='hotel_offer')
+        return self.handle_response(response)
     
     # Step 3: Hotel Booking API
+    def log_booking_request(self, payload):
+        # Guest contacts and the payment card are masked
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Hotel booking request: %s', redact(payload))
+
+    def log_booking_response(self, status_code):
+        if status_code == 200:
+            logger.info('Hotel booking confirmed')
+        else:
+            logger.warning('Hotel booking failed with status %s', status_code)
+
     def book_hotel(self, offer_id, guests, payments=None, rooms=None):
         """Book a hotel room using Amadeus Hotel Booking API."""
-        def make_request():
-            headers = self.get_auth_headers()
-            url = 'https://test.api.amadeus.com/v1/booking/hotel-bookings'
-            
-            # Format the request body according to the API requirements
-            payload = {
-                "data": {
-                    "offerId": offer_id,
-                    "guests": guests
-                }
-            }
-            
-            if payments:
-                payload['data']['payments'] = payments
-                
-            if rooms:
-                payload['data']['rooms'] = rooms
-        
-            print(f"Booking API Request URL: {url}")
-            print(f"Booking API Request Headers: {headers}")
-            print(f"Booking API Request Payload: {payload}")
-            
-            response = requests.post(url, headers=headers, json=payload)
-            
-            print(f"Booking API Response Status: {response.status_code}")
-            print(f"Booking API Response Headers: {response.headers}")
-            print(f"Booking API Response Content: {response.content}")
-            
-            return response
-        
-        response = make_request()
-        return self.handle_response(response, make_request)
+        payload = self.booking_payload(offer_id, guests, payments, rooms)
+        self.log_booking_request(payload)
+
+        # Bookings are not idempotent, so never retry them automatically
+        response = self.client.post(HOTEL_BOOKINGS_PATH, endpoint='hotel_booking', json=payload, retry=False)
+        self.log_booking_response(response.status_code)
+        return self.handle_response(response)
+
+    # Async variants for ASGI views
+    async def aget_hotels_by_city(self, city_code, radius=None, chain_codes=None, amenities=None, ratings=None):
+        params = self.hotel_list_params(radius, chain_codes, amenities, ratings, cityCode=city_code)
+        response = await get_async_client().get(HOTELS_BY_CITY_PATH, endpoint='hotel_list', params=params)
+        return self.handle_response(response)
+
+    async def aget_hotels_by_geocode(self, latitude, longitude, radius=None, chain_codes=None, amenities=None, ratings=None):
+        params = self.hotel_list_params(
+            radius, chain_codes, amenities, ratings, latitude=latitude, longitude=longitude
+        )
+        response = await get_async_client().get(HOTELS_BY_GEOCODE_PATH, endpoint='hotel_list', params=params)
+        return self.handle_response(response)
+
+    async def asearch_hotel_offers(self, hotel_ids=None, city_code=None, check_in_date=None,
+                                   check_out_date=None, adults=1, rooms=1, price_range=None):
+        params = self.hotel_offer_params(
+            hotel_ids, city_code, check_in_date, check_out_date, adults, rooms, price_range
+        )
+        response = await get_async_client().get(HOTEL_OFFERS_PATH, endpoint='hotel_offers', params=params)
+        return self.handle_response(response)
+
+    async def aget_hotel_offer_details(self, offer_id):
+        response = await get_async_client().get(f'{HOTEL_OFFERS_PATH}/{offer_id}', endpoint='hotel_offer')
+        return self.handle_response(response)
+
+    async def abook_hotel(self, offer_id, guests, payments=None, rooms=None):
+        payload = self.booking_payload(offer_id, guests, payments, rooms)
+        self.log_booking_request(payload)
+        response = await get_async_client().post(
+            HOTEL_BOOKINGS_PATH, endpoint='hotel_booking', json=payload, retry=False
+        )
+        self.log_booking_response(response.status_code)
+        return self.handle_response(response)
     
     # Helper methods for formatting responses
     def format_hotel_list(self, api_response):
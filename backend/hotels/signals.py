@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from travel_smart.response_cache import HOTEL_BOOKINGS, TIMELINE, invalidate
+
+from .models import HotelBooking
+
+
+@receiver([post_save, post_delete], sender=HotelBooking)
+def booking_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id, HOTEL_BOOKINGS, TIMELINE)
@@ -0,0 +1,233 @@
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max
+
+from .geo import EARTH_RADIUS_KM, KM_PER_DEGREE
+from .models import CatalogHotel
+
+logger = logging.getLogger(__name__)
+
+
+class HotelSpatialIndex:
+    """
+    In-memory grid index over hotel coordinates.
+
+    Hotels are bucketed into `cell_deg` x `cell_deg` grid cells and stored sorted
+    by cell, so the cells of one grid row that cover a query are a contiguous
+    slice found by binary search. Distances to the candidates are then computed
+    in one vectorized haversine pass. Chain, rating and amenity filters run on
+    precomputed integer columns (chain ids, ratings, amenity bitmasks).
+    """
+
+    def __init__(self, hotel_ids, latitudes, longitudes, chain_codes=None, ratings=None,
+                 amenities=None, cell_deg=0.1):
+        count = len(hotel_ids)
+        self.hotel_ids = np.asarray(hotel_ids, dtype=object)
+        self.cell_deg = cell_deg
+        self.columns = int(math.ceil(360 / cell_deg))
+        self.rows = int(math.ceil(180 / cell_deg))
+
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+
+        # Latitude 90 would start a row of its own past the last one
+        rows = np.clip(np.floor((latitudes + 90) / cell_deg), 0, self.rows - 1).astype(np.int64)
+        cols = np.floor((longitudes + 180) / cell_deg).astype(np.int64) % self.columns
+        keys = rows * self.columns + cols
+        order = np.argsort(keys, kind='stable')
+
+        # Everything below is stored in cell order
+        self.keys = keys[order]
+        self.order = order
+        self.lat = np.radians(latitudes[order])
+        self.lon = np.radians(longitudes[order])
+        self.cos_lat = np.cos(self.lat)
+
+        self.chain_vocab = {}
+        chain_ids = np.zeros(count, dtype=np.int32)
+        for i, code in enumerate(chain_codes if chain_codes is not None else [None] * count):
+            if code:
+                chain_ids[i] = self.chain_vocab.setdefault(code, len(self.chain_vocab) + 1)
+        self.chain_ids = chain_ids[order]
+
+        rating_values = np.zeros(count, dtype=np.int8)
+        for i, rating in enumerate(ratings if ratings is not None else [None] * count):
+            if rating and str(rating).isdigit():
+                rating_values[i] = int(rating)
+        self.ratings = rating_values[order]
+
+        self.amenity_vocab = {}
+        for codes in amenities or []:
+            for code in codes or []:
+                self.amenity_vocab.setdefault(code, len(self.amenity_vocab))
+        words = max(1, math.ceil(len(self.amenity_vocab) / 64))
+        masks = np.zeros((count, words), dtype=np.uint64)
+        for i, codes in enumerate(amenities or []):
+            for code in codes or []:
+                bit = self.amenity_vocab[code]
+                masks[i, bit // 64] |= np.uint64(1 << (bit % 64))
+        self.amenity_masks = masks[order]
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_catalog(cls, cell_deg=None):
+        """Build the index from every hotel in the local catalog."""
+        rows = CatalogHotel.objects.values_list(
+            'hotel_id', 'latitude', 'longitude', 'chain_code', 'rating', 'amenities'
+        ).iterator(chunk_size=5000)
+        columns = list(zip(*rows)) or [[], [], [], [], [], []]
+        return cls(*columns, cell_deg=cell_deg or settings.HOTEL_SPATIAL_CELL_DEG)
+
+    def _candidates(self, latitude, longitude, radius_km):
+        """Positions of hotels in the grid cells overlapping the query circle."""
+        dlat = radius_km / KM_PER_DEGREE
+        first_row = min(int(math.floor((max(latitude - dlat, -90) + 90) / self.cell_deg)), self.rows - 1)
+        last_row = min(int(math.floor((min(latitude + dlat, 90) + 90) / self.cell_deg)), self.rows - 1)
+
+        # Cells are narrowest on the row furthest from the equator
+        widest_lat = min(abs(latitude) + dlat, 89.9)
+        dlon = radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest_lat)))
+        if dlon >= 180:
+            col_ranges = [(0, self.columns - 1)]
+        else:
+            first_col = int(math.floor((longitude - dlon + 180) / self.cell_deg))
+            last_col = int(math.floor((longitude + dlon + 180) / self.cell_deg))
+            if first_col < 0:
+                col_ranges = [(first_col + self.columns, self.columns - 1), (0, last_col)]
+            elif last_col >= self.columns:
+                col_ranges = [(first_col, self.columns - 1), (0, last_col - self.columns)]
+            else:
+                col_ranges = [(first_col, last_col)]
+
+        lows = []
+        highs = []
+        for row in range(first_row, last_row + 1):
+            for first_col, last_col in col_ranges:
+                lows.append(row * self.columns + first_col)
+                highs.append(row * self.columns + last_col)
+        starts = np.searchsorted(self.keys, lows, side='left')
+        ends = np.searchsorted(self.keys, highs, side='right')
+        slices = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def _filter(self, positions, chain_codes=None, ratings=None, amenities=None):
+        if chain_codes:
+            ids = [self.chain_vocab[code] for code in chain_codes if code in self.chain_vocab]
+            positions = positions[np.isin(self.chain_ids[positions], ids)]
+        if ratings:
+            values = [int(rating) for rating in ratings if str(rating).isdigit()]
+            positions = positions[np.isin(self.ratings[positions], values)]
+        if amenities:
+            if any(code not in self.amenity_vocab for code in amenities):
+                return positions[:0]
+            required = np.zeros(self.amenity_masks.shape[1], dtype=np.uint64)
+            for code in amenities:
+                bit = self.amenity_vocab[code]
+                required[bit // 64] |= np.uint64(1 << (bit % 64))
+            masks = self.amenity_masks[positions]
+            positions = positions[np.all((masks & required) == required, axis=1)]
+        return positions
+
+    def _distances(self, positions, latitude, longitude):
+        """Vectorized haversine distance in km from a point to the given hotels."""
+        phi = math.radians(latitude)
+        lam = math.radians(longitude)
+        dphi = self.lat[positions] - phi
+        dlam = self.lon[positions] - lam
+        a = np.sin(dphi / 2) ** 2 + math.cos(phi) * self.cos_lat[positions] * np.sin(dlam / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def within(self, latitude, longitude, radius_km, limit=None, **filters):
+        """Hotels within `radius_km` of a point as [(hotel_id, distance_km)], closest first."""
+        positions = self._filter(self._candidates(latitude, longitude, radius_km), **filters)
+        distances = self._distances(positions, latitude, longitude)
+        inside = distances <= radius_km
+        positions = positions[inside]
+        distances = distances[inside]
+
+        if limit is not None and limit < len(distances):
+            nearest = np.argpartition(distances, limit)[:limit]
+            positions = positions[nearest]
+            distances = distances[nearest]
+        ranked = np.argsort(distances, kind='stable')
+        return list(zip(self.hotel_ids[self.order[positions[ranked]]].tolist(), distances[ranked].tolist()))
+
+    def nearest(self, latitude, longitude, k, max_radius_km=None, **filters):
+        """
+        The `k` hotels closest to a point as [(hotel_id, distance_km)].
+
+        The search radius starts at one grid cell and doubles until k hotels are
+        found inside it (anything closer is then guaranteed to be included) or
+        `max_radius_km` is reached.
+        """
+        max_radius_km = max_radius_km or settings.HOTEL_SPATIAL_MAX_RADIUS_KM
+        radius = self.cell_deg * KM_PER_DEGREE
+        while True:
+            results = self.within(latitude, longitude, radius, limit=k, **filters)
+            if len(results) >= k or radius >= max_radius_km:
+                return results
+            radius = min(radius * 2, max_radius_km)
+
+
+_index = None
+_index_signature = None
+_index_checked_at = 0
+_rebuild = None
+_index_lock = threading.Lock()
+
+
+def catalog_signature():
+    """Changes whenever catalog hotels are added, removed or refreshed."""
+    summary = CatalogHotel.objects.aggregate(count=Count('id'), refreshed=Max('refreshed_at'))
+    return summary['count'], summary['refreshed']
+
+
+def refresh_spatial_index():
+    """Rebuild the index if the catalog changed since it was built, and return the current one."""
+    global _index, _index_signature
+    signature = catalog_signature()
+    if _index is None or signature != _index_signature:
+        index = HotelSpatialIndex.from_catalog()
+        # Swapped in by one assignment: requests see the old index or the new one
+        _index_signature = signature
+        _index = index
+    return _index
+
+
+def _refresh_in_background():
+    try:
+        refresh_spatial_index()
+    except Exception:
+        logger.exception('Rebuilding the hotel spatial index failed')
+    finally:
+        connection.close()
+
+
+def get_spatial_index():
+    """
+    Return the process-wide index over the catalog, or None until it has
+    first been built. At most every HOTEL_SPATIAL_INDEX_CHECK_INTERVAL seconds
+    a background thread checks the catalog for changes and rebuilds the index;
+    requests keep being served from the current one in the meantime.
+    """
+    global _index_checked_at, _rebuild
+    if time.monotonic() - _index_checked_at < settings.HOTEL_SPATIAL_INDEX_CHECK_INTERVAL:
+        return _index
+
+    with _index_lock:
+        due = time.monotonic() - _index_checked_at >= settings.HOTEL_SPATIAL_INDEX_CHECK_INTERVAL
+        if due and (_rebuild is None or not _rebuild.is_alive()):
+            _index_checked_at = time.monotonic()
+            _rebuild = threading.Thread(target=_refresh_in_background, name='hotel-spatial-index', daemon=True)
+            _rebuild.start()
+    return _index
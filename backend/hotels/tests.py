@@ -1,3 +1,436 @@
-from django.test import TestCase
+import asyncio
+import math
+import random
+import threading
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse, StreamingHttpResponse
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from rest_framework.test import APIClient
+
+from travel_smart.query_plans import QueryPlanTestCase, bulk_seed
+from upstream.aio import get_async_client, with_async_client
+
+from . import spatial
+from . import catalog
+from .booking import save_booking
+from .pipeline import HotelSearchPipeline, chunk_hotel_ids
+from .geo import EARTH_RADIUS_KM, MAX_COVER_CELLS, covering_cells, encode_geohash, haversine_km
+from .models import CatalogHotel, HotelBooking, HotelGuest, HotelSearch
+from .services import AmadeusHotelService
+from .spatial import HotelSpatialIndex
+
+User = get_user_model()
+
+
+class HotelHistoryQueryPlanTests(QueryPlanTestCase):
+    """Saved searches and bookings must be read newest first through the (user, created_at) indexes."""
+    users = 200
+
+    @classmethod
+    def seed(cls):
+        users = User.objects.bulk_create([
+            User(username=f'guest{index}', email=f'guest{index}@example.com') for index in range(cls.users)
+        ])
+        cls.user = users[0]
+        bulk_seed(HotelSearch, (
+            HotelSearch(
+                user=users[index % cls.users], city_code='LIS',
+                check_in_date=date(2025, 5, 1), check_out_date=date(2025, 5, 8)
+            )
+            for index in range(cls.seed_rows)
+        ))
+        bulk_seed(HotelBooking, (
+            HotelBooking(
+                user=users[index % cls.users], booking_id=f'HB{index:08d}', hotel_id='HLLIS001',
+                hotel_name='Hotel Avenida', check_in_date=date(2025, 5, 1), check_out_date=date(2025, 5, 8),
+                number_of_guests=2, room_type='Double', total_price=Decimal('800.00'), status='confirmed'
+            )
+            for index in range(cls.seed_rows)
+        ))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_saved_searches(self):
+        response = self.assertIndexedQueries(lambda: self.client.get('/hotels/saved-searches/'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_bookings(self):
+        response = self.assertIndexedQueries(lambda: self.client.get('/hotels/bookings/'))
+        self.assertEqual(response.status_code, 200)
+
+
+class SaveBookingTests(TestCase):
+    """A booking and its guests are written in one transaction, once per provider confirmation."""
+    booking_data = {'id': 'AMA1', 'providerConfirmationId': 'PC-1', 'policies': {'text': 'x' * 4000}}
+    formatted = {
+        'providerConfirmationId': 'PC-1', 'hotel': 'Hotel Avenida', 'status': 'confirmed',
+        'check_in': '2025-05-01', 'check_out': '2025-05-08', 'price': {'total': '800.00', 'currency': 'EUR'},
+    }
+    guests = [
+        {'name': {'firstName': 'Ana', 'lastName': 'Silva'}, 'contact': {'email': 'ana@example.com'}},
+        {'name': {'firstName': 'Rui', 'lastName': 'Silva'}, 'contact': {'email': 'rui@example.com'}},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='guest', email='guest@example.com')
+
+    def test_saves_guests_in_one_insert(self):
+        # Duplicate check, then booking and guests inside one transaction
+        with self.assertNumQueries(5):
+            booking = save_booking('OFFER1', self.guests, self.booking_data, self.formatted, self.user.id)
+        self.assertEqual(
+            list(booking.guests.order_by('id').values_list('first_name', 'is_lead_guest')),
+            [('Ana', True), ('Rui', False)]
+        )
+        self.assertEqual(HotelBooking.objects.get(pk=booking.pk).booking_data, self.booking_data)
+
+    def test_retry_returns_the_saved_booking(self):
+        first = save_booking('OFFER1', self.guests, self.booking_data, self.formatted, self.user.id)
+        again = save_booking('OFFER1', self.guests, self.booking_data, self.formatted, self.user.id)
+        self.assertEqual(first.pk, again.pk)
+        self.assertEqual(HotelGuest.objects.count(), 2)
+
+    def test_list_leaves_out_booking_data(self):
+        booking = save_booking('OFFER1', self.guests, self.booking_data, self.formatted, self.user.id)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        listed = client.get('/hotels/bookings/').json()
+        self.assertNotIn('booking_data', listed[0])
+        self.assertEqual(len(listed[0]['guests']), 2)
+
+        detail = client.get(f'/hotels/bookings/{booking.booking_id}/').json()
+        self.assertEqual(detail['booking_data'], self.booking_data)
+
+
+class AsyncClientScopeTests(SimpleTestCase):
+    """Outside ASGI each async view gets its own Amadeus client, closed once the response is done."""
+
+    def setUp(self):
+        self.clients = []
+
+        @with_async_client
+        async def view(request):
+            self.clients.append(get_async_client())
+            return JsonResponse({})
+
+        @with_async_client
+        async def stream(request):
+            self.clients.append(get_async_client())
+
+            async def lines():
+                self.clients.append(get_async_client())
+                yield 'line\n'
+            return StreamingHttpResponse(lines())
+
+        self.view, self.stream = view, stream
+
+    def test_wsgi_request_client_is_closed(self):
+        async_to_sync(self.view)(RequestFactory().get('/'))
+        async_to_sync(self.view)(RequestFactory().get('/'))
+        first, second = self.clients
+        self.assertIsNot(first, second)
+        self.assertTrue(first.http.is_closed)
+        self.assertTrue(second.http.is_closed)
+
+    def test_wsgi_stream_gets_its_own_client(self):
+        response = async_to_sync(self.stream)(RequestFactory().get('/'))
+
+        async def consume():
+            return [part async for part in response.streaming_content]
+        self.assertEqual(async_to_sync(consume)(), [b'line\n'])
+
+        in_view, in_stream = self.clients
+        self.assertIsNot(in_view, in_stream)
+        self.assertTrue(in_stream.http.is_closed)
+
+    async def test_asgi_requests_share_the_loop_client(self):
+        await self.view(AsyncRequestFactory().get('/'))
+        await self.view(AsyncRequestFactory().get('/'))
+        first, second = self.clients
+        self.assertIs(first, second)
+        self.assertFalse(first.http.is_closed)
+        await first.http.aclose()
+
+
+class HotelSpatialIndexTests(SimpleTestCase):
+    """The grid index must return what a brute-force distance scan returns."""
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.points = [(f'H{i}', rng.uniform(-89, 89), rng.uniform(-180, 180)) for i in range(2000)]
+        # Clusters around a city, the poles and the antimeridian
+        self.points += [(f'C{i}', 48.85 + rng.uniform(-0.3, 0.3), 2.35 + rng.uniform(-0.3, 0.3)) for i in range(300)]
+        self.points += [('NORTH', 90.0, 0.0), ('SOUTH', -90.0, 45.0), ('EAST', 10.0, 179.99), ('WEST', 10.0, -179.99)]
+        self.index = self.build(self.points)
+
+    def build(self, points, **columns):
+        ids, latitudes, longitudes = zip(*points)
+        return HotelSpatialIndex(ids, latitudes, longitudes, cell_deg=0.5, **columns)
+
+    def brute_force(self, latitude, longitude, radius_km):
+        distances = [(hotel_id, haversine_km(latitude, longitude, lat, lon)) for hotel_id, lat, lon in self.points]
+        return sorted((pair for pair in distances if pair[1] <= radius_km), key=lambda pair: pair[1])
+
+    def assertSameHotels(self, found, expected):
+        self.assertEqual([hotel_id for hotel_id, _ in found], [hotel_id for hotel_id, _ in expected])
+        for (_, distance), (_, exact) in zip(found, expected):
+            self.assertAlmostEqual(distance, exact, places=6)
+
+    def test_within_matches_brute_force(self):
+        for latitude, longitude, radius in [(48.85, 2.35, 20), (0, 0, 1500), (-45, 120, 800), (70, -30, 3000)]:
+            self.assertSameHotels(
+                self.index.within(latitude, longitude, radius), self.brute_force(latitude, longitude, radius)
+            )
+
+    def test_nearest_matches_brute_force(self):
+        expected = self.brute_force(48.9, 2.4, 20_000)[:10]
+        self.assertSameHotels(self.index.nearest(48.9, 2.4, 10, max_radius_km=20_000), expected)
+
+    def test_poles_and_antimeridian(self):
+        self.assertLess(self.index.keys.max(), self.index.rows * self.index.columns)
+        self.assertIn('NORTH', [hotel_id for hotel_id, _ in self.index.within(89.9, 100, 50)])
+        self.assertIn('SOUTH', [hotel_id for hotel_id, _ in self.index.within(-89.9, -100, 50)])
+        across = [hotel_id for hotel_id, _ in self.index.within(10.0, -179.999, 10)]
+        self.assertEqual(sorted(across), ['EAST', 'WEST'])
+
+    def test_filters(self):
+        points = [('A', 0, 0), ('B', 0, 0.01), ('C', 0, 0.02), ('D', 0, 0.03)]
+        index = self.build(
+            points, chain_codes=['HI', 'MC', 'HI', None], ratings=['5', '4', '3', None],
+            amenities=[['WIFI', 'POOL'], ['WIFI'], [], ['POOL']]
+        )
+        ids = lambda **filters: [hotel_id for hotel_id, _ in index.within(0, 0, 10, **filters)]
+        self.assertEqual(ids(chain_codes=['HI']), ['A', 'C'])
+        self.assertEqual(ids(ratings=['4', '5']), ['A', 'B'])
+        self.assertEqual(ids(amenities=['WIFI', 'POOL']), ['A'])
+        self.assertEqual(ids(amenities=['SPA']), [])
+        self.assertEqual(ids(chain_codes=['XX']), [])
+
+    def test_empty_index(self):
+        index = HotelSpatialIndex([], [], [], cell_deg=0.5)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.nearest(0, 0, 3, max_radius_km=100), [])
+
+
+@override_settings(HOTEL_SPATIAL_INDEX_CHECK_INTERVAL=0)
+class SpatialIndexRefreshTests(TransactionTestCase):
+    """Requests are served from the current index while a background thread rebuilds it."""
+
+    def setUp(self):
+        spatial._index, spatial._index_signature, spatial._index_checked_at = None, None, 0
+        self.addCleanup(setattr, spatial, '_index', None)
+        self.addCleanup(lambda: spatial._rebuild and spatial._rebuild.join(timeout=10))
+
+    def add_hotel(self, hotel_id, latitude, longitude):
+        CatalogHotel.objects.create(
+            hotel_id=hotel_id, name=hotel_id, iata_code='PAR', latitude=latitude, longitude=longitude,
+            geohash=encode_geohash(latitude, longitude)
+        )
+
+    def wait_for_rebuild(self):
+        spatial._rebuild.join(timeout=10)
+        self.assertFalse(spatial._rebuild.is_alive())
+
+    def test_old_index_is_served_during_rebuild(self):
+        self.add_hotel('PAR1', 48.85, 2.35)
+        # The first build also runs in the background; until then hotels_near queries the database
+        spatial.get_spatial_index()
+        self.wait_for_rebuild()
+        first = spatial.get_spatial_index()
+        self.wait_for_rebuild()
+        self.assertEqual(len(first), 1)
+
+        self.add_hotel('PAR2', 48.86, 2.36)
+        release = threading.Event()
+        build = HotelSpatialIndex.from_catalog
+
+        def slow_build(*args, **kwargs):
+            release.wait(10)
+            return build(*args, **kwargs)
+
+        with mock.patch.object(HotelSpatialIndex, 'from_catalog', side_effect=slow_build) as rebuild:
+            self.assertIs(spatial.get_spatial_index(), first)
+            # A check already running is not started again
+            self.assertIs(spatial.get_spatial_index(), first)
+            release.set()
+            self.wait_for_rebuild()
+        self.assertEqual(rebuild.call_count, 1)
+        self.assertEqual(len(spatial.get_spatial_index()), 2)
+
+    def test_unchanged_catalog_keeps_the_index(self):
+        self.add_hotel('PAR1', 48.85, 2.35)
+        index = spatial.refresh_spatial_index()
+        self.assertIs(spatial.refresh_spatial_index(), index)
+
+
+class FakeHotelService:
+    """Hotel List and Hotel Search answers from memory, recording how many offer batches run at once."""
+    format_hotel_list = AmadeusHotelService.format_hotel_list
+    format_hotel_offers = AmadeusHotelService.format_hotel_offers
+
+    def __init__(self, city_hotels=(), unavailable=()):
+        self.city_hotels = list(city_hotels)
+        self.unavailable = set(unavailable)
+        self.list_calls = []
+        self.batches = []
+        self.running = 0
+        self.peak = 0
+
+    async def aget_hotels_by_city(self, city_code, **filters):
+        self.list_calls.append(city_code)
+        return {'data': [{'hotelId': hotel_id, 'name': hotel_id} for hotel_id in self.city_hotels]}
+
+    async def asearch_hotel_offers(self, hotel_ids, **search):
+        self.batches.append(hotel_ids)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            if self.unavailable.intersection(hotel_ids):
+                raise Exception('No rooms available')
+            return {'data': [{'hotel': {'hotelId': hotel_id}, 'offers': [{'id': f'O-{hotel_id}'}]}
+                             for hotel_id in hotel_ids]}
+        finally:
+            self.running -= 1
+
+
+class HotelPipelineTests(TestCase):
+    """Hotel IDs come from the catalog when it has the city, and offers are fetched in bounded batches."""
+
+    def pipeline(self, service, **kwargs):
+        pipeline = HotelSearchPipeline(service=service, **kwargs)
+        pipeline.rate_limiter = mock.Mock(aacquire=mock.AsyncMock())
+        return pipeline
+
+    def collect(self, pipeline, hotel_ids):
+        async def run():
+            return [batch async for batch in pipeline.stream(hotel_ids, check_in_date='2030-05-01')]
+        return async_to_sync(run)()
+
+    def test_hotel_ids_are_split_into_batches(self):
+        self.assertEqual(list(chunk_hotel_ids(['A', 'B', 'C', 'D', 'E'], 2)), [['A', 'B'], ['C', 'D'], ['E']])
+
+    def test_catalog_city_skips_the_hotel_list_call(self):
+        CatalogHotel.objects.bulk_create([
+            CatalogHotel(hotel_id=f'HLLIS{index:03d}', name=f'Hotel {index:03d}', iata_code='LIS',
+                         latitude=38.7, longitude=-9.1, geohash=encode_geohash(38.7, -9.1))
+            for index in range(5)
+        ])
+        service = FakeHotelService(city_hotels=['UPSTREAM'])
+        pipeline = self.pipeline(service, max_hotels=3)
+        hotel_ids = async_to_sync(pipeline.list_hotel_ids)(city_code='lis')
+        self.assertEqual(hotel_ids, ['HLLIS000', 'HLLIS001', 'HLLIS002'])
+        self.assertEqual(service.list_calls, [])
+        pipeline.rate_limiter.aacquire.assert_not_awaited()
+
+    def test_unknown_city_asks_the_hotel_list_api(self):
+        service = FakeHotelService(city_hotels=['HLPAR001', None, 'HLPAR002'])
+        pipeline = self.pipeline(service)
+        hotel_ids = async_to_sync(pipeline.list_hotel_ids)(city_code='PAR')
+        self.assertEqual(hotel_ids, ['HLPAR001', 'HLPAR002'])
+        self.assertEqual(service.list_calls, ['PAR'])
+        self.assertEqual(pipeline.rate_limiter.aacquire.await_count, 1)
+
+    def test_offer_batches_run_concurrently_and_fail_alone(self):
+        hotel_ids = [f'H{index}' for index in range(10)]
+        service = FakeHotelService(unavailable={'H4'})
+        pipeline = self.pipeline(service, batch_size=3, concurrency=2)
+        batches = self.collect(pipeline, hotel_ids)
+
+        self.assertEqual(sorted(map(tuple, service.batches)),
+                         [('H0', 'H1', 'H2'), ('H3', 'H4', 'H5'), ('H6', 'H7', 'H8'), ('H9',)])
+        self.assertEqual(service.peak, 2)
+        failed = [batch['hotel_ids'] for batch in batches if 'error' in batch]
+        self.assertEqual(failed, [['H3', 'H4', 'H5']])
+        offered = sorted(hotel['hotel_id'] for batch in batches for hotel in batch['offers'])
+        self.assertEqual(offered, ['H0', 'H1', 'H2', 'H6', 'H7', 'H8', 'H9'])
+        self.assertEqual(pipeline.rate_limiter.aacquire.await_count, 4)
+
+
+def destination(latitude, longitude, distance_km, bearing):
+    """The point `distance_km` away from another along a bearing in radians."""
+    angle = distance_km / EARTH_RADIUS_KM
+    phi1, lambda1 = math.radians(latitude), math.radians(longitude)
+    phi2 = math.asin(math.sin(phi1) * math.cos(angle) + math.cos(phi1) * math.sin(angle) * math.cos(bearing))
+    lambda2 = lambda1 + math.atan2(math.sin(bearing) * math.sin(angle) * math.cos(phi1),
+                                   math.cos(angle) - math.sin(phi1) * math.sin(phi2))
+    return math.degrees(phi2), (math.degrees(lambda2) + 180) % 360 - 180
+
+
+class GeohashCoverTests(SimpleTestCase):
+    """The cells of a radius lookup must hold every point within the radius, poles and antimeridian included."""
+
+    def test_known_geohashes(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(encode_geohash(-90, -180, 3), '000')
+        self.assertEqual(encode_geohash(89.999, 179.999, 3), 'zzz')
+
+    def test_cover_holds_every_point_in_the_radius(self):
+        rng = random.Random(11)
+        for _ in range(3000):
+            latitude = rng.choice([rng.uniform(-90, 90), rng.uniform(85, 90), rng.uniform(-90, -85)])
+            longitude = rng.choice([rng.uniform(-180, 180), rng.uniform(179, 180)])
+            radius = rng.choice([1, 5, 50, 500])
+            cells = covering_cells(latitude, longitude, radius)
+            self.assertLessEqual(len(cells), MAX_COVER_CELLS)
+            point = destination(latitude, longitude, rng.uniform(0, radius) * 0.9999, rng.uniform(0, 2 * math.pi))
+            self.assertTrue(encode_geohash(*point).startswith(tuple(cells)), (latitude, longitude, radius, point))
+
+    def test_cover_near_the_pole_spans_all_longitudes(self):
+        cells = covering_cells(89.99, 0, 5)
+        for longitude in (-179, -90, 0, 90, 179):
+            self.assertTrue(encode_geohash(89.995, longitude).startswith(tuple(cells)))
+
+
+@override_settings(HOTEL_CATALOG_ENABLED=True, HOTEL_SPATIAL_INDEX_ENABLED=False)
+class CatalogRadiusTests(TestCase):
+    """Geocode lookups answered by the geohash query return what a distance scan returns."""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(5)
+        points = [(48.85 + rng.uniform(-0.2, 0.2), 2.35 + rng.uniform(-0.3, 0.3)) for _ in range(300)]
+        points += [(10.0, 179.99), (10.0, -179.99), (89.99, 0.0), (89.99, 180.0)]
+        CatalogHotel.objects.bulk_create([
+            CatalogHotel(hotel_id=f'H{index:04d}', name=f'Hotel {index}', iata_code='PAR' if index < 300 else 'XXX',
+                         chain_code='HI' if index % 2 else 'MC', latitude=latitude, longitude=longitude,
+                         geohash=encode_geohash(latitude, longitude))
+            for index, (latitude, longitude) in enumerate(points)
+        ])
+        cls.points = {f'H{index:04d}': point for index, point in enumerate(points)}
+
+    def brute_force(self, latitude, longitude, radius):
+        distances = sorted((haversine_km(latitude, longitude, *point), hotel_id)
+                           for hotel_id, point in self.points.items())
+        return [hotel_id for distance, hotel_id in distances if distance <= radius]
+
+    def test_radius_matches_brute_force(self):
+        for latitude, longitude, radius in [(48.85, 2.35, 5), (48.9, 2.2, 12), (10.0, 180.0, 5), (90.0, 0.0, 5)]:
+            with self.subTest(latitude=latitude, longitude=longitude):
+                found = catalog.hotels_near(latitude, longitude, radius)
+                self.assertEqual([hotel['hotel_id'] for hotel in found], self.brute_force(latitude, longitude, radius))
+
+    def test_nearest_and_filters(self):
+        found = catalog.hotels_near(48.85, 2.35, 10, chain_codes='hi', nearest=5)
+        self.assertEqual(len(found), 5)
+        self.assertEqual({hotel['chain_code'] for hotel in found}, {'HI'})
+        distances = [hotel['distance']['value'] for hotel in found]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_catalog_defers_what_it_cannot_answer(self):
+        self.assertIsNone(catalog.find_hotels(city_code='LIS'))
+        self.assertIsNone(catalog.find_hotels(city_code='PAR', radius=5))
+        self.assertEqual(len(catalog.find_hotels(city_code='par')), 300)
+        with self.settings(HOTEL_CATALOG_ENABLED=False):
+            self.assertIsNone(catalog.find_hotels(latitude=48.85, longitude=2.35))
@@ -11,10 +11,19 @@ urlpatterns = [
     path('offers/', views.search_hotel_offers, name='search_hotel_offers'),
     path('offers/<str:offer_id>/', views.get_offer_details, name='get_offer_details'),
     
+    # Async (ASGI) variants of the list and search endpoints
+    path('async/list/', views.list_hotels_async, name='list_hotels_async'),
+    path('async/offers/', views.search_hotel_offers_async, name='search_hotel_offers_async'),
+    path('async/offers/<str:offer_id>/', views.get_offer_details_async, name='get_offer_details_async'),
+    
+    # Combined hotel list -> offers search, streamed batch by batch
+    path('async/search/', views.search_hotels_async, name='search_hotels_async'),
+    
     # Step 3: Hotel Booking API endpoint
     path('book/', views.book_hotel, name='book_hotel'),
     
     # Additional endpoints for saved searches and bookings
     path('saved-searches/', views.saved_searches, name='saved_searches'),
     path('bookings/', views.user_bookings, name='user_bookings'),
+    path('bookings/<str:booking_id>/', views.booking_detail, name='booking_detail'),
 ]
\ No newline at end of file
@@ -3,14 +3,28 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import HotelSearch, HotelBooking
-from .serializers import HotelSearchSerializer, HotelBookingSerializer
+from .serializers import HotelSearchSerializer, HotelBookingSerializer, HotelBookingListSerializer
 from .services import AmadeusHotelService
+from .pipeline import HotelSearchPipeline
+from .booking import book_offer
+from . import catalog
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError
-import uuid
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from travel_smart.pagination import page_headers, paginate
+from travel_smart.response_cache import HOTEL_BOOKINGS, cache_per_user
+from jobs.queue import enqueue
+from jobs.views import accepted, wants_async
+from upstream.aio import with_async_client
+import json
+import logging
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 @api_view(['GET'])
 def list_hotels(request):
     """Get a list of hotels based on city code or geocode."""
@@ -21,14 +35,25 @@ def list_hotels(request):
     chain_codes = request.query_params.get('chain_codes')
     amenities = request.query_params.get('amenities')
     ratings = request.query_params.get('ratings')
+    nearest = request.query_params.get('nearest')
     
     if not (city_code or (latitude and longitude)):
         return Response(
             {'error': 'Either city_code or latitude and longitude are required'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
+    if nearest is not None:
+        if not nearest.isdigit() or int(nearest) < 1:
+            return Response({'error': 'nearest must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        nearest = int(nearest)
     
     try:
+        local_hotels = catalog.find_hotels(
+            city_code, latitude, longitude, radius, chain_codes, amenities, ratings, nearest
+        )
+        if local_hotels is not None:
+            return Response({'hotels': local_hotels})
+
         hotel_service = AmadeusHotelService()
         
         if city_code:
@@ -52,7 +77,8 @@ def list_hotels(request):
             )
         
         formatted_hotels = hotel_service.format_hotel_list(hotels_data)
-        return Response({'hotels': formatted_hotels})
+        # Amadeus returns geocode results closest first
+        return Response({'hotels': formatted_hotels[:nearest]})
     
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -114,6 +140,154 @@ def get_offer_details(request, offer_id):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@require_GET
+@with_async_client
+async def list_hotels_async(request):
+    """Async (ASGI) variant of list_hotels."""
+    city_code = request.GET.get('city_code')
+    latitude = request.GET.get('latitude')
+    longitude = request.GET.get('longitude')
+    filters = {
+        'radius': request.GET.get('radius'),
+        'chain_codes': request.GET.get('chain_codes'),
+        'amenities': request.GET.get('amenities'),
+        'ratings': request.GET.get('ratings'),
+    }
+    nearest = request.GET.get('nearest')
+
+    if not (city_code or (latitude and longitude)):
+        return JsonResponse({'error': 'Either city_code or latitude and longitude are required'}, status=400)
+    if nearest is not None:
+        if not nearest.isdigit() or int(nearest) < 1:
+            return JsonResponse({'error': 'nearest must be a positive integer'}, status=400)
+        nearest = int(nearest)
+
+    try:
+        local_hotels = await sync_to_async(catalog.find_hotels)(
+            city_code, latitude, longitude, nearest=nearest, **filters
+        )
+        if local_hotels is not None:
+            return JsonResponse({'hotels': local_hotels})
+
+        hotel_service = AmadeusHotelService()
+        if city_code:
+            hotels_data = await hotel_service.aget_hotels_by_city(city_code=city_code, **filters)
+        else:
+            hotels_data = await hotel_service.aget_hotels_by_geocode(
+                latitude=latitude, longitude=longitude, **filters
+            )
+        return JsonResponse({'hotels': hotel_service.format_hotel_list(hotels_data)[:nearest]})
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_GET
+@with_async_client
+async def search_hotel_offers_async(request):
+    """Async (ASGI) variant of search_hotel_offers."""
+    hotel_ids = request.GET.get('hotel_ids')
+    city_code = request.GET.get('city_code')
+    check_in_date = request.GET.get('check_in_date')
+    check_out_date = request.GET.get('check_out_date')
+
+    if not (hotel_ids or city_code):
+        return JsonResponse({'error': 'Either hotel_ids or city_code is required'}, status=400)
+
+    if not (check_in_date and check_out_date):
+        return JsonResponse({'error': 'Check-in and check-out dates are required'}, status=400)
+
+    try:
+        hotel_service = AmadeusHotelService()
+        offers_data = await hotel_service.asearch_hotel_offers(
+            hotel_ids=hotel_ids.split(',') if hotel_ids else None,
+            city_code=city_code,
+            check_in_date=check_in_date,
+            check_out_date=check_out_date,
+            adults=request.GET.get('adults', 1),
+            rooms=request.GET.get('rooms', 1),
+            price_range=request.GET.get('price_range')
+        )
+        return JsonResponse({'offers': hotel_service.format_hotel_offers(offers_data)})
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_GET
+@with_async_client
+async def get_offer_details_async(request, offer_id):
+    """Async (ASGI) variant of get_offer_details."""
+    try:
+        offer_data = await AmadeusHotelService().aget_hotel_offer_details(offer_id)
+        return JsonResponse({'offer': offer_data})
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_GET
+@with_async_client
+async def search_hotels_async(request):
+    """
+    Combined city/geocode -> offers search. Hotel IDs from the Hotel List API are
+    searched in concurrent batches; by default each batch is streamed as an
+    NDJSON line as soon as it completes, followed by a summary line.
+    """
+    city_code = request.GET.get('city_code')
+    latitude = request.GET.get('latitude')
+    longitude = request.GET.get('longitude')
+    check_in_date = request.GET.get('check_in_date')
+    check_out_date = request.GET.get('check_out_date')
+
+    if not (city_code or (latitude and longitude)):
+        return JsonResponse({'error': 'Either city_code or latitude and longitude are required'}, status=400)
+
+    if not (check_in_date and check_out_date):
+        return JsonResponse({'error': 'Check-in and check-out dates are required'}, status=400)
+
+    search = {
+        'check_in_date': check_in_date,
+        'check_out_date': check_out_date,
+        'adults': request.GET.get('adults', 1),
+        'rooms': request.GET.get('rooms', 1),
+        'price_range': request.GET.get('price_range'),
+    }
+    pipeline = HotelSearchPipeline()
+
+    try:
+        hotel_ids = await pipeline.list_hotel_ids(
+            city_code=city_code,
+            latitude=latitude,
+            longitude=longitude,
+            radius=request.GET.get('radius'),
+            chain_codes=request.GET.get('chain_codes'),
+            amenities=request.GET.get('amenities'),
+            ratings=request.GET.get('ratings')
+        )
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    if request.GET.get('stream', 'true').lower() == 'false':
+        offers_by_hotel = {}
+        errors = []
+        async for batch in pipeline.stream(hotel_ids, **search):
+            if 'error' in batch:
+                errors.append({'hotel_ids': batch['hotel_ids'], 'error': batch['error']})
+            for hotel in batch['offers']:
+                offers_by_hotel[hotel['hotel_id']] = hotel
+        # Keep the order of the hotel list
+        offers = [offers_by_hotel[hotel_id] for hotel_id in hotel_ids if hotel_id in offers_by_hotel]
+        return JsonResponse({'hotels': len(hotel_ids), 'offers': offers, 'errors': errors})
+
+    async def lines():
+        yield json.dumps({'type': 'hotels', 'count': len(hotel_ids)}) + '\n'
+        with_offers = failed = 0
+        async for batch in pipeline.stream(hotel_ids, **search):
+            with_offers += len(batch['offers'])
+            failed += 'error' in batch
+            yield json.dumps({'type': 'offers', **batch}) + '\n'
+        yield json.dumps({'type': 'complete', 'hotels_with_offers': with_offers, 'failed_batches': failed}) + '\n'
+
+    return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
 @api_view(['POST'])
 def book_hotel(request):
     data = request.data.get('data', {})
@@ -126,44 +300,22 @@ def book_hotel(request):
         return Response({'error': 'Offer ID, guest info, payment, and room info are required'}, 
                         status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        hotel_service = AmadeusHotelService()
-        booking_data = hotel_service.book_hotel(offer_id, guests, payments, rooms)
-        formatted = hotel_service.format_booking_confirmation(booking_data)
-
-        # Create booking record
-        booking = HotelBooking.objects.create(
-            booking_id=str(uuid.uuid4()),
-            provider_confirmation_id=formatted.get('providerConfirmationId', ''),
-            hotel_id=offer_id,
-            hotel_name=formatted.get('hotel', ''),
-            check_in_date=formatted.get('check_in'),
-            check_out_date=formatted.get('check_out'),
-            number_of_guests=len(guests),
-            room_type=formatted.get('room_type', 'Standard'),
-            total_price=formatted.get('price', {}).get('total', 0),
-            currency=formatted.get('price', {}).get('currency', 'USD'),
-            status=formatted.get('status', 'confirmed'),
-            booking_data=booking_data,
-            user_id=request.user.id if request.user.is_authenticated else None
+    user_id = request.user.id if request.user.is_authenticated else None
+    if wants_async(request):
+        # The booking runs in a worker; the client polls the job for the confirmation
+        job = enqueue(
+            'hotels.book', {'offerId': offer_id, 'guests': guests, 'payments': payments, 'rooms': rooms},
+            user=request.user if user_id else None, idempotency_key=request.headers.get('Idempotency-Key')
         )
+        body, headers = accepted(request, job)
+        return Response(body, status=status.HTTP_202_ACCEPTED, headers=headers)
 
-        # Create guest records
-        for guest in guests:
-            HotelGuest.objects.create(
-                booking=booking,
-                title=guest.get('name', {}).get('title', ''),
-                first_name=guest.get('name', {}).get('firstName', ''),
-                last_name=guest.get('name', {}).get('lastName', ''),
-                email=guest.get('contact', {}).get('email', ''),
-                phone=guest.get('contact', {}).get('phone', ''),
-                is_lead_guest=(guest == guests[0])
-            )
-
+    try:
+        booking, formatted = book_offer(offer_id, guests, payments, rooms, user_id)
         return Response({'booking': formatted})
 
     except Exception as e:
-        print(f"Error during booking: {str(e)}")
+        logger.exception('Hotel booking failed')
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
 @api_view(['GET', 'POST'])
@@ -171,9 +323,12 @@ def book_hotel(request):
 def saved_searches(request):
     """Get or save hotel searches for the authenticated user."""
     if request.method == 'GET':
-        searches = HotelSearch.objects.filter(user=request.user).order_by('-created_at')
-        serializer = HotelSearchSerializer(searches, many=True)
-        return Response(serializer.data)
+        try:
+            page = paginate(request, HotelSearch.objects.filter(user=request.user), ('-created_at', '-id'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = HotelSearchSerializer(page.items, many=True)
+        return Response(serializer.data, headers=page_headers(request, page))
     
     elif request.method == 'POST':
         serializer = HotelSearchSerializer(data=request.data, context={'request': request})
@@ -184,8 +339,22 @@ def saved_searches(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_per_user(HOTEL_BOOKINGS)
 def user_bookings(request):
     """Get all bookings for the authenticated user."""
-    bookings = HotelBooking.objects.filter(user=request.user).order_by('-created_at')
-    serializer = HotelBookingSerializer(bookings, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    try:
+        page = paginate(request, HotelBooking.objects.filter(user=request.user).for_list(), ('-created_at', '-id'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = HotelBookingListSerializer(page.items, many=True)
+    return Response(serializer.data, headers=page_headers(request, page))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cache_per_user(HOTEL_BOOKINGS)
+def booking_detail(request, booking_id):
+    """One booking of the authenticated user, with guests and the full provider response."""
+    booking = HotelBooking.objects.filter(user=request.user, booking_id=booking_id).prefetch_related('guests').first()
+    if booking is None:
+        return Response({'error': 'Booking not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(HotelBookingSerializer(booking).data)
\ No newline at end of file
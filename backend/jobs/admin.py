@@ -0,0 +1,20 @@
+import json
+
+from django.contrib import admin
+
+from upstream.log import redact
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'user', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    # Queued payloads may hold payment cards and traveller documents
+    exclude = ('payload',)
+    readonly_fields = ('created_at', 'finished_at', 'locked_at', 'locked_by', 'redacted_payload')
+
+    @admin.display(description='Payload')
+    def redacted_payload(self, job):
+        return json.dumps(redact(job.payload), indent=2)
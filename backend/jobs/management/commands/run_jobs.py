@@ -0,0 +1,71 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.queue import requeue_stale, run_next, worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background job workers (bookings and other queued work). Each process "
+        "claims one due job at a time; jobs of workers that died are requeued after JOB_LEASE_SECONDS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes to start')
+        parser.add_argument('--kind', nargs='+', dest='kinds', help='Only run jobs of these kinds')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds to wait when no job is due (defaults to JOB_POLL_INTERVAL)')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due')
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            self.work(options)
+            return
+
+        # Children must open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=self.work, args=(options,)) for _ in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+
+    def work(self, options):
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        name = worker_name()
+        poll_interval = options['poll_interval'] or settings.JOB_POLL_INTERVAL
+        ran = 0
+        last_sweep = 0
+
+        self.stdout.write(f'Worker {name} started.')
+        while not stopping:
+            close_old_connections()
+            if time.monotonic() - last_sweep >= settings.JOB_LEASE_SECONDS / 2:
+                requeue_stale()
+                last_sweep = time.monotonic()
+
+            job = run_next(name, options['kinds'])
+            if job is not None:
+                ran += 1
+                self.stdout.write(f'{job.kind} {job.id}: {job.status} (attempt {job.attempts})')
+                continue
+            if options['once']:
+                break
+            time.sleep(poll_interval)
+        self.stdout.write(f'Worker {name} stopped after {ran} jobs.')
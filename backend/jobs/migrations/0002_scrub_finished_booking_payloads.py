@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:10
+
+from django.db import migrations
+
+# Payload keys the booking handlers register as sensitive, as of this migration
+SENSITIVE_KEYS = {
+    'hotels.book': ('payments', 'guests'),
+    'flights.book': ('traveler',),
+}
+
+
+def scrub_finished_payloads(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    for kind, keys in SENSITIVE_KEYS.items():
+        jobs = Job.objects.filter(kind=kind, status__in=('succeeded', 'failed')).only('id', 'payload')
+        for job in jobs.iterator(chunk_size=500):
+            job.payload = {key: value for key, value in job.payload.items() if key not in keys}
+            job.save(update_fields=['payload'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(scrub_finished_payloads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,162 @@
+"""
+Database-backed job queue.
+
+Views enqueue a Job row and return straight away; `manage.py run_jobs`
+worker processes claim due jobs one at a time (SELECT ... FOR UPDATE SKIP
+LOCKED where the database supports it, guarded by a conditional UPDATE
+everywhere), run the handler registered for the job's kind and record the
+result. Handlers raise RetryableJobError for transient upstream failures,
+which puts the job back with exponential backoff until max_attempts.
+Payload keys a handler registers as sensitive (payment cards, traveller
+documents) are removed from the row as soon as the job is finished.
+"""
+import logging
+import os
+import random
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+SENSITIVE_KEYS = {}
+
+
+class JobError(Exception):
+    """A job failed for good; `details` is stored as the job result."""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details
+
+
+class RetryableJobError(JobError):
+    """A transient failure (upstream 5xx, network): run the job again later."""
+
+
+def register(kind, sensitive=()):
+    """
+    Register the decorated function as the handler for jobs of `kind`; it gets
+    the Job and returns a JSON-able result. `sensitive` payload keys are
+    dropped once the job succeeds or fails for good.
+    """
+    def decorator(handler):
+        HANDLERS[kind] = handler
+        SENSITIVE_KEYS[kind] = frozenset(sensitive)
+        return handler
+    return decorator
+
+
+def scrub(job):
+    """Drop the sensitive keys of a finished job's payload."""
+    sensitive = SENSITIVE_KEYS.get(job.kind, ())
+    job.payload = {key: value for key, value in job.payload.items() if key not in sensitive}
+
+
+def enqueue(kind, payload, user=None, idempotency_key=None, max_attempts=None):
+    """
+    Queue a job and return it. With an idempotency key, a repeat of the same
+    request returns the job created the first time instead of a new one.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f'No handler registered for {kind}')
+    key = None
+    if idempotency_key:
+        key = f'{kind}:{user.id if user else "-"}:{idempotency_key}'
+        existing = Job.objects.filter(idempotency_key=key).first()
+        if existing is not None:
+            return existing
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                kind=kind, payload=payload, user=user, idempotency_key=key,
+                max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS
+            )
+    except IntegrityError:
+        # The same key was enqueued concurrently
+        return Job.objects.get(idempotency_key=key)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def backoff(attempts):
+    """Seconds to wait before the next attempt: jittered exponential backoff."""
+    delay = min(settings.JOB_BACKOFF_CAP, settings.JOB_BACKOFF_BASE * (2 ** (attempts - 1)))
+    return random.uniform(delay / 2, delay)
+
+
+def requeue_stale(lease=None):
+    """Put back jobs whose worker died mid-run (running for longer than the lease)."""
+    lease = settings.JOB_LEASE_SECONDS if lease is None else lease
+    cutoff = timezone.now() - timedelta(seconds=lease)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.QUEUED, locked_by='', locked_at=None
+    )
+
+
+def claim(worker, kinds=None):
+    """Take the oldest due job for this worker, or return None."""
+    with transaction.atomic():
+        due = Job.objects.filter(status=Job.QUEUED, run_after__lte=timezone.now())
+        if kinds:
+            due = due.filter(kind__in=kinds)
+        job = due.order_by('run_after', 'id').select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+        now = timezone.now()
+        # Only one worker wins even where FOR UPDATE is not supported (SQLite)
+        claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=job.attempts + 1
+        )
+        if not claimed:
+            return None
+    job.status, job.locked_by, job.locked_at, job.attempts = Job.RUNNING, worker, now, job.attempts + 1
+    return job
+
+
+def run(job):
+    """Run a claimed job's handler and record the outcome."""
+    handler = HANDLERS.get(job.kind)
+    fields = ['status', 'result', 'error', 'locked_by', 'locked_at', 'finished_at', 'run_after']
+    job.locked_by, job.locked_at = '', None
+    try:
+        if handler is None:
+            raise JobError(f'No handler registered for {job.kind}')
+        job.result = handler(job)
+        job.status, job.error, job.finished_at = Job.SUCCEEDED, '', timezone.now()
+    except RetryableJobError as e:
+        job.error = str(e)
+        job.result = e.details
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=backoff(job.attempts))
+            logger.warning('Job %s (%s) attempt %s failed, retrying: %s', job.id, job.kind, job.attempts, e)
+        else:
+            job.status, job.finished_at = Job.FAILED, timezone.now()
+            logger.error('Job %s (%s) gave up after %s attempts: %s', job.id, job.kind, job.attempts, e)
+    except JobError as e:
+        job.status, job.error, job.result, job.finished_at = Job.FAILED, str(e), e.details, timezone.now()
+    except Exception as e:
+        logger.exception('Job %s (%s) crashed', job.id, job.kind)
+        job.status, job.error, job.finished_at = Job.FAILED, str(e), timezone.now()
+    if job.status in (Job.SUCCEEDED, Job.FAILED):
+        scrub(job)
+        fields.append('payload')
+    job.save(update_fields=fields)
+    return job
+
+
+def run_next(worker, kinds=None):
+    """Claim and run one job; returns it, or None if nothing was due."""
+    job = claim(worker, kinds)
+    if job is not None:
+        run(job)
+    return job
@@ -0,0 +1,144 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Job
+from .queue import HANDLERS, SENSITIVE_KEYS, JobError, RetryableJobError, enqueue, register, requeue_stale, run_next
+
+outcomes = []
+
+
+@register('tests.flaky')
+def flaky(job):
+    outcome = outcomes.pop(0)
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome
+
+
+@register('tests.card', sensitive=('payments',))
+def card(job):
+    return flaky(job)
+
+
+CARD_PAYLOAD = {
+    'offerId': 'OFFER1',
+    'payments': [{'method': 'creditCard', 'card': {
+        'vendorCode': 'VI', 'cardNumber': '4111111111111111', 'expiryDate': '2030-01', 'securityCode': '123'
+    }}],
+}
+
+
+@override_settings(JOB_MAX_ATTEMPTS=2)
+class JobQueueTests(TestCase):
+    def tearDown(self):
+        outcomes.clear()
+
+    def make_due(self):
+        Job.objects.update(run_after=timezone.now())
+
+    def test_idempotency_key_returns_the_first_job(self):
+        first = enqueue('tests.flaky', {}, idempotency_key='abc')
+        again = enqueue('tests.flaky', {'other': True}, idempotency_key='abc')
+        self.assertEqual(first.pk, again.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_retryable_failure_is_retried_with_backoff(self):
+        outcomes.extend([RetryableJobError('upstream 503'), {'ok': True}])
+        job = enqueue('tests.flaky', {})
+
+        run_next('worker')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(run_next('worker'))
+
+        self.make_due()
+        run_next('worker')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), (Job.SUCCEEDED, 2, {'ok': True}))
+
+    def test_gives_up_after_max_attempts(self):
+        outcomes.extend([RetryableJobError('down'), RetryableJobError('still down')])
+        job = enqueue('tests.flaky', {})
+        run_next('worker')
+        self.make_due()
+        run_next('worker')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (Job.FAILED, 'still down'))
+
+    def test_stale_running_job_is_requeued(self):
+        job = enqueue('tests.flaky', {})
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, locked_by='dead', locked_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.QUEUED)
+
+    def test_card_data_is_kept_for_retries(self):
+        outcomes.append(RetryableJobError('upstream 503'))
+        job = enqueue('tests.card', CARD_PAYLOAD)
+        run_next('worker')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.payload, CARD_PAYLOAD)
+
+    def test_finished_jobs_hold_no_card_data(self):
+        outcomes.extend([{'ok': True}, JobError('declined')])
+        succeeded = enqueue('tests.card', CARD_PAYLOAD)
+        run_next('worker')
+        failed = enqueue('tests.card', CARD_PAYLOAD)
+        run_next('worker')
+
+        for job in (succeeded, failed):
+            job.refresh_from_db()
+            self.assertIn(job.status, (Job.SUCCEEDED, Job.FAILED))
+            self.assertEqual(job.payload, {'offerId': 'OFFER1'})
+            self.assertNotIn('4111111111111111', str(Job.objects.filter(pk=job.pk).values().get()))
+
+    def test_booking_handlers_mark_cards_and_travellers_sensitive(self):
+        self.assertIn('payments', SENSITIVE_KEYS['hotels.book'])
+        self.assertIn('traveler', SENSITIVE_KEYS['flights.book'])
+
+    def test_unknown_kind_is_rejected(self):
+        self.assertNotIn('tests.missing', HANDLERS)
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing', {})
+
+
+class JobStatusTests(TestCase):
+    """A user's job status is only visible to that user."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.client = APIClient()
+
+    def get_status(self, job, user=None):
+        if user is not None:
+            self.client.force_authenticate(user)
+        return self.client.get(f'/jobs/{job.id}/')
+
+    def test_owner_sees_the_job(self):
+        job = enqueue('tests.flaky', {}, user=self.owner)
+        response = self.get_status(job, self.owner)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], Job.QUEUED)
+
+    def test_anonymous_request_is_refused(self):
+        job = enqueue('tests.flaky', {}, user=self.owner)
+        response = self.get_status(job)
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn('result', response.data)
+
+    def test_other_user_gets_not_found(self):
+        job = enqueue('tests.flaky', {}, user=self.owner)
+        self.assertEqual(self.get_status(job, self.other).status_code, 404)
+
+    def test_job_without_user_is_public(self):
+        job = enqueue('tests.flaky', {})
+        self.assertEqual(self.get_status(job).status_code, 200)
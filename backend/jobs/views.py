@@ -0,0 +1,35 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from .models import Job
+from .serializers import JobSerializer
+
+
+def wants_async(request):
+    """True if the client asked for a 202 + job instead of waiting (?async=true or Prefer: respond-async)."""
+    flag = request.GET.get('async', '').lower() in ('1', 'true', 'yes')
+    return flag or 'respond-async' in request.headers.get('Prefer', '')
+
+
+def accepted(request, job):
+    """(body, headers) of a 202 Accepted response pointing at the job's status endpoint."""
+    url = request.build_absolute_uri(reverse('jobs:job_status', args=[job.id]))
+    return {'job_id': str(job.id), 'status': job.status, 'status_url': url}, {'Location': url}
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def job_status(request, job_id):
+    """
+    Status and, once finished, result of a queued job. A job queued by a user
+    is only shown to that user; anonymous jobs to anyone holding the ID.
+    """
+    job = Job.objects.filter(pk=job_id).first()
+    if job is not None and job.user_id and not request.user.is_authenticated:
+        return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+    if job is None or (job.user_id and job.user_id != request.user.id):
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(JobSerializer(job).data)
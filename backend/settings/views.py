@@ -3,12 +3,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from .serializers import UserProfileSerializer
 from django.contrib.auth import get_user_model
+from travel_smart.response_cache import PROFILE, cache_per_user
 
 User = get_user_model()
 
 class UserProfileDetailView(APIView):
     permission_classes = [IsAuthenticated]  # Ensure only authenticated users can access this view
 
+    @cache_per_user(PROFILE)
     def get(self, request):
         user = request.user
         serializer = UserProfileSerializer(user)
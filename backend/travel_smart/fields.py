@@ -0,0 +1,45 @@
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class CompressedJSONField(models.BinaryField):
+    """
+    JSON stored zlib-compressed in a binary column, for large provider
+    payloads that are only ever read whole. The value cannot be filtered on;
+    use JSONField for anything queried by key.
+    """
+    description = 'Compressed JSON'
+
+    def __init__(self, *args, level=6, **kwargs):
+        self.level = level
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.level != 6:
+            kwargs['level'] = self.level
+        return name, path, args, kwargs
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        encoded = json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+        return zlib.compress(encoded, self.level)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return json.loads(zlib.decompress(bytes(value)))
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return json.loads(zlib.decompress(bytes(value)))
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj), cls=DjangoJSONEncoder)
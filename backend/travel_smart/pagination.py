@@ -0,0 +1,140 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A page is the first `page_size` rows after the sort key of the last row of
+the previous page, so each page is one indexed range read however deep it
+is, and rows added or removed meanwhile never shift later pages. Response
+bodies keep their existing shape; the next page is advertised in a Link
+header (and X-Next-Cursor), and the total in X-Total-Count when ?count=true.
+"""
+import base64
+import datetime
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'count'])
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder cuts datetimes to milliseconds, which would repeat rows at page edges."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def read_cursor(cursor, length):
+    """The raw list of `length` values in a cursor; raises ValueError if it was tampered with."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def decode_cursor(cursor, model, ordering):
+    """Turn a cursor back into typed sort values; raises ValueError if it was tampered with."""
+    values = read_cursor(cursor, len(ordering))
+    try:
+        fields = [model._meta.get_field(name.lstrip('-')) for name in ordering]
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def rows_after(ordering, values):
+    """Q for rows that sort strictly after `values` under `ordering`."""
+    condition = Q()
+    for position, name in enumerate(ordering):
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        equal = {field.lstrip('-'): value for field, value in zip(ordering[:position], values)}
+        condition |= Q(**equal, **{f'{name.lstrip("-")}__{lookup}': values[position]})
+    return condition
+
+
+def parse_page_params(params):
+    """(cursor, page_size, with_count) from query parameters; raises ValueError on bad input."""
+    try:
+        page_size = int(params.get('page_size') or settings.API_PAGE_SIZE)
+    except ValueError:
+        raise ValueError('page_size must be a number')
+    if page_size < 1:
+        raise ValueError('page_size must be positive')
+    with_count = params.get('count', '').lower() in ('1', 'true', 'yes')
+    return params.get('cursor') or None, min(page_size, settings.API_MAX_PAGE_SIZE), with_count
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=None, with_count=False):
+    """
+    One page of `queryset` sorted by `ordering`, whose last field must be
+    unique (normally the primary key) so the order is total.
+    """
+    page_size = page_size or settings.API_PAGE_SIZE
+    count = queryset.order_by().count() if with_count else None
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(rows_after(ordering, decode_cursor(cursor, queryset.model, ordering)))
+
+    # One row past the page tells whether there is another page
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor([getattr(items[-1], name.lstrip('-')) for name in ordering])
+    return Page(items, next_cursor, count)
+
+
+def paginate(request, queryset, ordering):
+    """keyset_page driven by the request's query parameters, for function views."""
+    return keyset_page(queryset, ordering, *parse_page_params(request.GET))
+
+
+def page_headers(request, page):
+    headers = {}
+    if page.next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = page.next_cursor
+        url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+        headers['Link'] = f'<{url}>; rel="next"'
+        headers['X-Next-Cursor'] = page.next_cursor
+    if page.count is not None:
+        headers['X-Total-Count'] = str(page.count)
+    return headers
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF pagination over `view.pagination_ordering` (default created_at, id)
+    that leaves the list body unchanged and pages through headers.
+    """
+    ordering = ('created_at', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'pagination_ordering', self.ordering)
+        try:
+            self.page = keyset_page(queryset, ordering, *parse_page_params(request.query_params))
+        except ValueError as e:
+            raise ValidationError({'error': str(e)})
+        self.request = request
+        return self.page.items
+
+    def get_paginated_response(self, data):
+        return Response(data, headers=page_headers(self.request, self.page))
+
+    def get_paginated_response_schema(self, schema):
+        return schema
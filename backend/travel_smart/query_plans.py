@@ -0,0 +1,91 @@
+"""
+Query plan regression helpers.
+
+Tests seed the big tables to a realistic size, call an endpoint while
+capturing its SQL, then EXPLAIN every SELECT it ran and fail if the planner
+would read any table front to back instead of through an index.
+"""
+import re
+from abc import ABCMeta, abstractmethod
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+# Plan lines that mean a whole table is read, per database vendor
+SEQUENTIAL_SCANS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    # SQLite says "SCAN <table>" for a full scan and adds "USING ... INDEX" for an index walk
+    'sqlite': re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$'),
+}
+
+
+def explain(sql):
+    """The query plan of `sql` as a list of lines."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN {sql}')
+        return [row[0] for row in cursor.fetchall()]
+
+
+def sequential_scans(plan):
+    """Names of the tables a plan reads sequentially."""
+    pattern = SEQUENTIAL_SCANS.get(connection.vendor)
+    if pattern is None:
+        return []
+    return [match.group(1) for match in map(pattern.search, plan) if match]
+
+
+def analyze():
+    """Refresh planner statistics after seeding, as autovacuum would in production."""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def bulk_seed(model, objects, batch_size=5000):
+    """bulk_create a (possibly lazy) iterable of unsaved objects in batches."""
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return
+        model.objects.bulk_create(batch, batch_size=batch_size)
+
+
+class QueryPlanTestCase(TestCase, metaclass=ABCMeta):
+    """
+    Base class for plan tests. Subclasses implement seed(), which runs once in
+    setUpTestData and should create about settings.QUERY_PLAN_SEED_ROWS rows,
+    and wrap endpoint calls in assertIndexedQueries.
+    """
+    seed_rows = settings.QUERY_PLAN_SEED_ROWS
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed()
+        analyze()
+
+    @classmethod
+    @abstractmethod
+    def seed(cls):
+        """Create the rows the plans are checked against."""
+
+    def assertIndexedQueries(self, call, allowed=()):
+        """
+        Run `call`, EXPLAIN each SELECT it executed and fail on any sequential
+        scan of a table not listed in `allowed`. Returns the call's result.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            result = call()
+
+        selects = [query['sql'] for query in queries.captured_queries if query['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertTrue(selects, 'The call ran no SELECT queries.')
+        for sql in selects:
+            plan = explain(sql)
+            scanned = [table for table in sequential_scans(plan) if table not in allowed]
+            self.assertFalse(scanned, f'Sequential scan of {", ".join(scanned)}:\n{sql}\n' + '\n'.join(plan))
+        return result
@@ -0,0 +1,131 @@
+"""
+Per-user response cache for read-heavy GET endpoints.
+
+Cached bodies are keyed by user, scope, a per-user scope version and the
+request path, and served with an ETag so repeat loads can be answered with
+304 Not Modified. Model signals bump the version of the scopes a change
+affects, which orphans every cached page of that user at once; orphans
+expire after RESPONSE_CACHE_TTL.
+
+The version counters live in RESPONSE_CACHE_ALIAS, so with several worker
+processes that alias must point at a shared cache (e.g. Redis) for an
+invalidation in one process to reach the others.
+"""
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+# Scopes and the endpoints whose responses they cover
+PROFILE = 'profile'              # user profile, settings profile, travel preferences
+TRIPS = 'trips'                  # trip list (with nested expenses, flights, hotels and totals)
+HOTEL_BOOKINGS = 'hotel_bookings'
+TIMELINE = 'timeline'            # upcoming-trips timeline
+
+# Headers describing a cached body (pagination, cache lifetime), stored with it
+KEPT_HEADERS = ('Link', 'X-Next-Cursor', 'X-Total-Count', 'Cache-Control')
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def version_key(user_id, scope):
+    return f'respcache:version:{user_id}:{scope}'
+
+
+def invalidate(user_ids, *scopes):
+    """
+    Drop the cached responses of `scopes` for the given user IDs. Inside a
+    transaction this is done again once it commits, in case a concurrent
+    request re-cached the old rows in between.
+    """
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    keys = [version_key(user_id, scope) for user_id in set(user_ids) if user_id for scope in scopes]
+    if not keys:
+        return
+
+    def bump():
+        get_cache().set_many(dict.fromkeys(keys, time.time_ns()), None)
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def response_key(request, scope, version):
+    path = hashlib.sha256(request.get_full_path().encode()).hexdigest()
+    # Keyed by day too, so date-relative views (upcoming trips) roll over at midnight
+    return f'respcache:{scope}:{request.user.id}:{version}:{timezone.localdate().isoformat()}:{path}'
+
+
+def make_etag(data):
+    raw = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return '"%s"' % hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return header.strip() == '*' or etag in [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+def finish(response, etag, headers):
+    for name, value in headers.items():
+        response[name] = value
+    response['ETag'] = etag
+    if not response.has_header('Cache-Control'):
+        # Browsers keep the copy but must revalidate it with If-None-Match
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+    return response
+
+
+def not_modified(etag, headers):
+    kept = {name: value for name, value in headers.items() if name == 'Cache-Control'}
+    return finish(Response(status=status.HTTP_304_NOT_MODIFIED), etag, kept)
+
+
+def cache_per_user(scope, timeout=None):
+    """
+    Cache the 200 responses of a GET view (function or method) per user in
+    `scope`, and answer If-None-Match with 304 when the ETag still matches.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            if request.method != 'GET' or not request.user.is_authenticated:
+                return view(*args, **kwargs)
+
+            cache = get_cache()
+            version = cache.get(version_key(request.user.id, scope), 0)
+            key = response_key(request, scope, version)
+            cached = cache.get(key)
+            if cached is not None:
+                etag, data, headers = cached
+                if etag_matches(request, etag):
+                    return not_modified(etag, headers)
+                return finish(Response(data), etag, headers)
+
+            response = view(*args, **kwargs)
+            if response.status_code != status.HTTP_200_OK or not isinstance(response, Response):
+                return response
+            etag = make_etag(response.data)
+            headers = {name: response[name] for name in KEPT_HEADERS if response.has_header(name)}
+            cache.set(key, (etag, response.data, headers), timeout or settings.RESPONSE_CACHE_TTL)
+            if etag_matches(request, etag):
+                return not_modified(etag, headers)
+            return finish(response, etag, headers)
+        return wrapper
+    return decorator
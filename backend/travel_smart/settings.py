@@ -11,13 +11,146 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 import dj_database_url
 import os
+import tempfile
 
 AMADEUS_API_KEY = config('AMADEUS_API_KEY')
 AMADEUS_API_SECRET = config('AMADEUS_API_SECRET')
 
+# Seconds before expiry at which the shared Amadeus token is refreshed
+AMADEUS_TOKEN_REFRESH_MARGIN = config('AMADEUS_TOKEN_REFRESH_MARGIN', default=60, cast=int)
+# Share the Amadeus token between worker processes through the Django cache
+AMADEUS_TOKEN_USE_CACHE = config('AMADEUS_TOKEN_USE_CACHE', default=False, cast=bool)
+# Keep-alive connection pool and retry policy for Amadeus calls
+AMADEUS_POOL_MAXSIZE = config('AMADEUS_POOL_MAXSIZE', default=20, cast=int)
+AMADEUS_MAX_RETRIES = config('AMADEUS_MAX_RETRIES', default=2, cast=int)
+AMADEUS_BACKOFF_BASE = config('AMADEUS_BACKOFF_BASE', default=0.5, cast=float)
+AMADEUS_BACKOFF_CAP = config('AMADEUS_BACKOFF_CAP', default=8.0, cast=float)
+# Upper bound on concurrent connections from one event loop on the async (ASGI) path
+AMADEUS_ASYNC_MAX_CONNECTIONS = config('AMADEUS_ASYNC_MAX_CONNECTIONS', default=100, cast=int)
+# Upstream call budget per process (the Amadeus test environment allows 10 TPS)
+AMADEUS_RATE_LIMIT = config('AMADEUS_RATE_LIMIT', default=10, cast=float)
+AMADEUS_RATE_BURST = config('AMADEUS_RATE_BURST', default=10, cast=int)
+# Recent calls per operation kept for the upstream latency percentiles
+AMADEUS_LATENCY_WINDOW = config('AMADEUS_LATENCY_WINDOW', default=1000, cast=int)
+
+# Flight search result cache: 'locmem' (per-process LRU) or 'django' (shared cache)
+FLIGHT_SEARCH_CACHE_BACKEND = config('FLIGHT_SEARCH_CACHE_BACKEND', default='locmem')
+FLIGHT_SEARCH_CACHE_ALIAS = config('FLIGHT_SEARCH_CACHE_ALIAS', default='default')
+# Fresh for TTL seconds, then served stale for up to STALE_TTL more while it is refreshed,
+# so a listed price is at most TTL + STALE_TTL old (booking re-prices the offer anyway)
+FLIGHT_SEARCH_CACHE_TTL = config('FLIGHT_SEARCH_CACHE_TTL', default=300, cast=int)
+FLIGHT_SEARCH_CACHE_STALE_TTL = config('FLIGHT_SEARCH_CACHE_STALE_TTL', default=60, cast=int)
+FLIGHT_SEARCH_CACHE_MAX_ENTRIES = config('FLIGHT_SEARCH_CACHE_MAX_ENTRIES', default=1000, cast=int)
+# Raw flight offers referenced by `offer_ref` in search results (Django cache alias, seconds).
+# Booking may reach another worker (or host) than the search, so production must point
+# FLIGHT_OFFER_CACHE_URL at a Redis shared by every backend host. Without it the offers go to
+# files under FLIGHT_OFFER_CACHE_LOCATION, which is for development only: the directory is local
+# to one host and Django's file cache lists all of it on every write to cull old entries.
+FLIGHT_OFFER_STORE_ALIAS = config('FLIGHT_OFFER_STORE_ALIAS', default='offers')
+FLIGHT_OFFER_STORE_TTL = config('FLIGHT_OFFER_STORE_TTL', default=1800, cast=int)
+FLIGHT_OFFER_CACHE_URL = config('FLIGHT_OFFER_CACHE_URL', default='')
+FLIGHT_OFFER_CACHE_LOCATION = config(
+    'FLIGHT_OFFER_CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'travel_smart_offers')
+)
+# File cache only: one entry per search, kept small since every write lists the directory
+FLIGHT_OFFER_CACHE_MAX_ENTRIES = config('FLIGHT_OFFER_CACHE_MAX_ENTRIES', default=1000, cast=int)
+
+# Multi-city / flexible-date fan-out searches
+FLIGHT_FANOUT_CONCURRENCY = config('FLIGHT_FANOUT_CONCURRENCY', default=5, cast=int)
+FLIGHT_FANOUT_MAX_FLEX_DAYS = config('FLIGHT_FANOUT_MAX_FLEX_DAYS', default=3, cast=int)
+FLIGHT_FANOUT_MAX_SUBQUERIES = config('FLIGHT_FANOUT_MAX_SUBQUERIES', default=21, cast=int)
+
+# Two-stage hotel search: hotel IDs per Hotel Search request, batches in flight, hotels per search
+HOTEL_OFFERS_BATCH_SIZE = config('HOTEL_OFFERS_BATCH_SIZE', default=20, cast=int)
+HOTEL_PIPELINE_CONCURRENCY = config('HOTEL_PIPELINE_CONCURRENCY', default=4, cast=int)
+HOTEL_PIPELINE_MAX_HOTELS = config('HOTEL_PIPELINE_MAX_HOTELS', default=200, cast=int)
+
+# Local hotel catalog: answer hotel list queries from the database instead of Amadeus
+HOTEL_CATALOG_ENABLED = config('HOTEL_CATALOG_ENABLED', default=True, cast=bool)
+# Cities refreshed by `manage.py refresh_hotel_catalog` when none are given
+HOTEL_CATALOG_CITIES = config('HOTEL_CATALOG_CITIES', default='', cast=Csv())
+# In-memory spatial index over the catalog for geocode searches: grid cell size in degrees,
+# largest radius a k-nearest query expands to, seconds between checks for catalog changes
+HOTEL_SPATIAL_INDEX_ENABLED = config('HOTEL_SPATIAL_INDEX_ENABLED', default=True, cast=bool)
+HOTEL_SPATIAL_CELL_DEG = config('HOTEL_SPATIAL_CELL_DEG', default=0.1, cast=float)
+HOTEL_SPATIAL_MAX_RADIUS_KM = config('HOTEL_SPATIAL_MAX_RADIUS_KM', default=300, cast=float)
+HOTEL_SPATIAL_INDEX_CHECK_INTERVAL = config('HOTEL_SPATIAL_INDEX_CHECK_INTERVAL', default=60, cast=int)
+
+# Bulk expense import: rows per bulk_create batch and per request
+EXPENSE_IMPORT_BATCH_SIZE = config('EXPENSE_IMPORT_BATCH_SIZE', default=500, cast=int)
+EXPENSE_IMPORT_MAX_ROWS = config('EXPENSE_IMPORT_MAX_ROWS', default=5000, cast=int)
+
+# FX rates: currency the rate table is quoted against, default currency for cross-trip
+# analytics, seconds between checks for newly loaded rates
+FX_PIVOT_CURRENCY = config('FX_PIVOT_CURRENCY', default='USD')
+FX_REPORTING_CURRENCY = config('FX_REPORTING_CURRENCY', default='USD')
+FX_CACHE_CHECK_INTERVAL = config('FX_CACHE_CHECK_INTERVAL', default=300, cast=int)
+
+# Query plan tests: rows seeded into the big tables before EXPLAINing endpoint queries
+# (set to 1000000 for a production-sized run against PostgreSQL)
+QUERY_PLAN_SEED_ROWS = config('QUERY_PLAN_SEED_ROWS', default=20000, cast=int)
+
+# List endpoints: rows per page by default and at most (?page_size=)
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=100, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Seconds a browser may reuse a page of the upcoming-trips timeline
+TIMELINE_MAX_AGE = config('TIMELINE_MAX_AGE', default=60, cast=int)
+
+# Per-user response cache (profile, trip list, bookings, timeline).
+# Use a shared cache alias when running several worker processes.
+RESPONSE_CACHE_ALIAS = config('RESPONSE_CACHE_ALIAS', default='default')
+RESPONSE_CACHE_TTL = config('RESPONSE_CACHE_TTL', default=300, cast=int)
+
+# Login: attempts allowed per email and IP in each window of seconds, the cache counting
+# them, and failed attempts before an account is locked for LOGIN_LOCKOUT_MINUTES
+LOGIN_RATE_LIMIT = config('LOGIN_RATE_LIMIT', default=10, cast=int)
+LOGIN_RATE_WINDOW = config('LOGIN_RATE_WINDOW', default=60, cast=int)
+LOGIN_RATE_LIMIT_ALIAS = config('LOGIN_RATE_LIMIT_ALIAS', default='default')
+LOGIN_LOCKOUT_ATTEMPTS = config('LOGIN_LOCKOUT_ATTEMPTS', default=5, cast=int)
+LOGIN_LOCKOUT_MINUTES = config('LOGIN_LOCKOUT_MINUTES', default=5, cast=int)
+# Seconds the login cache remembers a user's token key
+AUTH_TOKEN_CACHE_TTL = config('AUTH_TOKEN_CACHE_TTL', default=300, cast=int)
+
+# Background jobs (run with `manage.py run_jobs`): attempts per job, retry backoff in seconds,
+# seconds before a running job whose worker died is requeued, idle poll interval
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=5, cast=int)
+JOB_BACKOFF_BASE = config('JOB_BACKOFF_BASE', default=2.0, cast=float)
+JOB_BACKOFF_CAP = config('JOB_BACKOFF_CAP', default=300.0, cast=float)
+JOB_LEASE_SECONDS = config('JOB_LEASE_SECONDS', default=300, cast=int)
+JOB_POLL_INTERVAL = config('JOB_POLL_INTERVAL', default=1.0, cast=float)
+
+# Upstream instrumentation: bearer token a Prometheus scraper sends to /upstream/metrics/
+# (staff users can always read it), and the level of the upstream/booking loggers
+UPSTREAM_METRICS_TOKEN = config('UPSTREAM_METRICS_TOKEN', default='')
+UPSTREAM_LOG_LEVEL = config('UPSTREAM_LOG_LEVEL', default='INFO')
+
+# App logs are redacted and written from a background thread (upstream.log)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'redact': {'()': 'upstream.log.RedactingFilter'},
+    },
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'background': {
+            'class': 'upstream.log.BackgroundHandler',
+            'filters': ['redact'],
+            'formatter': 'plain',
+        },
+    },
+    'loggers': {
+        name: {'handlers': ['background'], 'level': UPSTREAM_LOG_LEVEL, 'propagate': False}
+        for name in ('upstream', 'flights', 'hotels', 'jobs')
+    },
+}
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -62,6 +195,7 @@ INSTALLED_APPS = [
     'flights',
     'hotels',
     'expenses',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -175,6 +309,23 @@ DATABASES = {
     )
 }
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'offers': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': FLIGHT_OFFER_CACHE_URL,
+    } if FLIGHT_OFFER_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': FLIGHT_OFFER_CACHE_LOCATION,
+        'OPTIONS': {'MAX_ENTRIES': FLIGHT_OFFER_CACHE_MAX_ENTRIES},
+    },
+}
+
 # Use the custom user model in the accounts app
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
@@ -192,6 +343,9 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Let the frontend read the pagination headers
+CORS_EXPOSE_HEADERS = ['Link', 'X-Next-Cursor', 'X-Total-Count']
+
 # Configure django-allauth
 ACCOUNT_EMAIL_VERIFICATION = "none"  # Disable email verification for now
 ACCOUNT_AUTHENTICATION_METHOD = "email"
@@ -17,6 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponse
+from upstream.views import UpstreamLatencyView, upstream_metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -27,4 +28,7 @@ urlpatterns = [
     path('api/', include('expenses.urls')),
 
     path('hotels/', include('hotels.urls')),
+    path('jobs/', include('jobs.urls')),
+    path('upstream/latency/', UpstreamLatencyView.as_view(), name='upstream_latency'),
+    path('upstream/metrics/', upstream_metrics, name='upstream_metrics'),
 ]
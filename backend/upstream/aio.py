@@ -0,0 +1,159 @@
+import asyncio
+import contextvars
+import functools
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+from .client import AMADEUS_HOST, RetryPolicy
+from .metrics import get_latency_recorder
+from .session import get_timeout
+from .tokens import get_token_manager
+
+
+def build_async_http():
+    """Build an httpx client with a keep-alive pool for concurrent Amadeus calls."""
+    return httpx.AsyncClient(
+        base_url=AMADEUS_HOST,
+        limits=httpx.Limits(
+            max_connections=settings.AMADEUS_ASYNC_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AMADEUS_POOL_MAXSIZE,
+        ),
+        headers={
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+        },
+    )
+
+
+class AsyncAmadeusClient:
+    """
+    asyncio counterpart of AmadeusClient with the same token handling,
+    timeouts and retry policy, so one worker can keep many searches in flight.
+    """
+
+    def __init__(self, http=None, token_manager=None, retry_policy=None, recorder=None):
+        self.http = http or build_async_http()
+        self.token_manager = token_manager or get_token_manager()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.recorder = recorder or get_latency_recorder()
+
+    async def get_token(self):
+        # Refreshing blocks on the network, so do it off the event loop
+        token = self.token_manager.cached_token()
+        if token:
+            return token
+        return await sync_to_async(self.token_manager.get_token, thread_sensitive=False)()
+
+    async def request(self, method, path, endpoint='default', params=None, json=None, retry=True):
+        """Send an authenticated request to the Amadeus API; see AmadeusClient.request."""
+        connect, read = get_timeout(endpoint)
+        timeout = httpx.Timeout(read, connect=connect)
+        attempt = 0
+        refreshed = False
+
+        while True:
+            token = await self.get_token()
+            headers = {'Authorization': f'Bearer {token}'}
+
+            try:
+                with self.recorder.timed(endpoint) as call:
+                    response = await self.http.request(
+                        method, path, headers=headers, params=params, json=json, timeout=timeout
+                    )
+                    call.status, call.size = response.status_code, len(response.content)
+            except httpx.TransportError:
+                if not retry or not self.retry_policy.should_retry(attempt):
+                    raise
+                self.recorder.retry(endpoint)
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 401 and not refreshed:
+                # Token expired or revoked, get a new one and try again
+                await sync_to_async(self.token_manager.invalidate, thread_sensitive=False)(token)
+                refreshed = True
+                continue
+
+            if retry and self.retry_policy.should_retry(attempt, response.status_code):
+                self.recorder.retry(endpoint)
+                await asyncio.sleep(self.retry_policy.delay(attempt, response))
+                attempt += 1
+                continue
+
+            return response
+
+    async def get(self, path, endpoint='default', params=None, retry=True):
+        return await self.request('GET', path, endpoint=endpoint, params=params, retry=retry)
+
+    async def post(self, path, endpoint='default', json=None, retry=True):
+        return await self.request('POST', path, endpoint=endpoint, json=json, retry=retry)
+
+
+# httpx connections are bound to the event loop that opened them. Under ASGI the
+# server's loop lives as long as the process and one client per loop is shared
+# by every request. Under WSGI each async view runs on a loop of its own, so
+# with_async_client() gives the request a client and closes it afterwards.
+_clients = weakref.WeakKeyDictionary()
+_request_client = contextvars.ContextVar('amadeus_async_client', default=None)
+
+
+def get_async_client():
+    """Return the async Amadeus client of the current request, or the one shared by the running event loop."""
+    client = _request_client.get()
+    if client is not None:
+        return client
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncAmadeusClient()
+    return client
+
+
+def loop_ends_with_request():
+    """
+    True inside with_async_client() outside ASGI, where the event loop (and the
+    client) end with the request, so tasks cannot be left running past it.
+    """
+    return _request_client.get() is not None
+
+
+@asynccontextmanager
+async def request_client():
+    """Use a client of its own within the block and close its connections on the way out."""
+    client = AsyncAmadeusClient()
+    token = _request_client.set(client)
+    try:
+        yield client
+    finally:
+        _request_client.reset(token)
+        await client.http.aclose()
+
+
+async def scoped_stream(iterator):
+    async with request_client():
+        async for part in iterator:
+            yield part
+
+
+def with_async_client(view):
+    """
+    Decorate an async view that calls Amadeus. Outside ASGI the view gets a
+    client closed when it returns; a streamed body is consumed on another
+    loop, so it gets a client of its own, closed when the stream ends.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if isinstance(request, ASGIRequest):
+            return await view(request, *args, **kwargs)
+        async with request_client():
+            response = await view(request, *args, **kwargs)
+        if getattr(response, 'streaming', False) and response.is_async:
+            response.streaming_content = scoped_stream(response.streaming_content)
+        return response
+    return wrapper
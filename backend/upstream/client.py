@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+from .metrics import get_latency_recorder
+from .session import get_session, get_timeout
+from .tokens import get_token_manager
+
+
+AMADEUS_HOST = 'https://test.api.amadeus.com'
+
+# Upstream statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryPolicy:
+    """Retry budget and jittered exponential backoff shared by the sync and async clients."""
+
+    def __init__(self, max_retries=None, backoff_base=None, backoff_cap=None):
+        self.max_retries = settings.AMADEUS_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = settings.AMADEUS_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_cap = settings.AMADEUS_BACKOFF_CAP if backoff_cap is None else backoff_cap
+
+    def should_retry(self, attempt, status_code=None):
+        if attempt >= self.max_retries:
+            return False
+        return status_code is None or status_code in RETRY_STATUSES
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait before retry number `attempt` (full jitter, honours Retry-After)."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_cap)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+
+class AmadeusClient:
+    """
+    Thin wrapper around the shared session that adds the bearer token,
+    per-endpoint timeouts and retries with jittered exponential backoff.
+    """
+
+    def __init__(self, session=None, token_manager=None, retry_policy=None, recorder=None):
+        self.session = session or get_session()
+        self.token_manager = token_manager or get_token_manager()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.recorder = recorder or get_latency_recorder()
+
+    def request(self, method, path, endpoint='default', params=None, json=None, retry=True):
+        """
+        Send an authenticated request to the Amadeus API and return the response.
+
+        A 401 triggers one token refresh. Connection errors, 429 and 5xx responses
+        are retried only when `retry` is set, so non-idempotent calls such as
+        bookings are never sent twice.
+        """
+        url = f'{AMADEUS_HOST}{path}'
+        timeout = get_timeout(endpoint)
+        attempt = 0
+        refreshed = False
+
+        while True:
+            token = self.token_manager.get_token()
+            headers = {'Authorization': f'Bearer {token}'}
+
+            try:
+                with self.recorder.timed(endpoint) as call:
+                    response = self.session.request(
+                        method, url, headers=headers, params=params, json=json, timeout=timeout
+                    )
+                    call.status, call.size = response.status_code, len(response.content)
+            except (requests.ConnectionError, requests.Timeout):
+                if not retry or not self.retry_policy.should_retry(attempt):
+                    raise
+                self.recorder.retry(endpoint)
+                time.sleep(self.retry_policy.delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 401 and not refreshed:
+                # Token expired or revoked, get a new one and try again
+                self.token_manager.invalidate(token)
+                refreshed = True
+                continue
+
+            if retry and self.retry_policy.should_retry(attempt, response.status_code):
+                self.recorder.retry(endpoint)
+                time.sleep(self.retry_policy.delay(attempt, response))
+                attempt += 1
+                continue
+
+            return response
+
+    def get(self, path, endpoint='default', params=None, retry=True):
+        return self.request('GET', path, endpoint=endpoint, params=params, retry=retry)
+
+    def post(self, path, endpoint='default', json=None, retry=True):
+        return self.request('POST', path, endpoint=endpoint, json=json, retry=retry)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the Amadeus client shared by all services in this process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AmadeusClient()
+    return _client
@@ -0,0 +1,96 @@
+"""
+Logging for upstream calls and bookings.
+
+redact() masks credentials, payment cards and traveller contact/document
+details in payloads before they are logged; RedactingFilter applies it to
+the arguments of every record on a handler. BackgroundHandler hands records
+to a listener thread through a bounded queue, so a request thread never
+waits on log I/O; when the queue is full the record is dropped and counted.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+from collections.abc import Mapping
+from logging.handlers import QueueHandler, QueueListener
+
+REDACTED = '[redacted]'
+
+# Compared lowercased with underscores removed
+SENSITIVE_KEYS = {
+    'authorization', 'clientid', 'clientsecret', 'accesstoken', 'token', 'password',
+    'cardnumber', 'securitycode', 'cvv', 'expirydate', 'holdername', 'vendorcode',
+    'email', 'phone', 'phones', 'documents', 'number', 'dateofbirth',
+}
+
+
+def is_sensitive(key):
+    return str(key).replace('_', '').replace('-', '').lower() in SENSITIVE_KEYS
+
+
+def redact(value):
+    """A copy of `value` (nested dicts/lists) with sensitive keys masked."""
+    if isinstance(value, Mapping):
+        return {key: REDACTED if is_sensitive(key) else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    """Redact dict and list arguments of log records."""
+
+    def filter(self, record):
+        if isinstance(record.args, Mapping):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(redact(arg) if isinstance(arg, (Mapping, list)) else arg for arg in record.args)
+        return True
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Format records on the calling thread and write them from a listener
+    thread. The listener is started lazily in each process, so forked
+    workers (run_jobs --processes) get their own.
+    """
+
+    def __init__(self, maxsize=10_000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self._pid = None
+        self._listener = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A queue inherited through fork may hold records of the parent
+            self.queue = queue.Queue(self.queue.maxsize)
+            self._listener = QueueListener(self.queue, self.target)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Write out queued records and stop this process's listener."""
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self.stop()
+        super().close()
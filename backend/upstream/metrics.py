@@ -0,0 +1,189 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger('upstream')
+
+# Histogram bucket upper bounds: latency in seconds, response size in bytes
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus layout (rendered cumulatively)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class Call:
+    """Filled in by the caller inside LatencyRecorder.timed() once the response is in."""
+    __slots__ = ('status', 'size')
+
+    def __init__(self):
+        self.status = None
+        self.size = None
+
+
+class LatencyRecorder:
+    """
+    Instrumentation of Amadeus calls per operation (token, flight_offers,
+    flight_order, ...), shared by the raw-HTTP clients and the SDK client:
+    latency and response-size histograms, status-code, retry and token
+    counters, and the last `window` latencies for percentiles. Counts are
+    per process; render() exposes them in the Prometheus text format.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._latency = {}
+        self._sizes = {}
+        self._statuses = Counter()
+        self._retries = Counter()
+        self._events = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, operation, seconds, status=None, size=None):
+        """Record one upstream call; `status` is the HTTP status, or 'error' when no response came back."""
+        with self._lock:
+            if operation not in self._samples:
+                self._samples[operation] = deque(maxlen=self.window)
+                self._latency[operation] = Histogram(LATENCY_BUCKETS)
+                self._sizes[operation] = Histogram(SIZE_BUCKETS)
+            self._samples[operation].append(seconds)
+            self._latency[operation].observe(seconds)
+            if size is not None:
+                self._sizes[operation].observe(size)
+            self._statuses[operation, str(status)] += 1
+
+        failed = status == 'error' or (status or 0) >= 500
+        if failed or logger.isEnabledFor(logging.DEBUG):
+            logger.log(logging.WARNING if failed else logging.DEBUG, 'amadeus %s -> %s in %.1f ms (%s bytes)',
+                       operation, status, seconds * 1000, size)
+
+    @contextmanager
+    def timed(self, operation):
+        """
+        Time the block as one call of `operation`. Set `status` and `size` on
+        the yielded Call; an exception is recorded with status 'error'.
+        """
+        call = Call()
+        started = time.perf_counter()
+        try:
+            yield call
+        except BaseException:
+            self.observe(operation, time.perf_counter() - started, 'error')
+            raise
+        self.observe(operation, time.perf_counter() - started, call.status, call.size)
+
+    def retry(self, operation):
+        with self._lock:
+            self._retries[operation] += 1
+
+    def event(self, name):
+        """Count a named event, such as token_refresh or token_invalidation."""
+        with self._lock:
+            self._events[name] += 1
+
+    def stats(self):
+        """Calls, transport errors, status codes, retries and recent latency percentiles in ms, per operation."""
+        with self._lock:
+            snapshot = {operation: list(samples) for operation, samples in self._samples.items()}
+            latency = {operation: (histogram.count, histogram.sum) for operation, histogram in self._latency.items()}
+            statuses = dict(self._statuses)
+            retries = dict(self._retries)
+        stats = {}
+        for operation, samples in sorted(snapshot.items()):
+            calls, total = latency[operation]
+            codes = {status: count for (name, status), count in statuses.items() if name == operation}
+            p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+            stats[operation] = {
+                'calls': calls,
+                'errors': codes.get('error', 0),
+                'statuses': codes,
+                'retries': retries.get(operation, 0),
+                'mean_ms': round(total * 1000 / calls, 2),
+                'p50_ms': round(float(p50), 2),
+                'p95_ms': round(float(p95), 2),
+                'p99_ms': round(float(p99), 2),
+            }
+        return stats
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                '# HELP amadeus_request_duration_seconds Latency of Amadeus calls.',
+                '# TYPE amadeus_request_duration_seconds histogram',
+            ]
+            for operation, histogram in sorted(self._latency.items()):
+                lines += histogram.render('amadeus_request_duration_seconds', f'operation="{operation}"')
+            lines += [
+                '# HELP amadeus_response_size_bytes Body size of Amadeus responses.',
+                '# TYPE amadeus_response_size_bytes histogram',
+            ]
+            for operation, histogram in sorted(self._sizes.items()):
+                lines += histogram.render('amadeus_response_size_bytes', f'operation="{operation}"')
+            lines += [
+                '# HELP amadeus_responses_total Amadeus calls by status code ("error": no response).',
+                '# TYPE amadeus_responses_total counter',
+            ]
+            for (operation, status), count in sorted(self._statuses.items()):
+                lines.append(f'amadeus_responses_total{{operation="{operation}",status="{status}"}} {count}')
+            lines += [
+                '# HELP amadeus_retries_total Amadeus calls sent again after a failed attempt.',
+                '# TYPE amadeus_retries_total counter',
+            ]
+            for operation, count in sorted(self._retries.items()):
+                lines.append(f'amadeus_retries_total{{operation="{operation}"}} {count}')
+            lines += [
+                '# HELP amadeus_token_events_total Token refreshes and invalidations after a 401.',
+                '# TYPE amadeus_token_events_total counter',
+            ]
+            for name, count in sorted(self._events.items()):
+                lines.append(f'amadeus_token_events_total{{event="{name}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            for store in (self._samples, self._latency, self._sizes, self._statuses, self._retries, self._events):
+                store.clear()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_latency_recorder():
+    """Return the latency recorder shared by all Amadeus calls in this process."""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = LatencyRecorder(window=settings.AMADEUS_LATENCY_WINDOW)
+    return _recorder
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+
+
+class TokenBucket:
+    """
+    Token bucket limiting how many upstream calls this process starts per second.
+
+    `rate` tokens are added per second up to `burst`; each call takes one.
+    Both blocking (`acquire`) and asyncio (`aacquire`) callers share the budget.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token if available, otherwise return how long to wait for one."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self):
+        while True:
+            wait = self._reserve()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide Amadeus call budget."""
+    global _bucket
+    if _bucket is None:
+        with _bucket_lock:
+            if _bucket is None:
+                _bucket = TokenBucket(settings.AMADEUS_RATE_LIMIT, settings.AMADEUS_RATE_BURST)
+    return _bucket
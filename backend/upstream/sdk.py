@@ -0,0 +1,109 @@
+"""
+The amadeus SDK client, on the same footing as AmadeusClient.
+
+Left to itself the SDK fetches an OAuth token per Client instance and opens a
+new urllib connection for every call. The process-wide client built here
+takes its bearer token from the shared AmadeusTokenManager and sends its
+requests through the shared keep-alive session, so SDK calls (flight pricing
+and orders) cost no extra token round-trip or TLS handshake and are timed in
+the same latency recorder as the raw-HTTP searches.
+"""
+import threading
+from urllib.error import URLError
+from urllib.parse import urlsplit
+
+import amadeus
+import requests
+
+from .metrics import get_latency_recorder
+from .session import get_session, get_timeout
+from .tokens import get_token_manager
+
+# Operation names, for timeouts and latency, of the SDK calls made by this app
+SDK_OPERATIONS = {
+    '/v1/shopping/flight-offers/pricing': 'flight_pricing',
+    '/v1/booking/flight-orders': 'flight_order',
+}
+
+
+class SharedAccessToken:
+    """Stands in for the SDK's own AccessToken and hands out the shared token."""
+
+    def __init__(self, token_manager):
+        self.token_manager = token_manager
+
+    def _bearer_token(self):
+        return f'Bearer {self.token_manager.get_token()}'
+
+
+class SessionResponse:
+    """The parts of urllib's HTTPResponse that the SDK's response parser reads."""
+
+    def __init__(self, response):
+        self.response = response
+        self.status = response.status_code
+
+    def info(self):
+        return self.response.headers
+
+    def read(self):
+        return self.response.content
+
+
+class SessionHTTP:
+    """SDK `http` handler that sends its urllib requests through the shared session."""
+
+    def __init__(self, session=None, recorder=None):
+        self.session = session or get_session()
+        self.recorder = recorder or get_latency_recorder()
+
+    def __call__(self, http_request):
+        operation = SDK_OPERATIONS.get(urlsplit(http_request.full_url).path, 'sdk')
+        try:
+            with self.recorder.timed(operation) as call:
+                response = self.session.request(
+                    http_request.get_method(), http_request.full_url, data=http_request.data,
+                    headers=dict(http_request.header_items()), timeout=get_timeout(operation)
+                )
+                call.status, call.size = response.status_code, len(response.content)
+        except requests.RequestException as e:
+            # The SDK turns a URLError into a NetworkError
+            raise URLError(e)
+        return SessionResponse(response)
+
+
+class SharedClient(amadeus.Client):
+    """amadeus.Client using the shared token and session. Never retries, as orders are not idempotent."""
+
+    def __init__(self, token_manager=None, http=None):
+        token_manager = token_manager or get_token_manager()
+        super().__init__(
+            client_id=token_manager.api_key,
+            client_secret=token_manager.api_secret,
+            http=http or SessionHTTP(),
+        )
+        self.token_manager = token_manager
+        self.access_token = SharedAccessToken(token_manager)
+
+    def request(self, verb, path, params):
+        token = self.token_manager.get_token()
+        try:
+            return super().request(verb, path, params)
+        except amadeus.AuthenticationError:
+            # A 401 is rejected before anything is done, so a fresh token is safe to try once
+            self.token_manager.invalidate(token)
+            return super().request(verb, path, params)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sdk_client():
+    """Return the amadeus SDK client shared by all bookings in this process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SharedClient()
+    return _client
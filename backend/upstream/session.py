@@ -0,0 +1,56 @@
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+# (connect, read) timeouts in seconds for each kind of Amadeus call
+DEFAULT_TIMEOUTS = {
+    'token': (3.05, 10),
+    'flight_offers': (3.05, 30),
+    'hotel_list': (3.05, 15),
+    'hotel_offers': (3.05, 30),
+    'hotel_offer': (3.05, 15),
+    'hotel_booking': (3.05, 60),
+    'flight_pricing': (3.05, 30),
+    'flight_order': (3.05, 60),
+    'default': (3.05, 30),
+}
+
+
+def get_timeout(endpoint):
+    """Return the (connect, read) timeout for an endpoint, honouring AMADEUS_TIMEOUTS overrides."""
+    timeouts = {**DEFAULT_TIMEOUTS, **getattr(settings, 'AMADEUS_TIMEOUTS', {})}
+    return timeouts.get(endpoint, timeouts['default'])
+
+
+def build_session():
+    """Build a keep-alive session with a connection pool sized for concurrent workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=settings.AMADEUS_POOL_MAXSIZE,
+        max_retries=0,  # Retries are handled by AmadeusClient so they can back off
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate',
+    })
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the HTTP session shared by all Amadeus calls in this process."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
@@ -0,0 +1,356 @@
+import json
+import logging
+from unittest import mock
+
+import amadeus
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import client, metrics, sdk, session, tokens
+from .client import AmadeusClient, RetryPolicy
+from .log import REDACTED, RedactingFilter, redact
+from .metrics import LatencyRecorder
+from .sdk import SessionHTTP, SharedClient
+from .tokens import DEFAULT_TOKEN_LIFETIME, AmadeusTokenManager
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(body).encode()
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+
+class TokenManagerTests(SimpleTestCase):
+    """The token is fetched once, refreshed before it expires and kept for its real lifetime."""
+
+    def setUp(self):
+        self.now = 1_000_000.0
+        clock = mock.patch.object(tokens, 'time', mock.Mock(time=lambda: self.now))
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.responses = []
+        self.issued = 0
+        self.session = mock.Mock()
+        self.session.post.side_effect = lambda *args, **kwargs: self.responses.pop(0)
+        session = mock.patch.object(tokens, 'get_session', return_value=self.session)
+        session.start()
+        self.addCleanup(session.stop)
+        self.addCleanup(cache.clear)
+
+    def issue(self, *bodies):
+        for body in bodies:
+            self.issued += 1
+            self.responses.append(FakeResponse({'access_token': f'token-{self.issued}', **body}))
+
+    def manager(self, **kwargs):
+        return AmadeusTokenManager('key', 'secret', refresh_margin=60, **kwargs)
+
+    def test_token_is_reused_until_the_refresh_margin(self):
+        manager = self.manager()
+        self.issue({'expires_in': 1799}, {'expires_in': 1799})
+        self.assertEqual(manager.get_token(), 'token-1')
+        self.now += 1799 - 61
+        self.assertEqual(manager.get_token(), 'token-1')
+        self.now += 2
+        self.assertEqual(manager.get_token(), 'token-2')
+        self.assertEqual(self.session.post.call_count, 2)
+
+    def test_short_lifetime_is_kept_with_a_smaller_margin(self):
+        manager = self.manager()
+        self.issue({'expires_in': 30}, {'expires_in': 30})
+        self.assertEqual(manager.get_token(), 'token-1')
+        self.now += 14
+        self.assertEqual(manager.cached_token(), 'token-1')
+        # Half the lifetime in, well before the 30 seconds the API granted run out
+        self.now += 2
+        self.assertIsNone(manager.cached_token())
+        self.assertEqual(manager.get_token(), 'token-2')
+
+    def test_missing_or_invalid_lifetime_falls_back_to_the_default(self):
+        for body in ({}, {'expires_in': None}, {'expires_in': 'soon'}, {'expires_in': 0}):
+            with self.subTest(body=body):
+                manager = self.manager()
+                self.issue(body)
+                manager.get_token()
+                self.now += DEFAULT_TOKEN_LIFETIME - 61
+                self.assertIsNotNone(manager.cached_token())
+                self.now += 2
+                self.assertIsNone(manager.cached_token())
+
+    def test_invalidate_drops_only_the_rejected_token(self):
+        manager = self.manager()
+        self.issue({'expires_in': 1799}, {'expires_in': 1799})
+        manager.get_token()
+        manager.invalidate('token-0')
+        self.assertEqual(manager.cached_token(), 'token-1')
+        manager.invalidate('token-1')
+        self.assertIsNone(manager.cached_token())
+        self.assertEqual(manager.get_token(), 'token-2')
+
+    def test_cached_token_is_shared_across_managers(self):
+        self.issue({'expires_in': 1799})
+        self.assertEqual(self.manager(use_cache=True).get_token(), 'token-1')
+        self.assertEqual(self.manager(use_cache=True).get_token(), 'token-1')
+        self.assertEqual(self.session.post.call_count, 1)
+
+    def test_failed_token_call_raises(self):
+        self.responses.append(FakeResponse({'error': 'invalid_client'}, status_code=401))
+        with self.assertRaisesMessage(Exception, 'Failed to get access token'):
+            self.manager().get_token()
+
+
+class RetryPolicyTests(SimpleTestCase):
+    """Only transient failures are retried, within the budget, after a jittered and capped delay."""
+
+    def test_retries_transient_statuses_within_the_budget(self):
+        policy = RetryPolicy(max_retries=2, backoff_base=0.5, backoff_cap=8)
+        self.assertTrue(policy.should_retry(0))
+        self.assertTrue(policy.should_retry(1, 503))
+        self.assertTrue(policy.should_retry(0, 429))
+        self.assertFalse(policy.should_retry(0, 400))
+        self.assertFalse(policy.should_retry(0, 404))
+        self.assertFalse(policy.should_retry(2, 503))
+
+    def test_delay_is_jittered_and_capped(self):
+        policy = RetryPolicy(max_retries=10, backoff_base=0.5, backoff_cap=8)
+        for attempt, ceiling in ((0, 0.5), (2, 2.0), (8, 8.0)):
+            delays = [policy.delay(attempt) for _ in range(200)]
+            self.assertTrue(all(0 <= delay <= ceiling for delay in delays))
+        self.assertEqual(policy.delay(0, FakeResponse({}, 429, {'Retry-After': '3'})), 3.0)
+        self.assertEqual(policy.delay(0, FakeResponse({}, 429, {'Retry-After': '120'})), 8.0)
+
+    @override_settings(AMADEUS_MAX_RETRIES=5, AMADEUS_BACKOFF_BASE=0.1, AMADEUS_BACKOFF_CAP=1.0)
+    def test_defaults_come_from_settings(self):
+        policy = RetryPolicy()
+        self.assertEqual((policy.max_retries, policy.backoff_base, policy.backoff_cap), (5, 0.1, 1.0))
+
+
+class AmadeusClientTests(SimpleTestCase):
+    """The client adds the token, refreshes it once on 401 and retries only what it may."""
+
+    def setUp(self):
+        self.time = self.enterContext(mock.patch.object(client, 'time', mock.Mock()))
+        # Failed calls are logged as warnings, expected here
+        self.enterContext(mock.patch.object(metrics.logger, 'disabled', True))
+        self.session = mock.Mock()
+        self.tokens = mock.Mock()
+        self.tokens.get_token.side_effect = ['token-1', 'token-2', 'token-3', 'token-4']
+        self.recorder = LatencyRecorder()
+        self.client = AmadeusClient(
+            session=self.session, token_manager=self.tokens, recorder=self.recorder,
+            retry_policy=RetryPolicy(max_retries=2, backoff_base=0.5, backoff_cap=8),
+        )
+
+    def respond(self, *outcomes):
+        self.session.request.side_effect = [
+            outcome if isinstance(outcome, Exception) else FakeResponse({}, outcome) for outcome in outcomes
+        ]
+
+    def test_transient_failures_are_retried(self):
+        self.respond(requests.ConnectionError(), 503, 200)
+        response = self.client.get('/v1/reference-data/locations', endpoint='hotel_list')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session.request.call_count, 3)
+        self.assertEqual(self.time.sleep.call_count, 2)
+        self.assertEqual(self.recorder.stats()['hotel_list']['retries'], 2)
+
+    def test_retry_budget_returns_the_last_response(self):
+        self.respond(503, 503, 503, 200)
+        self.assertEqual(self.client.get('/path').status_code, 503)
+        self.assertEqual(self.session.request.call_count, 3)
+
+    def test_calls_without_retry_are_sent_once(self):
+        self.respond(503)
+        self.assertEqual(self.client.post('/v1/booking/flight-orders', retry=False).status_code, 503)
+        self.respond(requests.Timeout())
+        with self.assertRaises(requests.Timeout):
+            self.client.post('/v1/booking/flight-orders', retry=False)
+        self.assertEqual(self.session.request.call_count, 2)
+
+    def test_rejected_token_is_replaced_once(self):
+        self.respond(401, 401)
+        self.assertEqual(self.client.get('/path').status_code, 401)
+        self.tokens.invalidate.assert_called_once_with('token-1')
+        headers = [call.kwargs['headers']['Authorization'] for call in self.session.request.call_args_list]
+        self.assertEqual(headers, ['Bearer token-1', 'Bearer token-2'])
+
+    def test_endpoint_timeout_is_used(self):
+        self.respond(200)
+        self.client.get('/path', endpoint='token')
+        self.assertEqual(self.session.request.call_args.kwargs['timeout'], session.DEFAULT_TIMEOUTS['token'])
+
+
+class SessionTests(SimpleTestCase):
+    """One keep-alive session per process, pooled for the configured number of workers."""
+
+    @override_settings(AMADEUS_POOL_MAXSIZE=7, AMADEUS_TIMEOUTS={'token': (1, 2)})
+    def test_session_pool_and_timeouts(self):
+        built = session.build_session()
+        adapter = built.get_adapter('https://test.api.amadeus.com')
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertEqual(adapter.max_retries.total, 0)
+        self.assertEqual(session.get_timeout('token'), (1, 2))
+        self.assertEqual(session.get_timeout('unknown'), session.DEFAULT_TIMEOUTS['default'])
+
+    def test_session_is_shared(self):
+        self.assertIs(session.get_session(), session.get_session())
+
+
+class FakeTokenManager:
+    """Hands out the same token until it is invalidated, like AmadeusTokenManager."""
+
+    api_key, api_secret = 'key', 'secret'
+
+    def __init__(self):
+        self.issued = 1
+        self.invalidated = []
+
+    def get_token(self):
+        return f'token-{self.issued}'
+
+    def invalidate(self, token):
+        self.invalidated.append(token)
+        self.issued += 1
+
+
+class SharedClientTests(SimpleTestCase):
+    """SDK calls go through the shared session with the shared token, and are never retried."""
+
+    def setUp(self):
+        # Failed calls are logged as warnings, expected here
+        self.enterContext(mock.patch.object(metrics.logger, 'disabled', True))
+        self.session = mock.Mock()
+        self.tokens = FakeTokenManager()
+        self.recorder = LatencyRecorder()
+        self.client = SharedClient(
+            token_manager=self.tokens, http=SessionHTTP(session=self.session, recorder=self.recorder)
+        )
+
+    def respond(self, *outcomes):
+        headers = {'Content-Type': 'application/vnd.amadeus+json'}
+        self.session.request.side_effect = [
+            outcome if isinstance(outcome, Exception) else FakeResponse({'data': {'id': '1'}}, outcome, headers)
+            for outcome in outcomes
+        ]
+
+    def sent_tokens(self):
+        return [call.kwargs['headers']['Authorization'] for call in self.session.request.call_args_list]
+
+    def test_call_uses_the_shared_token_and_session(self):
+        self.respond(200)
+        response = self.client.post('/v1/shopping/flight-offers/pricing', {'data': {}})
+        self.assertEqual(response.data, {'id': '1'})
+        method, url = self.session.request.call_args.args
+        self.assertEqual(method, 'POST')
+        self.assertTrue(url.endswith('/v1/shopping/flight-offers/pricing'))
+        self.assertEqual(self.sent_tokens(), ['Bearer token-1'])
+        self.assertEqual(self.session.request.call_args.kwargs['timeout'], session.get_timeout('flight_pricing'))
+        self.assertEqual(self.recorder.stats()['flight_pricing']['calls'], 1)
+
+    def test_rejected_token_is_replaced_once(self):
+        self.respond(401, 200)
+        self.assertEqual(self.client.post('/v1/booking/flight-orders', {}).data, {'id': '1'})
+        self.assertEqual(self.tokens.invalidated, ['token-1'])
+        self.assertEqual(self.sent_tokens(), ['Bearer token-1', 'Bearer token-2'])
+
+        self.session.reset_mock()
+        self.respond(401, 401)
+        with self.assertRaises(amadeus.AuthenticationError):
+            self.client.post('/v1/booking/flight-orders', {})
+        self.assertEqual(self.session.request.call_count, 2)
+
+    def test_failures_are_not_retried(self):
+        self.respond(503)
+        with self.assertRaises(amadeus.ServerError):
+            self.client.post('/v1/booking/flight-orders', {})
+        self.respond(requests.ConnectionError())
+        with self.assertRaises(amadeus.NetworkError):
+            self.client.post('/v1/booking/flight-orders', {})
+        self.assertEqual(self.session.request.call_count, 2)
+        self.assertEqual(self.tokens.invalidated, [])
+
+    def test_client_is_shared(self):
+        self.enterContext(mock.patch.object(sdk, '_client', None))
+        self.enterContext(mock.patch.object(sdk, 'get_token_manager', return_value=self.tokens))
+        self.assertIs(sdk.get_sdk_client(), sdk.get_sdk_client())
+        self.assertIs(sdk.get_sdk_client().token_manager, self.tokens)
+
+
+class RedactTests(SimpleTestCase):
+    """Credentials, cards and traveller contact details never reach the logs."""
+
+    payload = {
+        'data': {
+            'guests': [{'name': {'firstName': 'Ana'}, 'contact': {'email': 'ana@example.com', 'phone': '+1555'}}],
+            'payments': [{'method': 'CREDIT_CARD', 'card': {'cardNumber': '4111111111111111', 'expiryDate': '2030-01'}}],
+        },
+        'client_secret': 'secret',
+    }
+
+    def test_sensitive_keys_are_masked_at_any_depth(self):
+        redacted = redact(self.payload)
+        guest, payment = redacted['data']['guests'][0], redacted['data']['payments'][0]
+        self.assertEqual(guest['contact'], {'email': REDACTED, 'phone': REDACTED})
+        self.assertEqual(guest['name'], {'firstName': 'Ana'})
+        self.assertEqual(payment['card'], {'cardNumber': REDACTED, 'expiryDate': REDACTED})
+        self.assertEqual(payment['method'], 'CREDIT_CARD')
+        self.assertEqual(redacted['client_secret'], REDACTED)
+        # The payload itself is left as it was
+        self.assertEqual(self.payload['client_secret'], 'secret')
+
+    def test_key_spelling_does_not_matter(self):
+        self.assertEqual(
+            redact({'Authorization': 'Bearer x', 'card-number': '4111', 'DATE_OF_BIRTH': '1990-01-01', 'city': 'Paris'}),
+            {'Authorization': REDACTED, 'card-number': REDACTED, 'DATE_OF_BIRTH': REDACTED, 'city': 'Paris'},
+        )
+
+    def test_filter_redacts_record_arguments(self):
+        record = logging.makeLogRecord({'msg': 'Booking %s for %s', 'args': (self.payload, 'ana')})
+        self.assertTrue(RedactingFilter().filter(record))
+        message = record.getMessage()
+        self.assertNotIn('4111111111111111', message)
+        self.assertNotIn('ana@example.com', message)
+        self.assertTrue(message.endswith(' for ana'))
+
+        record = logging.LogRecord('upstream', logging.INFO, __file__, 1, 'Token %(token)s for %(user)s',
+                                   ({'token': 'abc', 'user': 'ana'},), None)
+        RedactingFilter().filter(record)
+        self.assertEqual(record.getMessage(), f'Token {REDACTED} for ana')
+
+
+@override_settings(UPSTREAM_METRICS_TOKEN='scrape-token')
+class MetricsViewTests(TestCase):
+    """Metrics are served to staff users and to a scraper holding the token."""
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(username='staff', password='x', is_staff=True)
+        self.user = get_user_model().objects.create_user(username='user', password='x')
+
+    def fetch(self, **headers):
+        return self.client.get('/upstream/metrics/', headers=headers)
+
+    def test_scraper_with_the_token(self):
+        response = self.fetch(Authorization='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertEqual(self.fetch(Authorization='Bearer wrong').status_code, 403)
+        self.assertEqual(self.fetch(Authorization='scrape-token').status_code, 403)
+        self.assertEqual(self.fetch().status_code, 403)
+
+    @override_settings(UPSTREAM_METRICS_TOKEN='')
+    def test_empty_token_lets_no_scraper_in(self):
+        self.assertEqual(self.fetch(Authorization='Bearer ').status_code, 403)
+
+    def test_staff_only_for_logged_in_users(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.fetch().status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.fetch().status_code, 200)
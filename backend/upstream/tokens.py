@@ -0,0 +1,133 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import get_latency_recorder
+from .session import get_session, get_timeout
+
+
+TOKEN_URL = 'https://test.api.amadeus.com/v1/security/oauth2/token'
+# Lifetime Amadeus documents for its access tokens, assumed when a response omits `expires_in`
+DEFAULT_TOKEN_LIFETIME = 1799
+
+
+class AmadeusTokenManager:
+    """
+    Process-wide holder for the Amadeus OAuth2 client-credentials token.
+
+    The token is shared by every service instance and thread in the process,
+    refreshed shortly before it expires, and fetched by a single caller at a
+    time so a burst of requests results in one token call. When
+    AMADEUS_TOKEN_USE_CACHE is enabled the token is also stored in the Django
+    cache so other worker processes can pick it up instead of fetching their own.
+    """
+
+    def __init__(self, api_key, api_secret, refresh_margin=60, use_cache=False):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.refresh_margin = refresh_margin
+        self.use_cache = use_cache
+        self.cache_key = f'amadeus:token:{api_key}'
+
+        self._token = None
+        self._refresh_at = 0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, refresh_at):
+        return time.time() < refresh_at
+
+    def margin_for(self, lifetime):
+        """Seconds before expiry to refresh a token living `lifetime` seconds."""
+        # A lifetime shorter than the margin would leave the token stale as soon as it arrives
+        return min(self.refresh_margin, lifetime / 2)
+
+    def cached_token(self):
+        """Return the current token if it is still fresh, without blocking."""
+        token, refresh_at = self._token, self._refresh_at
+        if token and self._is_fresh(refresh_at):
+            return token
+        return None
+
+    def get_token(self):
+        """Return a valid access token, refreshing it if it is about to expire."""
+        token = self.cached_token()
+        if token:
+            return token
+
+        with self._lock:
+            # Another thread may have refreshed the token while we waited
+            if self._token and self._is_fresh(self._refresh_at):
+                return self._token
+
+            if self.use_cache:
+                cached = cache.get(self.cache_key)
+                if cached and self._is_fresh(cached.get('refresh_at', 0)):
+                    self._token = cached['token']
+                    self._refresh_at = cached['refresh_at']
+                    return self._token
+
+            return self._refresh()
+
+    def invalidate(self, token):
+        """Drop the token after the API rejected it, unless it was already replaced."""
+        with self._lock:
+            if self._token == token:
+                get_latency_recorder().event('token_invalidation')
+                self._token = None
+                self._refresh_at = 0
+                if self.use_cache:
+                    cache.delete(self.cache_key)
+
+    def _refresh(self):
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        data = {
+            'grant_type': 'client_credentials',
+            'client_id': self.api_key,
+            'client_secret': self.api_secret
+        }
+
+        recorder = get_latency_recorder()
+        recorder.event('token_refresh')
+        with recorder.timed('token') as call:
+            response = get_session().post(TOKEN_URL, headers=headers, data=data, timeout=get_timeout('token'))
+            call.status, call.size = response.status_code, len(response.content)
+        if response.status_code != 200:
+            raise Exception(f'Failed to get access token: {response.text}')
+
+        body = response.json()
+        self._token = body['access_token']
+        try:
+            lifetime = int(body['expires_in'])
+        except (KeyError, TypeError, ValueError):
+            lifetime = 0
+        if lifetime <= 0:
+            # Without a usable lifetime every call would see an expired token and fetch another
+            lifetime = DEFAULT_TOKEN_LIFETIME
+        self._refresh_at = time.time() + lifetime - self.margin_for(lifetime)
+
+        if self.use_cache:
+            timeout = max(int(self._refresh_at - time.time()), 1)
+            cache.set(self.cache_key, {'token': self._token, 'refresh_at': self._refresh_at}, timeout)
+
+        return self._token
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_token_manager():
+    """Return the token manager shared by all Amadeus services in this process."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = AmadeusTokenManager(
+                    api_key=settings.AMADEUS_API_KEY,
+                    api_secret=settings.AMADEUS_API_SECRET,
+                    refresh_margin=settings.AMADEUS_TOKEN_REFRESH_MARGIN,
+                    use_cache=settings.AMADEUS_TOKEN_USE_CACHE,
+                )
+    return _manager
@@ -0,0 +1,29 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .metrics import get_latency_recorder
+
+
+class UpstreamLatencyView(APIView):
+    """Latency of Amadeus calls per operation in this process, searches and bookings alike."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_latency_recorder().stats())
+
+
+def upstream_metrics(request):
+    """
+    Amadeus call metrics in the Prometheus text format, for staff users or a
+    scraper sending `Authorization: Bearer <UPSTREAM_METRICS_TOKEN>`.
+    """
+    token = settings.UPSTREAM_METRICS_TOKEN
+    scraper = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (scraper or request.user.is_staff):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(get_latency_recorder().render(), content_type='text/plain; version=0.0.4; charset=utf-8')